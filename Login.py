@@ -1,10 +1,13 @@
-import psycopg2
+import os
+import time
 import streamlit as st
 import hashlib
 
+INICIO_EXECUCAO = time.perf_counter()
+
+from modules.database import conexao, sql_coluna_id, ErroBanco
+from modules.auth import iniciar_sessao
 
-st.set_page_config(page_title="Login Demonstração Fluxo de Caixa Interativo", layout="centered")
-st.title("🔐 Login DFC")
 
 st.set_page_config(
     page_title="🔑 Login DFC Interativo",
@@ -12,46 +15,35 @@ st.set_page_config(
     layout="centered"
 )
 
-def get_connection():
-    conn = psycopg2.connect(
-        host=st.secrets["PGHOST"],
-        port=st.secrets["PGPORT"],
-        dbname=st.secrets["PGDATABASE"],
-        user=st.secrets["PGUSER"],
-        password=st.secrets["PGPASSWORD"]
-    )
-    return conn
-
+# Uma vez por processo (não a cada rerun): cria a tabela e o super admin
+@st.cache_resource(show_spinner=False)
 def criar_tabela_usuarios():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS usuarios (
-            id SERIAL PRIMARY KEY,
-            login TEXT UNIQUE,
-            senha TEXT,
-            permissao TEXT
-        )
-    """)
-    conn.commit()
-
-    # Criar super admin se não existir
-    cur.execute("SELECT * FROM usuarios WHERE login = %s", ("AVANDO",))
-    if not cur.fetchone():
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS usuarios (
+                id {sql_coluna_id()},
+                login TEXT UNIQUE,
+                senha TEXT,
+                permissao TEXT
+            )
+        """)
+
+        # Criar super admin se não existir
         senha_hash = hashlib.sha256("Ubewd.4500".encode()).hexdigest()
         cur.execute(
-            "INSERT INTO usuarios (login, senha, permissao) VALUES (%s, %s, %s)",
+            "INSERT INTO usuarios (login, senha, permissao) VALUES (%s, %s, %s) ON CONFLICT (login) DO NOTHING",
             ("AVANDO", senha_hash, "super_admin")
         )
-        conn.commit()
-    conn.close()
+        cur.close()
+    return True
 
 def validar_login(login, senha):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT senha, permissao FROM usuarios WHERE login = %s", (login.upper(),))
-    row = cur.fetchone()
-    conn.close()
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT senha, permissao FROM usuarios WHERE login = %s", (login.upper(),))
+        row = cur.fetchone()
+        cur.close()
     if row:
         senha_hash, permissao = row
         if senha_hash == hashlib.sha256(senha.encode()).hexdigest():
@@ -59,23 +51,19 @@ def validar_login(login, senha):
     return False, None
 
 def cadastrar_usuario(login, senha):
-    conn = get_connection()
-    cur = conn.cursor()
     try:
         senha_hash = hashlib.sha256(senha.encode()).hexdigest()
-        cur.execute(
-            "INSERT INTO usuarios (login, senha, permissao) VALUES (%s, %s, %s)",
-            (login.upper(), senha_hash, "visitante")
-        )
-        conn.commit()
+        with conexao() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "INSERT INTO usuarios (login, senha, permissao) VALUES (%s, %s, %s)",
+                (login.upper(), senha_hash, "visitante")
+            )
+            cur.close()
         st.success("Usuário cadastrado com sucesso! ✅")
-    except psycopg2.Error:
+    except ErroBanco:
         st.error("Esse login já existe ou houve erro!")
-    finally:
-        conn.close()
 
-# Configuração da página de login
-st.set_page_config(page_title="Login DFC", layout="centered")
 st.title("🔑 Login no Sistema DFC")
 
 criar_tabela_usuarios()
@@ -90,9 +78,7 @@ if acao == "Login":
     if st.button("Entrar"):
         valido, permissao = validar_login(login, senha)
         if valido:
-            st.session_state["usuario"] = login
-            st.session_state["permissao"] = permissao
-            st.session_state["logado"] = True
+            iniciar_sessao(login, permissao)
             st.success("Login realizado com sucesso! Redirecionando...")
             # 🚀 Aqui você pode usar st.switch_page("sistema")
         else:
@@ -108,11 +94,10 @@ elif acao == "Cadastrar novo usuário":
         else:
             st.warning("Preencha usuário e senha para cadastrar!")
 
-
-
-
-
-
-
-
-
+# ⏱️ Tempo de renderização (DFC_TEMPOS=1)
+if os.environ.get("DFC_TEMPOS") == "1":
+    tempo_total = (time.perf_counter() - INICIO_EXECUCAO) * 1000
+    st.caption(f"⏱️ Execução completa da página: {tempo_total:.0f} ms")
+    if not st.session_state.get("primeira_renderizacao_login"):
+        st.session_state["primeira_renderizacao_login"] = tempo_total
+        print(f"[PERFIL] login: primeira renderização em {tempo_total:.0f} ms")
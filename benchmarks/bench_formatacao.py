@@ -0,0 +1,52 @@
+# ============================================================
+# ⏱️ BENCHMARK: FORMATAÇÃO DE MOEDA / DATA / PERCENTUAL
+# ------------------------------------------------------------
+# Compara as funções por valor (.apply) com as vetorizadas.
+# Uso: python -m benchmarks.bench_formatacao [quantidade]
+# ============================================================
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from modules.formatacao import (
+    moeda, percentual, data_br,
+    moeda_series, percentual_series, data_br_series
+)
+
+
+def medir(func, repeticoes=1):
+    # Melhor tempo de N execuções (a primeira paga a alocação inicial do Arrow)
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = func()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), resultado
+
+
+def main(quantidade=1_000_000):
+    rng = np.random.default_rng(42)
+    valores = pd.Series(np.round(rng.normal(0, 50_000, quantidade), 2))
+    percentuais = pd.Series(np.round(rng.uniform(-100, 100, quantidade), 2))
+    datas = pd.Series(pd.Timestamp("2015-01-01") + pd.to_timedelta(rng.integers(0, 4000, quantidade), unit="D"))
+
+    casos = [
+        ("moeda", lambda: valores.apply(moeda), lambda: moeda_series(valores)),
+        ("percentual", lambda: percentuais.apply(percentual), lambda: percentual_series(percentuais)),
+        ("data_br", lambda: datas.apply(data_br), lambda: data_br_series(datas)),
+    ]
+
+    print(f"{quantidade:,} valores".replace(",", "."))
+    print(f"{'função':<12}{'apply (s)':>12}{'série (s)':>12}{'ganho':>9}{'diferenças':>12}")
+    for nome, por_valor, vetorizada in casos:
+        t_apply, esperado = medir(por_valor)
+        t_serie, obtido = medir(vetorizada, repeticoes=3)
+        diferencas = int((esperado.astype(str) != obtido.astype(str)).sum())
+        print(f"{nome:<12}{t_apply:>12.3f}{t_serie:>12.3f}{t_apply / t_serie:>8.1f}x{diferencas:>12}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
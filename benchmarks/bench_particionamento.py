@@ -0,0 +1,139 @@
+# ============================================================
+# ⏱️ BENCHMARK: LANÇAMENTOS EM TABELA ÚNICA x PARTICIONADA POR ANO
+# ------------------------------------------------------------
+# Gera N lançamentos (padrão 10 milhões, 10 anos) direto no banco,
+# em duas tabelas de um schema descartável: uma tabela comum e uma
+# particionada por ano (mesmo DDL de modules.database). Mede as
+# consultas por período que o Dashboard e a grade fazem.
+# Uso:
+#   DFC_BENCH_DSN="postgresql://..." python -m benchmarks.bench_particionamento [linhas] [--manter]
+# ============================================================
+
+import os
+import sys
+import time
+from datetime import date
+
+import psycopg2
+
+from modules.database import criar_tabela_lancamentos, garantir_particoes
+
+SCHEMA = "bench_particao"
+ANO_INICIAL = 2016
+ANOS = 10
+REPETICOES = 5
+
+CONSULTAS = {
+    "último mês (totais por conta)": ("""
+        SELECT l.conta_registro, SUM(l.valor), COUNT(*)
+        FROM {tabela} l
+        WHERE l.data >= %s AND l.data <= %s
+        GROUP BY l.conta_registro
+    """, (date(2025, 12, 1), date(2025, 12, 31))),
+    "último trimestre (totais por conta)": ("""
+        SELECT l.conta_registro, SUM(l.valor), COUNT(*)
+        FROM {tabela} l
+        WHERE l.data >= %s AND l.data <= %s
+        GROUP BY l.conta_registro
+    """, (date(2025, 10, 1), date(2025, 12, 31))),
+    "ano (totais por mês)": ("""
+        SELECT date_trunc('month', l.data), SUM(l.valor)
+        FROM {tabela} l
+        WHERE l.data >= %s AND l.data <= %s
+        GROUP BY 1
+    """, (date(2024, 1, 1), date(2024, 12, 31))),
+    "página da grade (chave no meio)": ("""
+        SELECT l.id, l.data, l.valor, l.historico
+        FROM {tabela} l
+        WHERE l.data <= %s AND (l.data, l.id) < (%s, %s)
+        ORDER BY l.data DESC, l.id DESC
+        LIMIT 100
+    """, (date(2021, 6, 15), date(2021, 6, 15), 10**12)),
+}
+
+
+def gerar(cur, tabela, linhas):
+    cur.execute(f"""
+        INSERT INTO {tabela} (data, valor, banco, historico, conta_registro, arquivo_origem)
+        SELECT
+            DATE '{ANO_INICIAL}-01-01' + (random() * ({ANOS} * 365 - 1))::int,
+            round(((random() - 0.5) * 10000)::numeric, 2),
+            (ARRAY['SANTANDER', 'ITAÚ', 'SICREDI', 'BANCO DO BRASIL'])[1 + (g % 4)],
+            'PIX RECEBIDO CLIENTE ' || g,
+            (1 + g % 6) || '.' || (g % 5) || '.' || (1 + g % 20),
+            'bench'
+        FROM generate_series(1, %s) AS g
+    """, (linhas,))
+
+
+def preparar(conn, linhas):
+    cur = conn.cursor()
+    cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    cur.execute(f"CREATE SCHEMA {SCHEMA}")
+
+    # Tabela comum, como era antes da migração
+    cur.execute(f"""
+        CREATE TABLE {SCHEMA}.lancamentos_heap (
+            id SERIAL PRIMARY KEY,
+            data DATE,
+            valor NUMERIC(12,2),
+            banco TEXT,
+            historico TEXT,
+            conta_registro TEXT,
+            arquivo_origem TEXT,
+            UNIQUE (data, valor, historico)
+        )
+    """)
+    criar_tabela_lancamentos(cur, f"{SCHEMA}.lancamentos")
+    garantir_particoes(cur, range(ANO_INICIAL, ANO_INICIAL + ANOS), tabela=f"{SCHEMA}.lancamentos")
+
+    for tabela in ("lancamentos_heap", "lancamentos"):
+        inicio = time.perf_counter()
+        gerar(cur, f"{SCHEMA}.{tabela}", linhas)
+        cur.execute(f"CREATE INDEX ON {SCHEMA}.{tabela} (data, id)")
+        cur.execute(f"CREATE INDEX ON {SCHEMA}.{tabela} (conta_registro, data)")
+        conn.commit()
+        cur.execute(f"VACUUM ANALYZE {SCHEMA}.{tabela}")
+        print(f"  {tabela}: {linhas:,} linhas em {time.perf_counter() - inicio:.0f}s".replace(",", "."))
+    cur.close()
+
+
+def medir(conn, query, params):
+    cur = conn.cursor()
+    melhor = float("inf")
+    for _ in range(REPETICOES):
+        inicio = time.perf_counter()
+        cur.execute(query, params)
+        cur.fetchall()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    cur.close()
+    return melhor * 1000
+
+
+def main():
+    argumentos = [a for a in sys.argv[1:] if not a.startswith("--")]
+    linhas = int(argumentos[0]) if argumentos else 10_000_000
+    dsn = os.environ.get("DFC_BENCH_DSN")
+    if not dsn:
+        print("Defina DFC_BENCH_DSN com a conexão de um banco de testes.")
+        sys.exit(1)
+
+    conn = psycopg2.connect(dsn)
+    conn.autocommit = False
+    print(f"Gerando dados em {SCHEMA}...")
+    preparar(conn, linhas)
+    conn.autocommit = True
+
+    print(f"\n{'consulta':<38} {'comum (ms)':>12} {'particionada (ms)':>18} {'ganho':>8}")
+    for nome, (query, params) in CONSULTAS.items():
+        comum = medir(conn, query.format(tabela=f"{SCHEMA}.lancamentos_heap"), params)
+        particionada = medir(conn, query.format(tabela=f"{SCHEMA}.lancamentos"), params)
+        print(f"{nome:<38} {comum:>12.1f} {particionada:>18.1f} {comum / particionada:>7.1f}x")
+
+    if "--manter" not in sys.argv:
+        conn.cursor().execute(f"DROP SCHEMA {SCHEMA} CASCADE")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+# ============================================================
+# ⏱️ BENCHMARK PONTA A PONTA (CAMINHOS REAIS DO SISTEMA)
+# ------------------------------------------------------------
+# Cria uma base sintética (benchmarks.dados_sinteticos) num schema
+# descartável e mede as funções que a página usa, sem o cache do
+# Streamlit (cada repetição vai ao banco):
+#   - carregar_lancamentos, página da grade e detalhe por registro
+#   - Dashboard: árvore de totais e DFC mensal
+#   - salvar classificação, exportação (CSV e Excel), importação OFX
+# Saída: tabela no terminal e, com --json, um relatório para guardar
+# e comparar com outra execução (--comparar anterior.json).
+# Com --motor sqlite a base vai para um arquivo temporário (não
+# precisa de servidor), para comparar os dois motores.
+# Uso:
+#   DFC_BENCH_DSN="postgresql://..." python -m benchmarks.bench_ponta_a_ponta \
+#       [linhas] [--anos 5] [--repeticoes 3] [--json saida.json] \
+#       [--comparar anterior.json] [--manter]
+#   python -m benchmarks.bench_ponta_a_ponta [linhas] --motor sqlite [...]
+# ============================================================
+
+import io
+import json
+import logging
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+import psycopg2
+import psycopg2.extensions
+
+from benchmarks.dados_sinteticos import (
+    gerar_plano_contas,
+    gerar_lancamentos,
+    inserir_contas,
+    copiar_lancamentos,
+    gerar_ofx,
+)
+
+SCHEMA = "bench_ponta_a_ponta"
+LINHAS_PADRAO = 100_000
+# Acima disso carregar_lancamentos do período todo não é medido (o
+# DataFrame inteiro em memória não é um caminho que a página usa)
+LIMITE_CARGA_COMPLETA = 2_000_000
+CLASSIFICACOES = 100
+TRANSACOES_OFX = 5_000
+
+# ============================================================
+# 🔹 ARGUMENTOS
+# ============================================================
+def opcao(nome, padrao=None):
+    if nome in sys.argv:
+        return sys.argv[sys.argv.index(nome) + 1]
+    return padrao
+
+def argumentos_posicionais():
+    valores, pular = [], False
+    for argumento in sys.argv[1:]:
+        if pular:
+            pular = False
+        elif argumento in ("--anos", "--repeticoes", "--json", "--comparar", "--motor"):
+            pular = True
+        elif not argumento.startswith("--"):
+            valores.append(argumento)
+    return valores
+
+# ============================================================
+# 🔹 BASE SINTÉTICA
+# ============================================================
+def preparar_schema(dsn):
+    # Tabelas do sistema dentro de SCHEMA; os módulos passam a usar o
+    # schema pelo search_path do DFC_DSN
+    os.environ["DFC_DSN"] = psycopg2.extensions.make_dsn(dsn, options=f"-c search_path={SCHEMA},public")
+    from modules.database import criar_tabela_lancamentos
+
+    conn = psycopg2.connect(dsn)
+    cur = conn.cursor()
+    cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    cur.execute(f"CREATE SCHEMA {SCHEMA}")
+    # Qualificada: criar_tabelas() acharia uma "lancamentos" do public
+    criar_tabela_lancamentos(cur, f"{SCHEMA}.lancamentos")
+    conn.commit()
+    conn.close()
+
+def preparar(linhas, ano_inicial, anos):
+    from modules.database import conectar, criar_tabelas, garantir_particoes, lancamentos_particionada
+
+    criar_tabelas()
+    contas = gerar_plano_contas()
+    conn = conectar()
+    cur = conn.cursor()
+    if lancamentos_particionada(cur):
+        garantir_particoes(cur, range(ano_inicial, ano_inicial + anos))
+    inserir_contas(cur, contas)
+
+    inicio = time.perf_counter()
+    total = copiar_lancamentos(
+        cur, gerar_lancamentos(linhas, contas, ano_inicial, anos),
+        progresso=lambda n: print(f"\r  {n:,} lançamentos".replace(",", "."), end="", flush=True)
+    )
+    conn.commit()
+    segundos = time.perf_counter() - inicio
+    print()
+
+    cur.execute("ANALYZE")
+    cur.execute("SELECT id FROM lancamentos ORDER BY data DESC, id DESC LIMIT %s", (CLASSIFICACOES,))
+    ids = [i for (i,) in cur.fetchall()]
+    conn.commit()
+    cur.close()
+    conn.close()
+    etapa = "carga (executemany)" if os.environ.get("DFC_BANCO") == "sqlite" else "carga (COPY)"
+    return contas, ids, {"etapa": etapa, "ms": segundos * 1000, "ms_min": segundos * 1000, "linhas": total}
+
+# ============================================================
+# 🔹 MEDIÇÃO
+# ============================================================
+def medir(etapa, func, repeticoes, linhas=len, preparar_repeticao=None):
+    tempos, resultado = [], None
+    for rep in range(repeticoes):
+        argumentos = preparar_repeticao(rep) if preparar_repeticao else ()
+        inicio = time.perf_counter()
+        resultado = func(*argumentos)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return {
+        "etapa": etapa,
+        "ms": statistics.median(tempos),
+        "ms_min": min(tempos),
+        "linhas": linhas(resultado) if linhas else None,
+    }
+
+def etapas(contas, ids, linhas, ano_inicial, anos, repeticoes):
+    from modules.classificacao import (
+        carregar_lancamentos,
+        carregar_pagina_importados,
+        carregar_lancamentos_registro,
+        carregar_totais_hierarquia,
+        carregar_totais_periodo,
+        carregar_saldo_anterior,
+        classificar_lancamento,
+    )
+    from modules.dashboard import FiltrosDashboard, build_dashboard, build_dfc
+    from modules.exportacao import exportar_lancamentos, remover_exportacao
+    from modules.ofx_reader import ler_ofx, importar_lancamentos
+
+    ultimo_ano = ano_inicial + anos - 1
+    ano = (date(ultimo_ano, 1, 1), date(ultimo_ano, 12, 31))
+    mes = (date(ultimo_ano, 12, 1), date(ultimo_ano, 12, 31))
+    tudo = FiltrosDashboard.criar(date(ano_inicial, 1, 1), ano[1])
+    registro_mais_usado = contas[0][4]
+
+    def exportar(filtros, formato):
+        resultado = exportar_lancamentos(filtros, formato)
+        remover_exportacao(resultado)
+        return resultado
+
+    def importar_ofx(conteudo):
+        arquivo = io.BytesIO(conteudo)
+        arquivo.name = "bench.ofx"
+        return importar_lancamentos(ler_ofx(arquivo))
+
+    ofx_novos = [gerar_ofx(TRANSACOES_OFX, inicio=date(ultimo_ano, 1, 1), semente=100 + rep) for rep in range(repeticoes)]
+
+    # versao diferente a cada repetição: o build_* não reaproveita o resultado
+    resultados = [
+        medir("carregar_lancamentos (último ano)",
+              lambda: carregar_lancamentos.sem_cache(*ano), repeticoes),
+        medir("grade: primeira página", lambda: carregar_pagina_importados.sem_cache(), repeticoes,
+              linhas=lambda r: len(r[0])),
+        medir("detalhe: registro mais usado (pág. 1)",
+              lambda: carregar_lancamentos_registro.sem_cache(registro_mais_usado, *ano), repeticoes),
+        medir("dashboard: árvore (período todo)",
+              lambda rep: build_dashboard(tudo, versao=("bench", rep), carregar_totais=carregar_totais_hierarquia.sem_cache),
+              repeticoes, linhas=lambda r: r.qtd_total, preparar_repeticao=lambda rep: (rep,)),
+        medir("dashboard: DFC mensal (período todo)",
+              lambda rep: build_dfc(tudo, "mes", versao=("bench", rep),
+                                    carregar_periodos=carregar_totais_periodo.sem_cache,
+                                    carregar_saldo=carregar_saldo_anterior.sem_cache),
+              repeticoes, linhas=lambda r: len(r.matriz), preparar_repeticao=lambda rep: (rep,)),
+        medir(f"classificação: salvar {CLASSIFICACOES} lançamentos",
+              lambda: [classificar_lancamento(i, registro_mais_usado) for i in ids], repeticoes),
+        medir("exportação CSV (último ano)",
+              lambda: exportar(FiltrosDashboard.criar(*ano), "csv"), repeticoes, linhas=lambda r: r.linhas),
+        medir("exportação Excel (último mês)",
+              lambda: exportar(FiltrosDashboard.criar(*mes), "xlsx"), repeticoes, linhas=lambda r: r.linhas),
+        medir(f"importação OFX ({TRANSACOES_OFX} novos)", lambda rep: importar_ofx(ofx_novos[rep]),
+              repeticoes, linhas=sum, preparar_repeticao=lambda rep: (rep,)),
+        medir(f"importação OFX ({TRANSACOES_OFX} já importados)", lambda: importar_ofx(ofx_novos[0]),
+              repeticoes, linhas=sum),
+    ]
+    if linhas <= LIMITE_CARGA_COMPLETA:
+        resultados.insert(0, medir("carregar_lancamentos (período todo)",
+                                   lambda: carregar_lancamentos.sem_cache(), repeticoes))
+    return resultados
+
+# ============================================================
+# 🔹 RELATÓRIO
+# ============================================================
+def imprimir(relatorio, anterior=None):
+    antes = {r["etapa"]: r["ms"] for r in anterior["resultados"]} if anterior else {}
+    config = relatorio["config"]
+    quantidade = f"{config['linhas']:,}".replace(",", ".")
+    print(f"\n{config.get('motor', 'postgres')} {config['servidor']}: "
+          f"{quantidade} lançamentos, {config['anos']} anos, "
+          f"{config['contas']} contas — mediana de {config['repeticoes']}")
+    cabecalho = f"{'etapa':<44} {'ms':>10} {'mín':>10} {'linhas':>12} {'linhas/s':>12}"
+    print(cabecalho + (f" {'antes':>10} {'Δ':>8}" if antes else ""))
+    for r in relatorio["resultados"]:
+        linhas = "" if r["linhas"] is None else f"{r['linhas']:,}".replace(",", ".")
+        por_segundo = f"{r['linhas_por_s']:,.0f}".replace(",", ".") if r.get("linhas_por_s") else ""
+        linha = f"{r['etapa']:<44} {r['ms']:>10.1f} {r['ms_min']:>10.1f} {linhas:>12} {por_segundo:>12}"
+        if antes.get(r["etapa"]):
+            linha += f" {antes[r['etapa']]:>10.1f} {(r['ms'] / antes[r['etapa']] - 1) * 100:>+7.0f}%"
+        print(linha)
+
+def main():
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    motor = opcao("--motor", "postgres")
+    dsn = os.environ.get("DFC_BENCH_DSN")
+    if motor not in ("postgres", "sqlite"):
+        print("--motor deve ser postgres ou sqlite.")
+        sys.exit(1)
+    if motor == "postgres" and not dsn:
+        print("Defina DFC_BENCH_DSN com a conexão de um banco de testes.")
+        sys.exit(1)
+
+    # Antes de qualquer import de modules.database (o motor é lido uma vez)
+    os.environ["DFC_BANCO"] = motor
+    if motor == "sqlite":
+        arquivo_sqlite = os.path.join(tempfile.mkdtemp(prefix="dfc_bench_"), "bench.db")
+        os.environ["DFC_SQLITE"] = arquivo_sqlite
+
+    posicionais = argumentos_posicionais()
+    linhas = int(posicionais[0]) if posicionais else LINHAS_PADRAO
+    anos = int(opcao("--anos", 5))
+    repeticoes = int(opcao("--repeticoes", 3))
+    ano_inicial = date.today().year - anos
+
+    if motor == "sqlite":
+        print(f"Gerando base sintética em {arquivo_sqlite}...")
+    else:
+        print(f"Gerando base sintética em {SCHEMA}...")
+        preparar_schema(dsn)
+    contas, ids, carga = preparar(linhas, ano_inicial, anos)
+    resultados = [carga] + etapas(contas, ids, linhas, ano_inicial, anos, repeticoes)
+    for r in resultados:
+        r["ms"], r["ms_min"] = round(r["ms"], 1), round(r["ms_min"], 1)
+        r["linhas_por_s"] = round(r["linhas"] / (r["ms"] / 1000)) if r["linhas"] and r["ms"] else None
+
+    if motor == "sqlite":
+        versao_servidor = sqlite3.sqlite_version
+        if "--manter" not in sys.argv:
+            for sufixo in ("", "-wal", "-shm"):
+                if os.path.exists(arquivo_sqlite + sufixo):
+                    os.remove(arquivo_sqlite + sufixo)
+            os.rmdir(os.path.dirname(arquivo_sqlite))
+    else:
+        conn = psycopg2.connect(dsn)
+        cur = conn.cursor()
+        cur.execute("SHOW server_version")
+        versao_servidor = cur.fetchone()[0]
+        if "--manter" not in sys.argv:
+            cur.execute(f"DROP SCHEMA {SCHEMA} CASCADE")
+            conn.commit()
+        conn.close()
+
+    relatorio = {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "motor": motor,
+            "servidor": versao_servidor,
+            "python": platform.python_version(),
+            "linhas": linhas,
+            "anos": anos,
+            "contas": len(contas),
+            "repeticoes": repeticoes,
+        },
+        "resultados": resultados,
+    }
+
+    anterior = None
+    if opcao("--comparar"):
+        with open(opcao("--comparar"), encoding="utf-8") as arquivo:
+            anterior = json.load(arquivo)
+    imprimir(relatorio, anterior)
+
+    if opcao("--json"):
+        with open(opcao("--json"), "w", encoding="utf-8") as arquivo:
+            json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+        print(f"\nRelatório salvo em {opcao('--json')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# ============================================================
+# ⏱️ BENCHMARK: DATAFRAME DE LANÇAMENTOS SEM/COM TIPOS
+# ------------------------------------------------------------
+# Compara o DataFrame como o pd.read_sql devolve (tudo object) com
+# o DataFrame tipado pelo loader (SCHEMA_LANCAMENTOS): memória e
+# tempo do filtro de período + contas usado pelo Dashboard.
+# Uso: python -m benchmarks.bench_tipos [quantidade]
+# ============================================================
+
+import sys
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+from modules.tipos import tipar_dataframe
+from modules.classificacao import SCHEMA_LANCAMENTOS
+
+
+def gerar_como_read_sql(quantidade):
+    # Mesmos tipos Python que o psycopg2 entrega: date, Decimal e str
+    rng = np.random.default_rng(7)
+    inicio = date(2018, 1, 1)
+    mestres = [str(m) for m in rng.integers(1, 7, quantidade)]
+    subchaves = [f"{m}.{s}" for m, s in zip(mestres, rng.integers(0, 5, quantidade))]
+    registros = [f"{s}.{r}" for s, r in zip(subchaves, rng.integers(1, 20, quantidade))]
+    return pd.DataFrame({
+        "id": np.arange(1, quantidade + 1),
+        "data": [inicio + timedelta(days=int(d)) for d in rng.integers(0, 2500, quantidade)],
+        "valor": [Decimal(f"{v:.2f}") for v in rng.normal(0, 5_000, quantidade)],
+        "historico": [f"PIX RECEBIDO CLIENTE {c}" for c in rng.integers(0, 50_000, quantidade)],
+        "banco": rng.choice(["SANTANDER", "ITAÚ", "SICREDI", "BANCO DO BRASIL"], quantidade),
+        "conta_registro": registros,
+        "mestre": mestres,
+        "subchave": subchaves,
+    })
+
+
+def filtrar_antes(df, inicio, fim, mestres):
+    # Como o Dashboard fazia: pd.to_datetime + .dt.date a cada rerun
+    return df[
+        (pd.to_datetime(df["data"]).dt.date >= inicio) &
+        (pd.to_datetime(df["data"]).dt.date <= fim) &
+        df["mestre"].isin(mestres)
+    ]
+
+
+def filtrar_depois(df, inicio, fim, mestres):
+    return df[
+        (df["data"] >= pd.Timestamp(inicio)) &
+        (df["data"] <= pd.Timestamp(fim)) &
+        df["mestre"].isin(mestres)
+    ]
+
+
+def medir(func, *args):
+    inicio = time.perf_counter()
+    resultado = func(*args)
+    return time.perf_counter() - inicio, resultado
+
+
+def main(quantidade=1_000_000):
+    df_objeto = gerar_como_read_sql(quantidade)
+    t_tipar, df_tipado = medir(tipar_dataframe, df_objeto.copy(), SCHEMA_LANCAMENTOS)
+
+    inicio, fim, mestres = date(2020, 1, 1), date(2021, 12, 31), ["1", "3"]
+    t_antes, r_antes = medir(filtrar_antes, df_objeto, inicio, fim, mestres)
+    t_depois, r_depois = medir(filtrar_depois, df_tipado, inicio, fim, mestres)
+    assert len(r_antes) == len(r_depois)
+
+    mb = 1024 * 1024
+    print(f"{quantidade:,} lançamentos".replace(",", "."))
+    print(f"memória (object):  {df_objeto.memory_usage(deep=True).sum() / mb:10.1f} MB")
+    print(f"memória (tipado):  {df_tipado.memory_usage(deep=True).sum() / mb:10.1f} MB")
+    print(f"conversão única:   {t_tipar:10.3f} s")
+    print(f"filtro (object):   {t_antes:10.3f} s")
+    print(f"filtro (tipado):   {t_depois:10.3f} s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,158 @@
+# ============================================================
+# 🧪 DADOS SINTÉTICOS: PLANO DE CONTAS, LANÇAMENTOS E OFX
+# ------------------------------------------------------------
+# Gera uma base com a cara de um cliente real, para os benchmarks:
+#   - Plano Mestre → Subchave → Registro (códigos e nomes)
+#   - N lançamentos em vários bancos e anos, com históricos de
+#     extrato, valores com sinal por grupo e parte sem classificação
+#   - Extratos OFX no formato que modules.ofx_reader lê
+# Tudo determinístico pela semente. A carga no banco usa COPY no
+# Postgres e executemany (statement preparado) no SQLite.
+# ============================================================
+
+import io
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from modules.contas import caminho_codigo
+
+BANCOS = ["SANTANDER", "ITAÚ", "SICREDI", "BANCO DO BRASIL"]
+LINHAS_POR_LOTE = 200_000
+
+# Mestre: (nome, sinal dos valores, subchaves)
+MESTRES = {
+    "1": ("Receitas Operacionais", 1, ["Vendas de Produtos", "Prestação de Serviços", "Receitas Financeiras"]),
+    "2": ("Custos", -1, ["Matéria-Prima", "Fretes", "Terceirização"]),
+    "3": ("Despesas com Pessoal", -1, ["Salários", "Encargos", "Benefícios"]),
+    "4": ("Despesas Administrativas", -1, ["Aluguel", "Utilidades", "Sistemas e Tecnologia", "Contabilidade"]),
+    "5": ("Impostos e Tarifas", -1, ["Tributos Federais", "Tributos Estaduais", "Tarifas Bancárias"]),
+    "6": ("Transferências entre Contas", 0, ["Aplicações", "Resgates", "Entre Bancos"]),
+}
+
+HISTORICOS = {
+    1: ["PIX RECEBIDO", "TED RECEBIDA", "LIQUIDACAO BOLETO", "CREDITO CARTAO"],
+    -1: ["PIX ENVIADO", "PAGAMENTO BOLETO", "DEBITO AUTOMATICO", "TED ENVIADA", "TARIFA"],
+    0: ["APLICACAO AUTOMATICA", "RESGATE AUTOMATICO", "TRANSF ENTRE CONTAS"],
+}
+
+# ============================================================
+# 🔹 PLANO DE CONTAS
+# ============================================================
+def gerar_plano_contas(registros_por_subchave=20):
+    # Lista de tuplas no formato da tabela contas:
+    # (mestre, nome_mestre, subchave, nome_subchave, registro, nome_registro, caminho)
+    contas = []
+    for mestre, (nome_mestre, _, subchaves) in MESTRES.items():
+        for s, nome_subchave in enumerate(subchaves):
+            subchave = f"{mestre}.{s}"
+            for r in range(1, registros_por_subchave + 1):
+                registro = f"{subchave}.{r}"
+                contas.append((
+                    mestre, nome_mestre, subchave, nome_subchave,
+                    registro, f"{nome_subchave} {r:02d}", caminho_codigo(registro)
+                ))
+    return contas
+
+# ============================================================
+# 🔹 LANÇAMENTOS
+# ============================================================
+def gerar_lancamentos(linhas, contas, ano_inicial, anos, semente=42,
+                      fracao_sem_classificacao=0.15, inicio_id=0):
+    # Gera DataFrames de até LINHAS_POR_LOTE linhas com as colunas
+    # (data, valor, banco, historico, conta_registro, arquivo_origem).
+    # O número no histórico mantém (data, valor, historico) único.
+    rng = np.random.default_rng(semente)
+    registros = np.array([c[4] for c in contas], dtype=object)
+    sinais = np.array([MESTRES[c[0]][1] for c in contas])
+    # Poucas contas concentram a maior parte do movimento (como na prática)
+    pesos = 1 / np.arange(1, len(contas) + 1)
+    pesos = rng.permutation(pesos / pesos.sum())
+    inicio = np.datetime64(date(ano_inicial, 1, 1))
+    dias = (date(ano_inicial + anos, 1, 1) - date(ano_inicial, 1, 1)).days
+
+    for comeco in range(0, linhas, LINHAS_POR_LOTE):
+        n = min(LINHAS_POR_LOTE, linhas - comeco)
+        conta = rng.choice(len(contas), n, p=pesos)
+        sinal = sinais[conta]
+        sinal = np.where(sinal == 0, rng.choice([-1, 1], n), sinal)
+        valor = np.round(rng.lognormal(6, 1.4, n), 2) * sinal
+
+        historico = np.empty(n, dtype=object)
+        for s in (-1, 1):
+            mascara = sinal == s
+            opcoes = HISTORICOS[s] + (HISTORICOS[0] if s == 1 else [])
+            historico[mascara] = rng.choice(opcoes, mascara.sum())
+        numero = np.arange(inicio_id + comeco, inicio_id + comeco + n)
+
+        conta_registro = registros[conta]
+        conta_registro[rng.random(n) < fracao_sem_classificacao] = None
+
+        yield pd.DataFrame({
+            "data": inicio + rng.integers(0, dias, n).astype("timedelta64[D]"),
+            "valor": valor,
+            "banco": rng.choice(BANCOS, n),
+            "historico": pd.Series(historico) + " " + pd.Series(numero).astype(str).str.zfill(9),
+            "conta_registro": conta_registro,
+            "arquivo_origem": "sintetico.ofx",
+        })
+
+# ============================================================
+# 🔹 CARGA NO BANCO
+# ============================================================
+def inserir_contas(cur, contas):
+    from modules.database import executar_lote
+
+    executar_lote(cur, """
+        INSERT INTO contas (mestre, nome_mestre, subchave, nome_subchave, registro, nome_registro, caminho)
+        VALUES %s
+        ON CONFLICT (mestre, subchave, registro) DO NOTHING
+    """, contas)
+
+def copiar_lancamentos(cur, lotes, progresso=None):
+    # Um lote por vez (COPY ... FROM STDIN em CSV no Postgres; statement
+    # preparado com executemany no SQLite); retorna o total
+    from modules.database import usa_sqlite
+
+    total = 0
+    for lote in lotes:
+        if usa_sqlite():
+            cur.executemany("""
+                INSERT INTO lancamentos (data, valor, banco, historico, conta_registro, arquivo_origem)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, lote.assign(data=lote["data"].dt.strftime("%Y-%m-%d")).itertuples(index=False, name=None))
+        else:
+            buffer = io.StringIO()
+            lote.to_csv(buffer, index=False, header=False)
+            buffer.seek(0)
+            cur.copy_expert("""
+                COPY lancamentos (data, valor, banco, historico, conta_registro, arquivo_origem)
+                FROM STDIN WITH (FORMAT csv)
+            """, buffer)
+        total += len(lote)
+        if progresso:
+            progresso(total)
+    return total
+
+# ============================================================
+# 🔹 EXTRATO OFX
+# ============================================================
+def gerar_ofx(transacoes, banco="SANTANDER", inicio=date(2024, 1, 1), semente=0):
+    # Texto OFX (SGML) com N transações de um banco
+    rng = np.random.default_rng(semente)
+    partes = [
+        "OFXHEADER:100\nDATA:OFXSGML\nVERSION:102\n\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS>",
+        f"<BANKACCTFROM><BANKID>{banco}<ACCTID>12345-6</BANKACCTFROM><BANKTRANLIST>",
+    ]
+    for i in range(transacoes):
+        dia = inicio + timedelta(days=int(rng.integers(0, 365)))
+        valor = round(float(rng.lognormal(6, 1.4)) * (1 if rng.random() < 0.4 else -1), 2)
+        tipo = rng.choice(HISTORICOS[1 if valor > 0 else -1])
+        partes.append(
+            f"<STMTTRN><TRNTYPE>{'CREDIT' if valor > 0 else 'DEBIT'}"
+            f"<DTPOSTED>{dia:%Y%m%d}120000[-3:BRT]<TRNAMT>{valor:.2f}"
+            f"<FITID>{semente}{i:08d}<MEMO>{tipo} OFX {semente} {i:08d}</STMTTRN>"
+        )
+    partes.append("</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>")
+    return "\n".join(partes).encode("latin-1")
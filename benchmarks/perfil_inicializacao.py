@@ -0,0 +1,143 @@
+# ============================================================
+# ⏱️ PERFIL DE INICIALIZAÇÃO DAS PÁGINAS (IMPORTS)
+# ------------------------------------------------------------
+# Executa os imports do topo de cada página (Login.py e
+# pages/sistema.py) num processo novo com "python -X importtime" e
+# mostra o tempo total, o tempo além do próprio Streamlit (que o
+# servidor já tem carregado) e os pacotes que mais pesam.
+# "Além do Streamlit" soma o tempo próprio dos módulos que um
+# "import streamlit" sozinho não carrega: a diferença entre dois
+# totais varia dezenas de ms de uma execução para outra.
+#
+# Com --verificar, compara com orcamento_inicializacao.json e sai
+# com código 1 se uma página passou do orçamento ou carregou um
+# módulo que deveria ser importado só sob demanda.
+# Uso:
+#   python -m benchmarks.perfil_inicializacao [--json] [--verificar]
+# ============================================================
+
+import ast
+import json
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+ORCAMENTO = Path(__file__).with_name("orcamento_inicializacao.json")
+PAGINAS = {
+    "login": RAIZ / "Login.py",
+    "sistema": RAIZ / "pages" / "sistema.py",
+}
+REPETICOES = 5
+MAIS_PESADOS = 12
+
+
+def imports_da_pagina(caminho):
+    # Só os imports do topo do arquivo: o resto do script precisa de banco
+    arvore = ast.parse(caminho.read_text(encoding="utf-8"))
+    return "\n".join(
+        ast.unparse(no) for no in arvore.body
+        if isinstance(no, (ast.Import, ast.ImportFrom))
+    )
+
+
+def importtime(codigo):
+    # {módulo: (próprio_us, acumulado_us, nível)} e o total em ms
+    processo = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codigo],
+        capture_output=True, text=True, cwd=RAIZ, check=True
+    )
+    modulos, total = {}, 0
+    for linha in processo.stderr.splitlines():
+        if not linha.startswith("import time:"):
+            continue
+        _, proprio, acumulado, nome = (parte for parte in linha.replace("import time:", "|", 1).split("|"))
+        if not proprio.strip().isdigit():
+            continue   # cabeçalho
+        nivel = (len(nome) - len(nome.lstrip())) // 2
+        modulos[nome.strip()] = (int(proprio), int(acumulado), nivel)
+        if nivel == 0:
+            total += int(acumulado)
+    return modulos, total / 1000
+
+
+def medir(codigo, base=frozenset()):
+    # Medianas do total e do tempo dos módulos fora de base, em ms
+    totais, alem, modulos = [], [], {}
+    for _ in range(REPETICOES):
+        modulos, total = importtime(codigo)
+        totais.append(total)
+        alem.append(sum(proprio for nome, (proprio, _, _) in modulos.items() if nome not in base) / 1000)
+    return modulos, statistics.median(totais), statistics.median(alem)
+
+
+def por_pacote(modulos):
+    pacotes = defaultdict(int)
+    for nome, (proprio, _, _) in modulos.items():
+        pacotes[nome.split(".")[0]] += proprio
+    return sorted(pacotes.items(), key=lambda item: -item[1])[:MAIS_PESADOS]
+
+
+def perfil():
+    do_streamlit, base, _ = medir("import streamlit")
+    resultado = {"streamlit_ms": round(base, 1), "paginas": {}}
+    for pagina, caminho in PAGINAS.items():
+        modulos, total, alem = medir(imports_da_pagina(caminho), set(do_streamlit))
+        resultado["paginas"][pagina] = {
+            "total_ms": round(total, 1),
+            "alem_do_streamlit_ms": round(alem, 1),
+            "pacotes": [{"pacote": p, "ms": round(us / 1000, 1)} for p, us in por_pacote(modulos)],
+            "modulos": sorted(modulos),
+        }
+    return resultado
+
+
+def verificar(resultado):
+    orcamento = json.loads(ORCAMENTO.read_text(encoding="utf-8"))
+    falhas = []
+    for pagina, limites in orcamento.items():
+        medido = resultado["paginas"][pagina]
+        if medido["alem_do_streamlit_ms"] > limites["max_alem_do_streamlit_ms"]:
+            falhas.append(
+                f"{pagina}: {medido['alem_do_streamlit_ms']:.0f} ms além do Streamlit "
+                f"(orçamento {limites['max_alem_do_streamlit_ms']} ms)"
+            )
+        carregados = set(medido["modulos"])
+        for modulo in limites.get("proibidos", []):
+            if modulo in carregados:
+                falhas.append(f"{pagina}: '{modulo}' é importado na abertura (deveria ser sob demanda)")
+    return falhas
+
+
+def main():
+    resultado = perfil()
+
+    if "--json" in sys.argv:
+        print(json.dumps(
+            {**resultado, "paginas": {
+                p: {k: v for k, v in d.items() if k != "modulos"}
+                for p, d in resultado["paginas"].items()
+            }},
+            indent=2, ensure_ascii=False
+        ))
+    else:
+        print(f"Streamlit sozinho: {resultado['streamlit_ms']:.0f} ms (mediana de {REPETICOES})")
+        for pagina, dados in resultado["paginas"].items():
+            print(f"\n{pagina}: {dados['total_ms']:.0f} ms "
+                  f"({dados['alem_do_streamlit_ms']:+.0f} ms além do Streamlit)")
+            for item in dados["pacotes"]:
+                print(f"  {item['pacote']:<24} {item['ms']:>8.1f} ms")
+
+    if "--verificar" in sys.argv:
+        falhas = verificar(resultado)
+        for falha in falhas:
+            print(f"❌ {falha}")
+        if falhas:
+            sys.exit(1)
+        print("✅ Inicialização dentro do orçamento.")
+
+
+if __name__ == "__main__":
+    main()
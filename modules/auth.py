@@ -0,0 +1,120 @@
+# ============================================================
+# 📘 MÓDULO: SESSÃO E PERMISSÕES
+# ------------------------------------------------------------
+# Responsável por:
+#   - Emitir um token assinado (HMAC) no login, guardado em
+#     st.session_state, com validade no próprio token
+#   - Conferir o login/permissão das páginas sem ir ao banco
+#   - Reconsultar o usuário no banco só a cada REVALIDAR_A_CADA,
+#     para que um usuário removido ou rebaixado perca o acesso
+#     em tempo limitado
+# ------------------------------------------------------------
+# Chave de assinatura: st.secrets["AUTH_SECRET"]; sem ela, uma
+# chave aleatória por processo (sessões caem ao reiniciar).
+# ============================================================
+
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import time
+
+import streamlit as st
+
+from modules.database import conexao
+
+VALIDADE_SESSAO = 8 * 60 * 60     # segundos
+REVALIDAR_A_CADA = 5 * 60         # segundos
+CHAVE_SESSAO = "token_sessao"
+
+
+@st.cache_resource(show_spinner=False)
+def _segredo():
+    try:
+        segredo = st.secrets.get("AUTH_SECRET")
+    except FileNotFoundError:   # sem secrets.toml
+        segredo = None
+    return segredo.encode() if segredo else secrets.token_bytes(32)
+
+def _b64(dados):
+    return base64.urlsafe_b64encode(dados).rstrip(b"=").decode()
+
+def _de_b64(texto):
+    return base64.urlsafe_b64decode(texto + "=" * (-len(texto) % 4))
+
+def _assinar(corpo):
+    return _b64(hmac.new(_segredo(), corpo.encode(), hashlib.sha256).digest())
+
+# ============================================================
+# 🔹 TOKEN
+# ============================================================
+def emitir_token(usuario, permissao, agora=None, expira_em=None):
+    agora = int(agora or time.time())
+    dados = {
+        "u": usuario,
+        "p": permissao,
+        "exp": expira_em or agora + VALIDADE_SESSAO,
+        "val": agora,    # última conferência no banco
+    }
+    corpo = _b64(json.dumps(dados, separators=(",", ":")).encode())
+    return f"{corpo}.{_assinar(corpo)}"
+
+def ler_token(token, agora=None):
+    # Dados do token se a assinatura confere e não expirou; senão None
+    try:
+        corpo, assinatura = token.split(".")
+    except (AttributeError, ValueError):
+        return None
+    if not hmac.compare_digest(assinatura, _assinar(corpo)):
+        return None
+    dados = json.loads(_de_b64(corpo))
+    if dados["exp"] <= (agora or time.time()):
+        return None
+    return dados
+
+# ============================================================
+# 🔹 USUÁRIO NO BANCO
+# ============================================================
+def permissao_atual(usuario):
+    # Permissão gravada hoje (None se o usuário não existe mais)
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT permissao FROM usuarios WHERE login = %s", (usuario,))
+        linha = cur.fetchone()
+        cur.close()
+    return linha[0] if linha else None
+
+# ============================================================
+# 🔹 SESSÃO (st.session_state)
+# ============================================================
+def iniciar_sessao(usuario, permissao):
+    st.session_state[CHAVE_SESSAO] = emitir_token(usuario, permissao)
+    # Chaves antigas, ainda lidas em outras partes do app
+    st.session_state["usuario"] = usuario
+    st.session_state["permissao"] = permissao
+    st.session_state["logado"] = True
+
+def encerrar_sessao():
+    for chave in (CHAVE_SESSAO, "usuario", "permissao", "logado"):
+        st.session_state.pop(chave, None)
+
+def sessao_atual():
+    # {"usuario", "permissao"} da sessão logada, ou None. Só consulta o
+    # banco quando a última conferência tem mais de REVALIDAR_A_CADA.
+    dados = ler_token(st.session_state.get(CHAVE_SESSAO))
+    if not dados:
+        encerrar_sessao()
+        return None
+
+    agora = int(time.time())
+    if agora - dados["val"] >= REVALIDAR_A_CADA:
+        permissao = permissao_atual(dados["u"])
+        if permissao is None:
+            encerrar_sessao()
+            return None
+        # Mesma validade; só renova a data da conferência (e a permissão)
+        st.session_state[CHAVE_SESSAO] = emitir_token(dados["u"], permissao, agora, dados["exp"])
+        st.session_state["permissao"] = dados["p"] = permissao
+
+    return {"usuario": dados["u"], "permissao": dados["p"]}
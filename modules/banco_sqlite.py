@@ -0,0 +1,286 @@
+# ============================================================
+# 📘 MÓDULO: MOTOR SQLITE (BANCO EMBUTIDO)
+# ------------------------------------------------------------
+# Responsável por:
+#   - Abrir o arquivo SQLite (padrão data/dfc_embutido.db) em modo WAL
+#   - Expor uma conexão com a mesma interface usada do psycopg2
+#     (placeholders %s / %(nome)s, cursor(name=...), rowcount),
+#     para que os módulos e o pd.read_sql funcionem sem mudanças
+#   - Converter datas e NUMERIC nos dois sentidos (date e Decimal,
+#     como no Postgres)
+#   - Criar as tabelas, índices e os gatilhos do resumo mensal
+# ------------------------------------------------------------
+# Escolhido com DFC_BANCO=sqlite (ver modules.database.motor).
+# Caminho do arquivo: DFC_SQLITE. O data/dfc.db é a base da versão
+# antiga (datas em TEXT, chaves fitid/assinatura) e não é usado aqui.
+# Particionamento, pg_trgm e as estimativas do EXPLAIN não existem
+# no SQLite; os módulos usam os equivalentes de cada motor.
+# ============================================================
+
+import os
+import re
+import sqlite3
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from pathlib import Path
+
+CAMINHO_PADRAO = Path(__file__).resolve().parent.parent / "data" / "dfc_embutido.db"
+TEMPO_ESPERA = 30    # segundos esperando outro escritor (busy_timeout)
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -65536",     # 64 MB
+    "PRAGMA mmap_size = 268435456",   # 256 MB
+)
+
+_PLACEHOLDER = re.compile(r"%\((\w+)\)s|%s|%%")
+_COMECA_COM_WITH = re.compile(r"^\s*WITH\b", re.IGNORECASE)
+
+# ============================================================
+# 🔹 TIPOS (PYTHON ⇄ SQLITE)
+# ============================================================
+def adaptar(valor):
+    # Datas gravadas como texto ISO (ordenam e comparam como data);
+    # timestamps em UTC, no mesmo formato do CURRENT_TIMESTAMP
+    if isinstance(valor, datetime):
+        if valor.tzinfo is not None:
+            valor = valor.astimezone(timezone.utc).replace(tzinfo=None)
+        return valor.isoformat(sep=" ")
+    if isinstance(valor, date):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if hasattr(valor, "item") and not isinstance(valor, (bytes, memoryview)):
+        return valor.item()   # escalares numpy
+    return valor
+
+def _ler_timestamp(texto):
+    valor = datetime.fromisoformat(texto.decode())
+    return valor if valor.tzinfo else valor.replace(tzinfo=timezone.utc)
+
+sqlite3.register_converter("DATE", lambda texto: date.fromisoformat(texto.decode()[:10]))
+sqlite3.register_converter("NUMERIC", lambda texto: Decimal(texto.decode()))
+sqlite3.register_converter("TIMESTAMPTZ", _ler_timestamp)
+
+def traduzir(query):
+    # %s -> ?, %(nome)s -> :nome, %% -> %
+    def trocar(m):
+        if m.group(1):
+            return f":{m.group(1)}"
+        return "?" if m.group(0) == "%s" else "%"
+    return _PLACEHOLDER.sub(trocar, query)
+
+def _parametros(params):
+    if params is None:
+        return ()
+    if isinstance(params, dict):
+        return {chave: adaptar(valor) for chave, valor in params.items()}
+    return tuple(adaptar(valor) for valor in params)
+
+# ============================================================
+# 🔹 CONEXÃO E CURSOR (INTERFACE DO PSYCOPG2)
+# ============================================================
+class CursorSQLite:
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._rowcount = None
+        self.itersize = 2000   # ignorado: o SQLite já lê sob demanda
+
+    def execute(self, query, params=None):
+        self._cursor.execute(traduzir(query), _parametros(params))
+        self._rowcount = None
+        # O sqlite3 só conta linhas de statements que começam com
+        # INSERT/UPDATE/DELETE; num "WITH ... INSERT" pergunta ao banco
+        # (changes() não inclui o que os gatilhos gravaram)
+        if self._cursor.rowcount == -1 and self._cursor.description is None and _COMECA_COM_WITH.match(query):
+            self._rowcount = self._cursor.connection.execute("SELECT changes()").fetchone()[0]
+        return self
+
+    def executemany(self, query, linhas):
+        self._cursor.executemany(traduzir(query), (_parametros(linha) for linha in linhas))
+        self._rowcount = None
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, tamanho=None):
+        return self._cursor.fetchmany(tamanho or self._cursor.arraysize)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount if self._rowcount is None else self._rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+
+class ConexaoSQLite:
+
+    def __init__(self, conexao):
+        self._conexao = conexao
+        self.closed = False
+
+    def cursor(self, name=None):
+        # name: cursor no servidor do Postgres; aqui todo cursor já é lazy
+        return CursorSQLite(self._conexao.cursor())
+
+    def commit(self):
+        self._conexao.commit()
+
+    def rollback(self):
+        self._conexao.rollback()
+
+    def close(self):
+        if not self.closed:
+            self._conexao.close()
+            self.closed = True
+
+
+def caminho_banco():
+    return os.environ.get("DFC_SQLITE") or str(CAMINHO_PADRAO)
+
+def conectar(caminho=None):
+    conexao = sqlite3.connect(
+        caminho or caminho_banco(),
+        timeout=TEMPO_ESPERA,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        check_same_thread=False,
+    )
+    for pragma in PRAGMAS:
+        conexao.execute(pragma)
+    return ConexaoSQLite(conexao)
+
+# ============================================================
+# 🔹 TABELAS, ÍNDICES E GATILHOS
+# ============================================================
+def colunas(cur, tabela):
+    cur.execute(f"PRAGMA table_info({tabela})")
+    return {linha[1] for linha in cur.fetchall()}
+
+def criar_tabelas(cur):
+    from modules.contas import caminho_codigo
+    from modules.database import criar_indices_saldo
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS lancamentos (
+            id INTEGER PRIMARY KEY,
+            data DATE,
+            valor NUMERIC(12,2),
+            banco TEXT,
+            historico TEXT,
+            conta_registro TEXT,
+            arquivo_origem TEXT,
+            conta TEXT,
+            saldo NUMERIC(14,2)
+        )
+    """)
+    for coluna, tipo in (("conta", "TEXT"), ("saldo", "NUMERIC(14,2)")):
+        if coluna not in colunas(cur, "lancamentos"):
+            cur.execute(f"ALTER TABLE lancamentos ADD COLUMN {coluna} {tipo}")
+    # Mesma chave de duplicidade do Postgres (também em bases antigas,
+    # criadas antes dela)
+    cur.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_lanc_chave
+        ON lancamentos (data, valor, historico)
+    """)
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS contas (
+            mestre TEXT,
+            subchave TEXT,
+            registro TEXT,
+            nome_mestre TEXT,
+            nome_subchave TEXT,
+            nome_registro TEXT,
+            caminho TEXT COLLATE BINARY,
+            PRIMARY KEY (mestre, subchave, registro)
+        )
+    """)
+    if "caminho" not in colunas(cur, "contas"):
+        cur.execute("ALTER TABLE contas ADD COLUMN caminho TEXT COLLATE BINARY")
+    cur.execute("SELECT rowid, registro FROM contas WHERE caminho IS NULL")
+    cur.executemany(
+        "UPDATE contas SET caminho = %s WHERE rowid = %s",
+        [(caminho_codigo(registro), rowid) for rowid, registro in cur.fetchall()]
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_contas_caminho ON contas (caminho)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_contas_registro ON contas (registro)")
+
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_lanc_data ON lancamentos (data)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_lanc_conta_data ON lancamentos (conta_registro, data)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_lanc_data_id ON lancamentos (data, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_lanc_pendentes ON lancamentos (id) WHERE conta_registro IS NULL")
+    criar_indices_saldo(cur)
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS resumo_mensal (
+            mes DATE NOT NULL,
+            banco TEXT NOT NULL DEFAULT '',
+            conta_registro TEXT NOT NULL DEFAULT '',
+            total NUMERIC(14,2) NOT NULL DEFAULT 0,
+            qtd INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (mes, banco, conta_registro)
+        )
+    """)
+    criar_gatilhos_resumo(cur)
+
+    cur.execute("""
+        SELECT NOT EXISTS (SELECT 1 FROM resumo_mensal)
+           AND EXISTS (SELECT 1 FROM lancamentos WHERE data IS NOT NULL)
+    """)
+    if cur.fetchone()[0]:
+        popular_resumo_mensal(cur)
+
+# O SQLite não tem gatilho por statement: os gatilhos são por linha
+# (um UPSERT por linha inserida/alterada/excluída)
+SQL_SOMAR_RESUMO = """
+    INSERT INTO resumo_mensal (mes, banco, conta_registro, total, qtd)
+    SELECT date({linha}.data, 'start of month'), COALESCE({linha}.banco, ''),
+           COALESCE({linha}.conta_registro, ''), {sinal} COALESCE({linha}.valor, 0), {sinal} 1
+    WHERE {linha}.data IS NOT NULL
+    ON CONFLICT (mes, banco, conta_registro) DO UPDATE
+    SET total = total + excluded.total,
+        qtd = qtd + excluded.qtd;
+"""
+
+def criar_gatilhos_resumo(cur):
+    somar = SQL_SOMAR_RESUMO.format(linha="NEW", sinal="")
+    subtrair = SQL_SOMAR_RESUMO.format(linha="OLD", sinal="-")
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_resumo_insert AFTER INSERT ON lancamentos
+        BEGIN {somar} END
+    """)
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_resumo_update
+        AFTER UPDATE OF data, valor, banco, conta_registro ON lancamentos
+        BEGIN {subtrair} {somar} END
+    """)
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_resumo_delete AFTER DELETE ON lancamentos
+        BEGIN {subtrair} END
+    """)
+
+def popular_resumo_mensal(cur):
+    cur.execute("DELETE FROM resumo_mensal")
+    cur.execute("""
+        INSERT INTO resumo_mensal (mes, banco, conta_registro, total, qtd)
+        SELECT date(data, 'start of month'), COALESCE(banco, ''),
+               COALESCE(conta_registro, ''), COALESCE(SUM(valor), 0), COUNT(*)
+        FROM lancamentos
+        WHERE data IS NOT NULL
+        GROUP BY 1, 2, 3
+    """)
@@ -0,0 +1,180 @@
+# ============================================================
+# 📘 MÓDULO: BUSCA POR HISTÓRICO
+# ------------------------------------------------------------
+# Responsável por:
+#   - Sugerir históricos enquanto o usuário digita (typeahead)
+#   - Casar por prefixo, trecho ou aproximação (erros de digitação)
+#   - Limitar e ordenar os resultados no banco (índice pg_trgm)
+#   - Índice de trigramas em memória quando o pg_trgm não existe
+# ============================================================
+
+import re
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from modules.database import conectar, executar_query, usa_sqlite
+from modules.cache import em_cache, versao
+
+LIMITE_SUGESTOES = 20
+# Quantas linhas casadas entram no ranking (limita o custo de termos
+# muito comuns, como "PIX", que casam com boa parte da tabela)
+LIMITE_CANDIDATOS = 5_000
+# Nota de corte do índice em memória (padrão de pg_trgm.similarity_threshold)
+SIMILARIDADE_MINIMA = 0.3
+TAMANHO_MINIMO_TERMO = 2
+
+
+def escapar_like(texto):
+    return re.sub(r"([\\%_])", r"\\\1", texto)
+
+# ============================================================
+# 🔹 BUSCA NO POSTGRES (pg_trgm)
+# ============================================================
+@lru_cache(maxsize=1)
+def trigramas_disponiveis():
+    if usa_sqlite():
+        return False
+    resultado = executar_query(
+        "SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')",
+        fetch=True
+    )
+    return bool(resultado and resultado[0][0])
+
+def buscar_historicos_sql(termo, limite=LIMITE_SUGESTOES):
+    # Candidatos saem do índice GIN (ILIKE e <% usam gin_trgm_ops);
+    # o ranking é: começa com o termo > contém o termo > mais parecido
+    query = """
+        WITH candidatos AS (
+            SELECT historico
+            FROM lancamentos
+            WHERE historico ILIKE %(trecho)s
+               OR %(termo)s <%% historico
+            LIMIT %(candidatos)s
+        )
+        SELECT
+            historico,
+            COUNT(*) AS qtd,
+            word_similarity(%(termo)s, historico) AS similaridade
+        FROM candidatos
+        GROUP BY historico
+        ORDER BY
+            (historico ILIKE %(prefixo)s) DESC,
+            (historico ILIKE %(trecho)s) DESC,
+            similaridade DESC,
+            qtd DESC
+        LIMIT %(limite)s
+    """
+    padrao = escapar_like(termo)
+    conn = conectar()
+    df = pd.read_sql(query, conn, params={
+        "termo": termo,
+        "trecho": f"%{padrao}%",
+        "prefixo": f"{padrao}%",
+        "candidatos": LIMITE_CANDIDATOS,
+        "limite": limite,
+    })
+    conn.close()
+    return df
+
+# ============================================================
+# 🔹 ÍNDICE DE TRIGRAMAS EM MEMÓRIA (SEM pg_trgm / SQLITE)
+# ============================================================
+def normalizar(texto):
+    texto = unicodedata.normalize("NFKD", str(texto).lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+def trigramas(texto):
+    # Igual ao pg_trgm: cada palavra com dois espaços antes e um depois
+    resultado = set()
+    for palavra in re.findall(r"\w+", normalizar(texto)):
+        palavra = f"  {palavra} "
+        resultado.update(palavra[i:i + 3] for i in range(len(palavra) - 2))
+    return resultado
+
+
+class IndiceTrigramas:
+
+    def __init__(self, textos, quantidades=None):
+        self.textos = np.asarray(textos, dtype=object)
+        self.normalizados = [normalizar(t) for t in self.textos]
+        self.quantidades = (
+            np.asarray(quantidades) if quantidades is not None
+            else np.ones(len(self.textos), dtype=np.int64)
+        )
+
+        listas = defaultdict(list)
+        for i, texto in enumerate(self.normalizados):
+            for tri in trigramas(texto):
+                listas[tri].append(i)
+        self.indice = {tri: np.asarray(ids, dtype=np.int32) for tri, ids in listas.items()}
+
+    def buscar(self, termo, limite=LIMITE_SUGESTOES):
+        consulta = normalizar(termo).strip()
+        tris = trigramas(consulta)
+        listas = [self.indice[t] for t in tris if t in self.indice]
+        if not listas:
+            return pd.DataFrame(columns=["historico", "qtd", "similaridade"])
+
+        # Quantos trigramas do termo cada texto tem (uma passada por lista)
+        contagem = np.bincount(np.concatenate(listas), minlength=len(self.textos))
+        candidatos = np.flatnonzero(contagem >= SIMILARIDADE_MINIMA * len(tris))
+        if len(candidatos) > LIMITE_CANDIDATOS:
+            # Como no SQL: só os mais parecidos entram no ranking fino
+            melhores = np.argpartition(-contagem[candidatos], LIMITE_CANDIDATOS)[:LIMITE_CANDIDATOS]
+            candidatos = candidatos[melhores]
+        similaridade = contagem[candidatos] / len(tris)
+
+        contem = np.array([consulta in self.normalizados[i] for i in candidatos], dtype=bool)
+        comeca = np.array([self.normalizados[i].startswith(consulta) for i in candidatos], dtype=bool)
+
+        df = pd.DataFrame({
+            "historico": self.textos[candidatos],
+            "qtd": self.quantidades[candidatos],
+            "similaridade": similaridade,
+            "comeca": comeca,
+            "contem": contem,
+        })
+        df = df.sort_values(
+            ["comeca", "contem", "similaridade", "qtd"],
+            ascending=False, kind="stable"
+        )
+        return df.drop(columns=["comeca", "contem"]).head(limite).reset_index(drop=True)
+
+
+@em_cache("lancamentos")
+def carregar_historicos_distintos():
+    conn = conectar()
+    df = pd.read_sql("""
+        SELECT historico, COUNT(*) AS qtd
+        FROM lancamentos
+        WHERE historico IS NOT NULL AND historico <> ''
+        GROUP BY historico
+    """, conn)
+    conn.close()
+    return df
+
+@lru_cache(maxsize=2)
+def _indice_memoria(versao_dados):
+    df = carregar_historicos_distintos()
+    return IndiceTrigramas(df["historico"].tolist(), df["qtd"].to_numpy())
+
+def indice_historicos():
+    # Reconstruído só quando os lançamentos mudam
+    return _indice_memoria(versao("lancamentos"))
+
+# ============================================================
+# 🔹 API
+# ============================================================
+@em_cache("lancamentos", ttl=300, max_entries=512)
+def buscar_historicos(termo, limite=LIMITE_SUGESTOES):
+    # DataFrame (historico, qtd, similaridade), melhores primeiro
+    termo = (termo or "").strip()
+    if len(termo) < TAMANHO_MINIMO_TERMO:
+        return pd.DataFrame(columns=["historico", "qtd", "similaridade"])
+    if trigramas_disponiveis():
+        return buscar_historicos_sql(termo, limite)
+    return indice_historicos().buscar(termo, limite)
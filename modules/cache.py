@@ -0,0 +1,167 @@
+# ============================================================
+# 📘 MÓDULO: CACHE DOS CARREGAMENTOS
+# ------------------------------------------------------------
+# Responsável por:
+#   - Guardar em cache (st.cache_data) o resultado dos loaders
+#   - Invalidar o cache por tabela através de um token de versão,
+#     inteiro ou só dos anos afetados (loaders com período)
+#   - Avisar quem observa as invalidações (modules.invalidacao
+#     repassa aos outros processos do servidor)
+#   - Contar acertos e falhas de cada loader
+#   - Registrar cada chamada no perfil (modules.perfil), se ligado
+# ------------------------------------------------------------
+# Uso:
+#   @em_cache("lancamentos", "contas", ttl=300, periodo=("data_inicio", "data_fim"))
+#   def carregar_algo(data_inicio=None, data_fim=None): ...
+#
+#   invalidar("lancamentos")                # em todo caminho de escrita
+#   invalidar("lancamentos", anos={2024})   # só o que lê 2024 é refeito
+# ============================================================
+
+import functools
+import inspect
+import threading
+import streamlit as st
+
+from modules import perfil
+
+TTL_PADRAO = 600          # segundos
+MAX_ENTRADAS_PADRAO = 64  # entradas por loader
+
+# Versão atual de cada tabela (por processo). A versão entra na chave do
+# cache, então incrementá-la faz as próximas leituras irem ao banco.
+# _versoes_ano: por (tabela, ano), para invalidar só os anos alterados;
+# um loader vê a soma das versões dos anos do seu período.
+_versoes = {}
+_versoes_ano = {}
+_observadores = []
+_tabelas_em_cache = set()
+_estatisticas = {}
+_trava = threading.Lock()
+# Marca, por thread, que a última chamada foi ao banco (para o perfil)
+_falha_local = threading.local()
+
+# ============================================================
+# 🔹 TOKENS DE VERSÃO
+# ============================================================
+def ano_de(valor):
+    # date/datetime/Timestamp ou texto ISO; None = ano desconhecido
+    if valor is None or valor == "":
+        return None
+    return valor.year if hasattr(valor, "year") else int(str(valor)[:4])
+
+def versao(*tabelas, inicio=None, fim=None):
+    # inicio/fim: datas do período lido (None = sem limite)
+    ano_inicio, ano_fim = ano_de(inicio), ano_de(fim)
+    with _trava:
+        return tuple(
+            (
+                _versoes.get(tabela, 0),
+                sum(
+                    v for (t, ano), v in _versoes_ano.items()
+                    if t == tabela
+                    and (ano_inicio is None or ano >= ano_inicio)
+                    and (ano_fim is None or ano <= ano_fim)
+                ),
+            )
+            for tabela in tabelas
+        )
+
+def invalidar(*tabelas, anos=None, notificar=True):
+    # anos: anos das linhas alteradas (None ou com None = tabela toda).
+    # notificar=False: invalidação que já veio de outro processo.
+    anos = None if not anos or None in anos else {int(ano) for ano in anos}
+    with _trava:
+        for tabela in tabelas:
+            if anos is None:
+                _versoes[tabela] = _versoes.get(tabela, 0) + 1
+            else:
+                for ano in anos:
+                    _versoes_ano[(tabela, ano)] = _versoes_ano.get((tabela, ano), 0) + 1
+    if notificar:
+        for observador in list(_observadores):
+            try:
+                observador(tabelas, anos)
+            except Exception as e:
+                # A escrita já foi feita: um aviso que falha não a desfaz
+                print(f"[DEBUG] Aviso de invalidação falhou: {e}")
+
+def ao_invalidar(observador):
+    # observador(tabelas, anos), chamado depois de cada invalidação local
+    if observador not in _observadores:
+        _observadores.append(observador)
+
+def tabelas_em_cache():
+    # Tabelas de que algum loader depende (para invalidar tudo)
+    return sorted(_tabelas_em_cache)
+
+# ============================================================
+# 🔹 DECORADOR DE CACHE
+# ============================================================
+def em_cache(*tabelas, ttl=TTL_PADRAO, max_entries=MAX_ENTRADAS_PADRAO, periodo=None):
+    # periodo: nomes dos argumentos (início, fim) com as datas que o loader
+    # lê (None em um deles = sem limite daquele lado). Sem periodo, qualquer
+    # ano alterado invalida o loader.
+    def decorador(func):
+        nome = f"{func.__module__}.{func.__name__}"
+        _tabelas_em_cache.update(tabelas)
+        contadores = _estatisticas.setdefault(nome, {"chamadas": 0, "falhas": 0})
+        assinatura = inspect.signature(func)
+
+        def versao_chamada(args, kwargs):
+            if not periodo:
+                return versao(*tabelas)
+            argumentos = assinatura.bind(*args, **kwargs)
+            argumentos.apply_defaults()
+            inicio, fim = (argumentos.arguments[arg] if arg else None for arg in periodo)
+            return versao(*tabelas, inicio=inicio, fim=fim)
+
+        def carregar(versao_dados, *args, **kwargs):
+            # Só executa em caso de falha (miss) do cache
+            with _trava:
+                contadores["falhas"] += 1
+            _falha_local.ocorreu = True
+            return func(*args, **kwargs)
+
+        # O st.cache_data identifica a função pelo módulo/qualname/código;
+        # sem isso todos os loaders decorados dividiriam o mesmo cache
+        carregar.__module__ = func.__module__
+        carregar.__qualname__ = f"{func.__qualname__}.cache"
+        carregar = st.cache_data(
+            ttl=ttl, max_entries=max_entries, show_spinner=False
+        )(carregar)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _trava:
+                contadores["chamadas"] += 1
+            if not perfil.ativo():
+                return carregar(versao_chamada(args, kwargs), *args, **kwargs)
+
+            _falha_local.ocorreu = False
+            with perfil.medir(func.__name__) as medicao:
+                resultado = carregar(versao_chamada(args, kwargs), *args, **kwargs)
+                medicao.linhas = perfil.contar_linhas(resultado)
+                medicao.detalhe = "banco" if _falha_local.ocorreu else "cache"
+            return resultado
+
+        wrapper.sem_cache = func
+        wrapper.limpar = carregar.clear
+        return wrapper
+
+    return decorador
+
+# ============================================================
+# 🔹 ESTATÍSTICAS (ACERTOS / FALHAS)
+# ============================================================
+def estatisticas_cache():
+    with _trava:
+        return [
+            {
+                "loader": nome,
+                "chamadas": c["chamadas"],
+                "acertos": c["chamadas"] - c["falhas"],
+                "falhas": c["falhas"],
+            }
+            for nome, c in sorted(_estatisticas.items())
+        ]
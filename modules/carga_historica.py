@@ -0,0 +1,474 @@
+# ============================================================
+# 📘 MÓDULO: CARGA HISTÓRICA (CSV, PARQUET E EXCEL EM MASSA)
+# ------------------------------------------------------------
+# Responsável por:
+#   - Ler extratos/planilhas com anos de histórico em lotes de
+#     LINHAS_POR_LOTE (memória constante, qualquer tamanho)
+#   - Mapear as colunas do arquivo para data, valor, histórico,
+#     banco e registro (pré-classificação opcional)
+#   - Validar e normalizar cada lote de forma vetorizada (pandas)
+#   - Gravar com COPY FROM STDIN numa tabela temporária e inserir em
+#     lancamentos com a mesma chave de duplicidade do OFX
+#     (data, valor, historico): carregar o mesmo arquivo duas vezes
+#     não duplica nada
+# ------------------------------------------------------------
+# Cada lote é uma transação: uma carga interrompida pode ser repetida
+# e continua de onde parou (o que já entrou é ignorado).
+# A carga não traz a conta bancária (conta) nem o saldo: o histórico
+# carregado fica fora do saldo corrente e da conciliação dos extratos
+# (modules.conciliacao) até um OFX com os mesmos lançamentos do mesmo
+# banco ser importado, que os associa à conta.
+# Pela página (super_admin) o arquivo passa pela fila de jobs e fica
+# em memória; arquivos muito grandes, pela linha de comando:
+#   python -m modules.carga_historica historico.csv \
+#       [--data COLUNA] [--valor COLUNA] [--historico COLUNA] \
+#       [--banco COLUNA | --banco-padrao NOME] [--registro COLUNA] \
+#       [--formato-data %d/%m/%Y] [--decimal ,] [--separador ;] \
+#       [--encoding latin-1]
+# Sem as opções de coluna, usa sugerir_mapeamento() pelo cabeçalho.
+# ============================================================
+
+import csv
+import io
+import time
+import unicodedata
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import pandas as pd
+
+from modules.database import (
+    conectar,
+    executar_query,
+    lancamentos_particionada,
+    garantir_particoes,
+    usa_sqlite
+)
+from modules.cache import invalidar
+from modules.perfil import medido
+
+LINHAS_POR_LOTE = 100_000
+EXEMPLOS_REJEITADAS = 10
+BANCO_DESCONHECIDO = "DESCONHECIDO"   # o mesmo do OFX sem banco reconhecido
+
+CAMPOS = {
+    "data": "Data",
+    "valor": "Valor",
+    "historico": "Histórico",
+    "banco": "Banco",
+    "registro": "Registro (classificação)",
+}
+OBRIGATORIOS = ("data", "valor", "historico")
+
+# Nomes de coluna comuns (sem acento, minúsculos) para a sugestão
+SINONIMOS = {
+    "data": ["data", "dt", "data lancamento", "data do lancamento", "data movimento", "date"],
+    "valor": ["valor", "vlr", "valor lancamento", "montante", "amount", "trnamt"],
+    "historico": ["historico", "descricao", "memo", "lancamento", "description"],
+    "banco": ["banco", "instituicao", "bank"],
+    "registro": ["registro", "conta_registro", "conta registro", "conta", "classificacao"],
+}
+
+# Formatos tentados, em ordem, quando o formato da data não é informado
+FORMATOS_DATA = ("ISO8601", "%d/%m/%Y", "%d/%m/%y", "%d-%m-%Y", "%d.%m.%Y")
+ANOS_VALIDOS = (1900, 2100)
+
+FORMATOS_ARQUIVO = {
+    ".csv": "csv",
+    ".txt": "csv",
+    ".parquet": "parquet",
+    ".xlsx": "xlsx",
+}
+
+COLUNAS_LANCAMENTOS = ["data", "valor", "banco", "historico", "conta_registro", "arquivo_origem"]
+
+
+@dataclass
+class ResultadoCarga:
+    lidas: int = 0
+    inseridas: int = 0
+    rejeitadas: int = 0
+    sem_registro: int = 0        # registro informado que não existe no plano
+    segundos: float = 0.0
+    exemplos_rejeitadas: list = field(default_factory=list)
+
+    @property
+    def duplicadas(self):
+        return self.lidas - self.rejeitadas - self.inseridas
+
+    @property
+    def ignoradas(self):
+        return self.lidas - self.inseridas
+
+    def resumo(self):
+        partes = [
+            f"{self.inseridas} inserida(s)",
+            f"{self.duplicadas} já existente(s)",
+            f"{self.rejeitadas} rejeitada(s)",
+        ]
+        if self.sem_registro:
+            partes.append(f"{self.sem_registro} com registro fora do plano (sem classificação)")
+        texto = ", ".join(partes)
+        if self.exemplos_rejeitadas:
+            texto += ". Rejeitadas: " + "; ".join(self.exemplos_rejeitadas)
+        return texto
+
+# ============================================================
+# 🔹 ARQUIVO: FORMATO, SEPARADOR E LEITURA EM LOTES
+# ============================================================
+def formato_arquivo(nome):
+    formato = FORMATOS_ARQUIVO.get(Path(str(nome)).suffix.lower())
+    if formato is None:
+        raise ValueError(f"Formato não suportado: {nome} (use {', '.join(FORMATOS_ARQUIVO)})")
+    return formato
+
+def _inicio_arquivo(arquivo, tamanho=65_536):
+    if hasattr(arquivo, "read"):
+        posicao = arquivo.tell()
+        inicio = arquivo.read(tamanho)
+        arquivo.seek(posicao)
+        return inicio
+    with open(arquivo, "rb") as f:
+        return f.read(tamanho)
+
+def detectar_csv(arquivo, encoding=None):
+    # (separador, encoding) pelo começo do arquivo; padrão brasileiro ";"
+    inicio = _inicio_arquivo(arquivo)
+    if encoding is None:
+        try:
+            inicio.decode("utf-8")
+            encoding = "utf-8-sig"
+        except UnicodeDecodeError as e:
+            # Caractere multibyte cortado no fim da amostra não conta
+            encoding = "utf-8-sig" if e.start >= len(inicio) - 3 else "latin-1"
+    texto = inicio.decode(encoding, errors="ignore")
+    try:
+        separador = csv.Sniffer().sniff("\n".join(texto.splitlines()[:20]), delimiters=";,\t|").delimiter
+    except csv.Error:
+        separador = ";"
+    return separador, encoding
+
+def ler_lotes(arquivo, formato, colunas=None, separador=None, encoding=None, tamanho=LINHAS_POR_LOTE):
+    # DataFrames de até "tamanho" linhas, só com as colunas pedidas.
+    # CSV e Excel chegam como texto (a normalização converte).
+    if formato == "csv":
+        if separador is None or encoding is None:
+            separador, encoding = detectar_csv(arquivo, encoding)
+        yield from pd.read_csv(
+            arquivo, sep=separador, encoding=encoding, usecols=colunas,
+            dtype=str, keep_default_na=False, chunksize=tamanho
+        )
+    elif formato == "parquet":
+        import pyarrow.parquet as pq
+
+        for lote in pq.ParquetFile(arquivo).iter_batches(batch_size=tamanho, columns=colunas):
+            yield lote.to_pandas()
+    else:
+        # O openpyxl não lê em partes pelo pandas: a planilha inteira em
+        # memória (no máximo 1.048.576 linhas)
+        df = pd.read_excel(arquivo, dtype=str, usecols=colunas, keep_default_na=False)
+        for inicio in range(0, len(df), tamanho):
+            yield df.iloc[inicio:inicio + tamanho]
+
+def ler_amostra(arquivo, formato, linhas=5, separador=None, encoding=None):
+    # Primeiras linhas com todas as colunas (para a tela de mapeamento)
+    if hasattr(arquivo, "seek"):
+        arquivo.seek(0)
+    try:
+        if formato == "xlsx":
+            return pd.read_excel(arquivo, dtype=str, nrows=linhas, keep_default_na=False)
+        lotes = ler_lotes(arquivo, formato, separador=separador, encoding=encoding, tamanho=linhas)
+        return next(lotes, pd.DataFrame()).head(linhas)
+    finally:
+        if hasattr(arquivo, "seek"):
+            arquivo.seek(0)
+
+def contar_linhas_arquivo(arquivo, formato):
+    # Total para a barra de progresso, sem carregar o arquivo (CSV:
+    # quebras de linha menos o cabeçalho; Excel: desconhecido)
+    if formato == "parquet":
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(arquivo).metadata.num_rows
+    if formato != "csv":
+        return None
+    quebras = 0
+    aberto = arquivo if hasattr(arquivo, "read") else open(arquivo, "rb")
+    try:
+        posicao = aberto.tell()
+        while bloco := aberto.read(1 << 20):
+            quebras += bloco.count(b"\n")
+            ultimo = bloco
+        aberto.seek(posicao)
+    finally:
+        if aberto is not arquivo:
+            aberto.close()
+    if quebras and not ultimo.endswith(b"\n"):
+        quebras += 1
+    return max(quebras - 1, 0)
+
+def _sem_acento(texto):
+    texto = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode()
+    return " ".join(texto.lower().replace("_", " ").split())
+
+def sugerir_mapeamento(colunas):
+    # {campo: coluna do arquivo} pelos nomes do cabeçalho
+    normalizadas = {_sem_acento(coluna): coluna for coluna in colunas}
+    mapeamento = {}
+    for campo, nomes in SINONIMOS.items():
+        for nome in nomes:
+            coluna = normalizadas.get(_sem_acento(nome))
+            if coluna is not None and coluna not in mapeamento.values():
+                mapeamento[campo] = coluna
+                break
+    return mapeamento
+
+# ============================================================
+# 🔹 NORMALIZAÇÃO (VETORIZADA, POR LOTE)
+# ============================================================
+def _texto(serie):
+    return serie.fillna("").astype(str).str.strip()
+
+def normalizar_datas(serie, formato_data=None):
+    if not pd.api.types.is_string_dtype(serie):   # datetime, date do Parquet
+        datas = pd.to_datetime(serie, errors="coerce")
+    else:
+        texto = _texto(serie)
+        datas = pd.Series(pd.NaT, index=serie.index, dtype="datetime64[ns]")
+        for formato in ([formato_data] if formato_data else FORMATOS_DATA):
+            faltando = datas.isna() & (texto != "")
+            if not faltando.any():
+                break
+            datas[faltando] = pd.to_datetime(texto[faltando], format=formato, errors="coerce")
+    if getattr(datas.dt, "tz", None) is not None:
+        datas = datas.dt.tz_localize(None)
+    datas = datas.dt.normalize()
+    return datas.where(datas.dt.year.between(*ANOS_VALIDOS))
+
+# Sem vírgula, "1.500" ou "-1.500.000" só pode ser milhar brasileiro:
+# dinheiro não tem três casas decimais
+MILHAR_BRASILEIRO = r"^-?[1-9]\d{0,2}(?:\.\d{3})+$"
+
+def normalizar_valores(serie, decimal=None):
+    # decimal: "," (1.234,56), "." (1,234.56) ou None (linha a linha: o
+    # último separador é o decimal; só vírgula ou milhar com ponto =
+    # formato brasileiro)
+    if not pd.api.types.is_string_dtype(serie):
+        return pd.to_numeric(serie, errors="coerce").astype(float).round(2)
+    texto = _texto(serie).str.replace(r"R\$|\s", "", regex=True)
+    if decimal == ",":
+        brasileiro = pd.Series(True, index=texto.index)
+    elif decimal == ".":
+        brasileiro = pd.Series(False, index=texto.index)
+    else:
+        brasileiro = (texto.str.rfind(",") > texto.str.rfind(".")) | texto.str.match(MILHAR_BRASILEIRO)
+    convertido = texto.str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+    internacional = texto.str.replace(",", "", regex=False)
+    return pd.to_numeric(convertido.where(brasileiro, internacional), errors="coerce").round(2)
+
+def normalizar_lote(df, mapeamento, nome_arquivo, banco_padrao=None, formato_data=None,
+                    decimal=None, registros_validos=None):
+    # Retorna (lançamentos válidos no formato da tabela, motivos das
+    # rejeitadas indexados pela linha, qtd. com registro fora do plano)
+    datas = normalizar_datas(df[mapeamento["data"]], formato_data)
+    valores = normalizar_valores(df[mapeamento["valor"]], decimal)
+    historicos = _texto(df[mapeamento["historico"]])
+
+    banco_padrao = (banco_padrao or "").strip().upper() or BANCO_DESCONHECIDO
+    if "banco" in mapeamento:
+        bancos = _texto(df[mapeamento["banco"]]).str.upper()
+        bancos = bancos.where(bancos != "", banco_padrao)
+    else:
+        bancos = pd.Series(banco_padrao, index=df.index)
+
+    sem_registro = 0
+    registros = pd.Series(None, index=df.index, dtype=object)
+    if "registro" in mapeamento:
+        informados = _texto(df[mapeamento["registro"]])
+        validos = informados.isin(registros_validos or ())
+        sem_registro = int(((informados != "") & ~validos).sum())
+        registros = informados.where(validos, None)
+
+    motivos = pd.Series(None, index=df.index, dtype=object)
+    motivos[historicos == ""] = "histórico vazio"
+    motivos[valores.isna()] = "valor inválido"
+    motivos[datas.isna()] = "data inválida"
+    valida = motivos.isna()
+
+    lancamentos = pd.DataFrame({
+        "data": datas,
+        "valor": valores,
+        "banco": bancos,
+        "historico": historicos,
+        "conta_registro": registros,
+        "arquivo_origem": nome_arquivo,
+    })[valida]
+    return lancamentos, motivos[~valida], sem_registro
+
+# ============================================================
+# 🔹 GRAVAÇÃO (COPY → TABELA TEMPORÁRIA → INSERT SEM DUPLICADOS)
+# ============================================================
+def preparar_temporaria(cur):
+    # COPY não tem ON CONFLICT: o lote entra numa tabela temporária e
+    # vai para lancamentos num INSERT ... SELECT (um gatilho de resumo
+    # por lote). Esvaziada a cada commit.
+    cur.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS tmp_carga (
+            data DATE,
+            valor NUMERIC(12,2),
+            banco TEXT,
+            historico TEXT,
+            conta_registro TEXT,
+            arquivo_origem TEXT
+        ) ON COMMIT DELETE ROWS
+    """)
+
+def gravar_lote(cur, lancamentos):
+    # Retorna quantas linhas entraram (as repetidas são ignoradas)
+    if usa_sqlite():
+        # Sem COPY: statement preparado reaproveitado pelo executemany
+        linhas = lancamentos.assign(data=lancamentos["data"].dt.strftime("%Y-%m-%d"))
+        cur.executemany(f"""
+            INSERT INTO lancamentos ({", ".join(COLUNAS_LANCAMENTOS)})
+            VALUES ({", ".join(["%s"] * len(COLUNAS_LANCAMENTOS))})
+            ON CONFLICT (data, valor, historico) DO NOTHING
+        """, linhas.itertuples(index=False, name=None))
+        return cur.rowcount
+
+    buffer = io.StringIO()
+    lancamentos.to_csv(buffer, index=False, header=False, date_format="%Y-%m-%d", float_format="%.2f")
+    buffer.seek(0)
+    cur.copy_expert(f"COPY tmp_carga ({', '.join(COLUNAS_LANCAMENTOS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    cur.execute(f"""
+        INSERT INTO lancamentos ({", ".join(COLUNAS_LANCAMENTOS)})
+        SELECT {", ".join(COLUNAS_LANCAMENTOS)} FROM tmp_carga
+        ON CONFLICT (data, valor, historico) DO NOTHING
+    """)
+    return cur.rowcount
+
+def carregar_registros_validos():
+    return {registro for (registro,) in executar_query("SELECT DISTINCT registro FROM contas", fetch=True)}
+
+# ============================================================
+# 🔹 CARGA
+# ============================================================
+@medido("carga histórica", linhas=lambda r: r.lidas)
+def carregar_arquivo(arquivo, mapeamento, nome=None, banco_padrao=None, formato_data=None,
+                     decimal=None, separador=None, encoding=None, progresso=None):
+    # arquivo: caminho ou arquivo aberto (binário). mapeamento: {campo:
+    # coluna do arquivo}, campos de CAMPOS. progresso(ResultadoCarga)
+    # é chamado depois de cada lote gravado.
+    faltando = [CAMPOS[campo] for campo in OBRIGATORIOS if not mapeamento.get(campo)]
+    if faltando:
+        raise ValueError(f"Informe a coluna de: {', '.join(faltando)}")
+    desconhecidos = set(mapeamento) - set(CAMPOS)
+    if desconhecidos:
+        raise ValueError(f"Campos desconhecidos no mapeamento: {', '.join(sorted(desconhecidos))}")
+
+    nome = nome or Path(str(getattr(arquivo, "name", arquivo))).name
+    formato = formato_arquivo(nome)
+    registros_validos = carregar_registros_validos() if "registro" in mapeamento else None
+
+    # Número da linha nas mensagens: como no editor (com o cabeçalho)
+    primeira_linha = 1 if formato == "parquet" else 2
+
+    resultado = ResultadoCarga()
+    inicio = time.perf_counter()
+    conn = conectar()
+    cur = conn.cursor()
+    particionada = lancamentos_particionada(cur)
+    anos_garantidos, anos_inseridos = set(), set()
+    try:
+        if not usa_sqlite():
+            preparar_temporaria(cur)
+        lotes = ler_lotes(arquivo, formato, list(dict.fromkeys(mapeamento.values())), separador, encoding)
+        for lote in lotes:
+            lote.index = pd.RangeIndex(resultado.lidas, resultado.lidas + len(lote))
+            lancamentos, motivos, sem_registro = normalizar_lote(
+                lote, mapeamento, nome, banco_padrao, formato_data, decimal, registros_validos
+            )
+            if particionada:
+                anos = set(lancamentos["data"].dt.year.unique().tolist()) - anos_garantidos
+                garantir_particoes(cur, anos)
+                anos_garantidos |= anos
+            inseridas = gravar_lote(cur, lancamentos) if len(lancamentos) else 0
+            conn.commit()
+            if inseridas:
+                resultado.inseridas += inseridas
+                anos_inseridos |= set(lancamentos["data"].dt.year.unique().tolist())
+
+            resultado.lidas += len(lote)
+            resultado.rejeitadas += len(motivos)
+            resultado.sem_registro += sem_registro
+            for linha, motivo in motivos.head(EXEMPLOS_REJEITADAS - len(resultado.exemplos_rejeitadas)).items():
+                resultado.exemplos_rejeitadas.append(f"linha {linha + primeira_linha}: {motivo}")
+            if progresso:
+                progresso(resultado)
+
+        if resultado.inseridas:
+            # Estatísticas do planejador (e as estimativas de contagem) em dia
+            cur.execute("ANALYZE lancamentos")
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+        if anos_inseridos:
+            invalidar("lancamentos", anos=anos_inseridos)
+
+    resultado.segundos = time.perf_counter() - inicio
+    if resultado.lidas and resultado.rejeitadas == resultado.lidas:
+        raise ValueError(f"Nenhuma linha válida (confira o mapeamento e os formatos). {resultado.resumo()}")
+    return resultado
+
+
+if __name__ == "__main__":
+    import sys
+
+    def opcao(nome, padrao=None):
+        if nome in sys.argv:
+            return sys.argv[sys.argv.index(nome) + 1]
+        return padrao
+
+    if len(sys.argv) < 2 or sys.argv[1].startswith("--"):
+        print("Uso: python -m modules.carga_historica ARQUIVO [--data COLUNA] [--valor COLUNA] "
+              "[--historico COLUNA] [--banco COLUNA | --banco-padrao NOME] [--registro COLUNA] "
+              "[--formato-data FORMATO] [--decimal , | .] [--separador ;] [--encoding latin-1]")
+        sys.exit(1)
+
+    caminho = sys.argv[1]
+    formato = formato_arquivo(caminho)
+    separador, encoding = opcao("--separador"), opcao("--encoding")
+    if formato == "csv":
+        separador_detectado, encoding = detectar_csv(caminho, encoding)
+        separador = separador or separador_detectado
+    colunas = ler_amostra(caminho, formato, separador=separador, encoding=encoding).columns
+    mapeamento = sugerir_mapeamento(colunas)
+    mapeamento.update({campo: opcao(f"--{campo}") for campo in CAMPOS if opcao(f"--{campo}")})
+    print("Mapeamento: " + ", ".join(f"{CAMPOS[campo]} ← {coluna}" for campo, coluna in mapeamento.items()))
+
+    total = contar_linhas_arquivo(caminho, formato)
+    # O Streamlit em execução também precisa saber dos dados novos
+    from modules.invalidacao import avisar_outros_processos
+    avisar_outros_processos()
+
+    def numero(n):
+        return f"{n:,.0f}".replace(",", ".")
+
+    def mostrar(parcial):
+        feito = numero(parcial.lidas) + (f" de {numero(total)}" if total else "")
+        print(f"\r  {feito} linhas, {numero(parcial.inseridas)} inseridas", end="", flush=True)
+
+    resultado = carregar_arquivo(
+        caminho, mapeamento,
+        banco_padrao=opcao("--banco-padrao"),
+        formato_data=opcao("--formato-data"),
+        decimal=opcao("--decimal"),
+        separador=separador,
+        encoding=encoding,
+        progresso=mostrar,
+    )
+    print(f"\n{resultado.resumo()}")
+    print(f"{numero(resultado.lidas / max(resultado.segundos, 1e-9))} linhas/s em {resultado.segundos:.1f}s")
@@ -7,9 +7,13 @@
 #   - Listar lançamentos importados
 # ============================================================
 
+import json
 import streamlit as st
 import pandas as pd
-from modules.database import conectar, executar_query
+from datetime import date, timedelta
+from modules.database import conectar, executar_query, usa_sqlite, sql_inicio_periodo, sql_contem
+from modules.tipos import tipar_dataframe, TIPO_VALOR, TIPO_TEXTO
+from modules.cache import em_cache, invalidar, ano_de
 
 # ============================================================
 # 🔹 SALVAR UM LANÇAMENTO NO BANCO (EVITANDO DUPLICIDADE)
@@ -30,6 +34,7 @@ def salvar_lancamento(lanc):
         lanc["checknum"],
         lanc["assinatura"]
     ))
+    invalidar("lancamentos", anos={ano_de(lanc["data"])})
 
 # ============================================================
 # 🔹 SALVAR VÁRIOS LANÇAMENTOS (CONTROLE DE INSERIDOS/IGNORADOS)
@@ -48,27 +53,476 @@ def salvar_lancamentos(lancamentos):
 # ============================================================
 # 🔹 CARREGAR LANÇAMENTOS
 # ============================================================
-def carregar_lancamentos():
+SCHEMA_LANCAMENTOS = {
+    "id": "int64",
+    "data": "datetime64[ns]",
+    "valor": TIPO_VALOR,
+    "historico": TIPO_TEXTO,
+    "banco": "category",
+    "conta_registro": "category",
+    "mestre": "category",
+    "subchave": "category",
+    "mestre_nome": "category",
+    "subchave_nome": "category",
+    "registro_nome": "category",
+}
+
+@em_cache("lancamentos", "contas", ttl=300, periodo=("data_inicio", "data_fim"))
+def carregar_lancamentos(data_inicio=None, data_fim=None):
+    # Período opcional, comparado direto com l.data para que só as
+    # partições (anos) do período sejam lidas
+    where, params = filtros_sql(data_inicio, data_fim)
     conn = conectar()
-    query = """
+    query = f"""
         SELECT 
             l.id,
             l.data,
             l.valor,
             l.historico,
+            l.banco,
             l.conta_registro,
+            c.mestre,
+            c.subchave,
             c.mestre || ' - ' || c.nome_mestre AS mestre_nome,
             c.subchave || ' - ' || c.nome_subchave AS subchave_nome,
             c.registro || ' - ' || c.nome_registro AS registro_nome
         FROM lancamentos l
         LEFT JOIN contas c
             ON l.conta_registro = c.registro
+        {where}
         ORDER BY l.data DESC
     """
-    df = pd.read_sql(query, conn)
+    df = pd.read_sql(query, conn, params=params)
+    conn.close()
+    return tipar_dataframe(df, SCHEMA_LANCAMENTOS)
+
+# ============================================================
+# 🔹 FILTROS DO DASHBOARD EM SQL
+# ============================================================
+def filtros_sql(data_inicio=None, data_fim=None,
+                mestres=None, subchaves=None, registros=None):
+    # Monta o WHERE (alias l = lancamentos, c = contas) e os parâmetros
+    condicoes, params = [], []
+
+    if data_inicio:
+        condicoes.append("l.data >= %s")
+        params.append(data_inicio)
+    if data_fim:
+        condicoes.append("l.data <= %s")
+        params.append(data_fim)
+
+    for coluna, valores in (("c.mestre", mestres),
+                            ("c.subchave", subchaves),
+                            ("c.registro", registros)):
+        if valores:
+            condicoes.append(f"{coluna} IN ({', '.join(['%s'] * len(valores))})")
+            params.extend(valores)
+
+    where = "WHERE " + " AND ".join(condicoes) if condicoes else ""
+    return where, params
+
+# ============================================================
+# 🔹 PERÍODO: MESES COMPLETOS (RESUMO) + PONTAS (LANÇAMENTOS)
+# ============================================================
+def dividir_periodo(data_inicio=None, data_fim=None):
+    # Retorna ((mes_ini, mes_fim_exclusivo) | None, [(ini, fim), ...]):
+    # os meses completos do período são lidos de resumo_mensal e só os
+    # dias das pontas (no máximo dois meses parciais) vêm de lancamentos
+    mes_ini = None
+    if data_inicio:
+        mes_ini = data_inicio if data_inicio.day == 1 else \
+            (data_inicio.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+    mes_fim = None
+    if data_fim:
+        seguinte = data_fim + timedelta(days=1)
+        mes_fim = seguinte if seguinte.day == 1 else data_fim.replace(day=1)
+
+    if mes_ini and mes_fim and mes_ini >= mes_fim:
+        return None, [(data_inicio, data_fim)]
+
+    pontas = []
+    if data_inicio and data_inicio < mes_ini:
+        pontas.append((data_inicio, mes_ini - timedelta(days=1)))
+    if data_fim and mes_fim <= data_fim:
+        pontas.append((mes_fim, data_fim))
+    return (mes_ini, mes_fim), pontas
+
+def base_totais_sql(data_inicio=None, data_fim=None):
+    # Subconsulta (conta_registro, mes, valor, qtd) equivalente aos
+    # lançamentos do período, com custo proporcional a meses x contas,
+    # e não a linhas
+    meses, pontas = dividir_periodo(data_inicio, data_fim)
+    partes, params = [], []
+
+    if meses:
+        condicoes = ["TRUE"]
+        if meses[0]:
+            condicoes.append("mes >= %s")
+            params.append(meses[0])
+        if meses[1]:
+            condicoes.append("mes < %s")
+            params.append(meses[1])
+        partes.append(f"""
+            SELECT conta_registro, mes, total AS valor, qtd
+            FROM resumo_mensal
+            WHERE {" AND ".join(condicoes)}
+        """)
+
+    for inicio, fim in pontas:
+        partes.append(f"""
+            SELECT COALESCE(conta_registro, '') AS conta_registro,
+                   {sql_inicio_periodo("month", "data")} AS mes, valor, 1 AS qtd
+            FROM lancamentos
+            WHERE data >= %s AND data <= %s
+        """)
+        params.extend([inicio, fim])
+
+    return " UNION ALL ".join(partes), params
+
+# ============================================================
+# 🔹 INTERVALO DE DATAS DOS LANÇAMENTOS
+# ============================================================
+@em_cache("lancamentos")
+def carregar_intervalo_datas():
+    resultado = executar_query(
+        "SELECT MIN(data), MAX(data) FROM lancamentos",
+        fetch=True
+    )
+    if not resultado:
+        return None, None
+    # No SQLite, MIN/MAX de uma coluna de data voltam como texto
+    return tuple(date.fromisoformat(d) if isinstance(d, str) else d for d in resultado[0])
+
+# ============================================================
+# 🔹 TOTAIS POR MESTRE / SUBCHAVE / REGISTRO (ROLLUP)
+# ============================================================
+NIVEIS_ROLLUP = {0: "registro", 1: "subchave", 3: "mestre", 7: "geral"}
+
+@em_cache("lancamentos", "contas", periodo=("data_inicio", "data_fim"))
+def carregar_totais_hierarquia(data_inicio=None, data_fim=None,
+                               mestres=None, subchaves=None, registros=None):
+    # Uma única consulta devolve os totais e quantidades dos três níveis
+    # mais o total geral; a coluna "nivel" diz a qual nível a linha pertence.
+    # Os valores vêm do resumo mensal (ver base_totais_sql).
+    base, params_base = base_totais_sql(data_inicio, data_fim)
+    where, params = filtros_sql(mestres=mestres, subchaves=subchaves, registros=registros)
+    if usa_sqlite():
+        return totais_hierarquia_sem_rollup(base, where, params_base + params)
+
+    query = f"""
+        SELECT
+            c.mestre,
+            c.subchave,
+            c.registro,
+            MAX(c.nome_mestre) AS nome_mestre,
+            MAX(c.nome_subchave) AS nome_subchave,
+            MAX(c.nome_registro) AS nome_registro,
+            MIN(c.caminho) AS caminho,
+            SUM(b.valor) AS total,
+            COALESCE(SUM(b.qtd), 0) AS qtd,
+            GROUPING(c.mestre, c.subchave, c.registro) AS grupo
+        FROM ({base}) b
+        LEFT JOIN contas c
+            ON b.conta_registro = c.registro
+        {where}
+        GROUP BY ROLLUP (c.mestre, c.subchave, c.registro)
+        HAVING COALESCE(SUM(b.qtd), 0) > 0
+            OR GROUPING(c.mestre, c.subchave, c.registro) = 7
+        ORDER BY MIN(c.caminho), GROUPING(c.mestre, c.subchave, c.registro) DESC
+    """
+    conn = conectar()
+    df = pd.read_sql(query, conn, params=params_base + params)
+    conn.close()
+
+    df["nivel"] = df.pop("grupo").map(NIVEIS_ROLLUP)
+    df["total"] = df["total"].astype(float).fillna(0)
+    return df
+
+def totais_hierarquia_sem_rollup(base, where, params):
+    # Para motores sem ROLLUP (SQLite): o banco agrupa por registro e os
+    # subtotais de subchave, mestre e o total geral saem do pandas, no
+    # mesmo formato e ordem da consulta com ROLLUP
+    query = f"""
+        SELECT
+            c.mestre,
+            c.subchave,
+            c.registro,
+            MAX(c.nome_mestre) AS nome_mestre,
+            MAX(c.nome_subchave) AS nome_subchave,
+            MAX(c.nome_registro) AS nome_registro,
+            MIN(c.caminho) AS caminho,
+            SUM(b.valor) AS total,
+            COALESCE(SUM(b.qtd), 0) AS qtd
+        FROM ({base}) b
+        LEFT JOIN contas c
+            ON b.conta_registro = c.registro
+        {where}
+        GROUP BY c.mestre, c.subchave, c.registro
+    """
+    conn = conectar()
+    df = pd.read_sql(query, conn, params=params)
     conn.close()
+
+    df["total"] = df["total"].astype(float)
+    df["grupo"] = 0
+    niveis = [df]
+    for grupo, chaves in ((1, ["mestre", "subchave"]), (3, ["mestre"])):
+        nomes = ["nome_mestre", "nome_subchave"][:len(chaves)]
+        subtotal = df.groupby(chaves, dropna=False, sort=False).agg(
+            **{nome: (nome, "max") for nome in nomes},
+            caminho=("caminho", "min"),
+            total=("total", lambda v: v.sum(min_count=1)),
+            qtd=("qtd", "sum"),
+        ).reset_index()
+        subtotal["grupo"] = grupo
+        niveis.append(subtotal)
+    niveis.append(pd.DataFrame([{
+        "caminho": df["caminho"].dropna().min(),
+        "total": df["total"].sum(min_count=1),
+        "qtd": df["qtd"].sum(),
+        "grupo": 7,
+    }]))
+
+    df = pd.concat(niveis, ignore_index=True)
+    df = df[(df["qtd"] > 0) | (df["grupo"] == 7)]
+    df = df.sort_values(["caminho", "grupo"], ascending=[True, False], na_position="last", kind="stable")
+    df = df[["mestre", "subchave", "registro", "nome_mestre", "nome_subchave",
+             "nome_registro", "caminho", "total", "qtd", "grupo"]].reset_index(drop=True)
+
+    df["nivel"] = df.pop("grupo").map(NIVEIS_ROLLUP)
+    df["total"] = df["total"].astype(float).fillna(0)
     return df
 
+# ============================================================
+# 🔹 TOTAIS POR CONTA E PERÍODO (DFC)
+# ============================================================
+PERIODOS_SQL = {
+    "dia": "day",
+    "semana": "week",
+    "mes": "month",
+    "trimestre": "quarter",
+    "ano": "year",
+}
+
+@em_cache("lancamentos", "contas", periodo=("data_inicio", "data_fim"))
+def carregar_totais_periodo(periodicidade, data_inicio=None, data_fim=None,
+                            mestres=None, subchaves=None, registros=None):
+    # Uma linha por (período, registro) com date_trunc no banco. Períodos de
+    # mês para cima saem do resumo mensal; dia e semana, dos lançamentos.
+    unidade = PERIODOS_SQL[periodicidade]
+    if unidade in ("month", "quarter", "year"):
+        base, params_base = base_totais_sql(data_inicio, data_fim)
+        coluna_data = "b.mes"
+    else:
+        where_datas, params_base = filtros_sql(data_inicio, data_fim)
+        base = f"""
+            SELECT COALESCE(l.conta_registro, '') AS conta_registro, l.data, l.valor
+            FROM lancamentos l
+            {where_datas}
+        """
+        coluna_data = "b.data"
+
+    where, params = filtros_sql(mestres=mestres, subchaves=subchaves, registros=registros)
+    query = f"""
+        SELECT
+            {sql_inicio_periodo(unidade, coluna_data)} AS periodo,
+            c.mestre,
+            c.subchave,
+            c.registro,
+            MAX(c.nome_mestre) AS nome_mestre,
+            MAX(c.nome_subchave) AS nome_subchave,
+            MAX(c.nome_registro) AS nome_registro,
+            MIN(c.caminho) AS caminho,
+            SUM(b.valor) AS total
+        FROM ({base}) b
+        LEFT JOIN contas c
+            ON b.conta_registro = c.registro
+        {where}
+        GROUP BY 1, c.mestre, c.subchave, c.registro
+    """
+    conn = conectar()
+    df = pd.read_sql(query, conn, params=params_base + params)
+    conn.close()
+
+    df["periodo"] = pd.to_datetime(df["periodo"])
+    df["total"] = df["total"].astype(float)
+    return df
+
+@em_cache("lancamentos", "contas", periodo=(None, "data_inicio"))
+def carregar_saldo_anterior(data_inicio, mestres=None, subchaves=None, registros=None):
+    # Soma de tudo antes do período (saldo inicial do fluxo acumulado)
+    if not data_inicio:
+        return 0.0
+    base, params_base = base_totais_sql(None, data_inicio - timedelta(days=1))
+    where, params = filtros_sql(mestres=mestres, subchaves=subchaves, registros=registros)
+    resultado = executar_query(f"""
+        SELECT COALESCE(SUM(b.valor), 0)
+        FROM ({base}) b
+        LEFT JOIN contas c
+            ON b.conta_registro = c.registro
+        {where}
+    """, params_base + params, fetch=True)
+    return float(resultado[0][0]) if resultado else 0.0
+
+# ============================================================
+# 🔹 LANÇAMENTOS DE UM REGISTRO (DETALHE DO DASHBOARD, PAGINADO)
+# ============================================================
+TAMANHO_PAGINA_DETALHE = 50
+
+@em_cache("lancamentos", ttl=300, max_entries=256, periodo=("data_inicio", "data_fim"))
+def carregar_lancamentos_registro(registro, data_inicio=None, data_fim=None,
+                                  pagina=1, tamanho=TAMANHO_PAGINA_DETALHE):
+    # Busca e formata só uma página do registro aberto pelo usuário;
+    # o cache é por (registro, período, página)
+    from modules.formatacao import data_br_series, moeda_series
+
+    where, params = filtros_sql(data_inicio, data_fim)
+    where = (where + " AND " if where else "WHERE ") + "l.conta_registro = %s"
+    params.append(registro)
+
+    query = f"""
+        SELECT l.data, l.valor, l.historico
+        FROM lancamentos l
+        {where}
+        ORDER BY l.data, l.id
+        LIMIT %s OFFSET %s
+    """
+    conn = conectar()
+    df = pd.read_sql(query, conn, params=params + [tamanho, (pagina - 1) * tamanho])
+    conn.close()
+
+    df["data"] = data_br_series(df["data"])
+    df["valor"] = moeda_series(df["valor"])
+    return df
+
+# ============================================================
+# 🔹 LANÇAMENTOS IMPORTADOS (PAGINAÇÃO POR CHAVE)
+# ============================================================
+# A página seguinte começa depois da última linha da anterior:
+#   WHERE (l.data, l.id) < (%s, %s) ORDER BY l.data DESC, l.id DESC LIMIT n
+# O custo não depende da página (sem OFFSET) nem do tamanho da tabela.
+# Lançamentos sem data ficam fora da grade (aparecem nos pendentes).
+TAMANHO_PAGINA_IMPORTADOS = 100
+SEM_CLASSIFICACAO = "__sem_classificacao__"
+LIMITE_CONTAGEM_EXATA = 10_000
+
+def filtros_importados_sql(data=None, historico=None, conta=None, historico_exato=False):
+    # historico: trecho (ILIKE, usa o índice de trigramas) ou, com
+    # historico_exato, o histórico escolhido entre as sugestões da busca
+    from modules.busca import escapar_like
+
+    condicoes, params = ["l.data IS NOT NULL"], []
+
+    if data:
+        condicoes.append("l.data = %s")
+        params.append(data)
+    if historico and historico_exato:
+        condicoes.append("l.historico = %s")
+        params.append(historico)
+    elif historico:
+        condicoes.append(sql_contem("l.historico"))
+        params.append(f"%{escapar_like(historico)}%")
+    if conta == SEM_CLASSIFICACAO:
+        condicoes.append("l.conta_registro IS NULL")
+    elif conta:
+        condicoes.append("l.conta_registro = %s")
+        params.append(conta)
+
+    return "WHERE " + " AND ".join(condicoes), params
+
+@em_cache("lancamentos", "contas", ttl=300, max_entries=256, periodo=("data", "data"))
+def carregar_pagina_importados(depois_de=None, data=None, historico=None, conta=None,
+                               historico_exato=False, tamanho=TAMANHO_PAGINA_IMPORTADOS):
+    # depois_de: (data, id) da última linha da página anterior (None = 1ª).
+    # Retorna (df da página, chave da próxima página ou None se for a última)
+    where, params = filtros_importados_sql(data, historico, conta, historico_exato)
+    if depois_de:
+        # A comparação simples em l.data é redundante, mas é ela que
+        # permite descartar partições (a de tupla não é usada no pruning)
+        where += " AND l.data <= %s AND (l.data, l.id) < (%s, %s)"
+        params.extend([depois_de[0], *depois_de])
+
+    query = f"""
+        SELECT l.id, l.data, l.valor, l.historico, l.conta_registro, c.nome_registro
+        FROM lancamentos l
+        LEFT JOIN contas c
+            ON l.conta_registro = c.registro
+        {where}
+        ORDER BY l.data DESC, l.id DESC
+        LIMIT %s
+    """
+    # Uma linha a mais só para saber se existe próxima página
+    conn = conectar()
+    df = pd.read_sql(query, conn, params=params + [tamanho + 1])
+    conn.close()
+
+    proxima = None
+    if len(df) > tamanho:
+        df = df.iloc[:tamanho]
+        ultima = df.iloc[-1]
+        proxima = (ultima["data"], int(ultima["id"]))
+    return df, proxima
+
+@em_cache("lancamentos", ttl=300, periodo=("data", "data"))
+def contar_importados(data=None, historico=None, conta=None, historico_exato=False):
+    # Estimativa do planejador (EXPLAIN, sem ler a tabela); só conta de
+    # verdade quando a estimativa é pequena. Retorna (total, aproximado)
+    where, params = filtros_importados_sql(data, historico, conta, historico_exato)
+    if usa_sqlite():
+        # Sem estimativa do planejador: conta de verdade (o banco é local)
+        resultado = executar_query(f"SELECT COUNT(*) FROM lancamentos l {where}", params, fetch=True)
+        return resultado[0][0], False
+
+    conn = conectar()
+    cur = conn.cursor()
+    try:
+        cur.execute(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM lancamentos l {where}", params)
+        plano = cur.fetchone()[0]
+        if isinstance(plano, str):
+            plano = json.loads(plano)
+        estimativa = int(plano[0]["Plan"]["Plan Rows"])
+
+        if estimativa > LIMITE_CONTAGEM_EXATA:
+            return estimativa, True
+        cur.execute(f"SELECT COUNT(*) FROM lancamentos l {where}", params)
+        return cur.fetchone()[0], False
+    finally:
+        cur.close()
+        conn.close()
+
+# ============================================================
+# 🔹 LANÇAMENTOS PENDENTES DE CLASSIFICAÇÃO (PAGINAÇÃO POR CHAVE)
+# ============================================================
+# Mesma ideia da grade, pela chave id (inclui lançamentos sem data);
+# o índice parcial idx_lanc_pendentes só contém os sem classificação.
+TAMANHO_PAGINA_PENDENTES = 20
+
+@em_cache("lancamentos", ttl=300, max_entries=64)
+def carregar_pagina_pendentes(depois_de=None, tamanho=TAMANHO_PAGINA_PENDENTES):
+    # depois_de: id da última linha da página anterior (None = 1ª).
+    # Retorna (df da página, chave da próxima página ou None se for a última)
+    where, params = "WHERE l.conta_registro IS NULL", []
+    if depois_de is not None:
+        where += " AND l.id > %s"
+        params.append(depois_de)
+
+    conn = conectar()
+    df = pd.read_sql(f"""
+        SELECT l.id, l.data, l.valor, l.historico
+        FROM lancamentos l
+        {where}
+        ORDER BY l.id
+        LIMIT %s
+    """, conn, params=params + [tamanho + 1])
+    conn.close()
+
+    proxima = None
+    if len(df) > tamanho:
+        df = df.iloc[:tamanho]
+        proxima = int(df["id"].iloc[-1])
+    return df, proxima
+
 # ============================================================
 # 🔹 SALVAR CLASSIFICAÇÃO DE UM LANÇAMENTO
 # ============================================================
@@ -80,8 +534,12 @@ def classificar_lancamento(id_lancamento, conta_registro):
         UPDATE lancamentos
         SET conta_registro = %s
         WHERE id = %s
+        RETURNING data
     """, (conta_registro, id_lancamento))
+    anos = {ano_de(data) for (data,) in cur.fetchall()}
 
     conn.commit()
     cur.close()
     conn.close()
+    if anos:
+        invalidar("lancamentos", anos=anos)
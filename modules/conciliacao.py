@@ -0,0 +1,329 @@
+# ============================================================
+# 📘 MÓDULO: SALDOS E CONCILIAÇÃO DOS EXTRATOS
+# ------------------------------------------------------------
+# Responsável por:
+#   - Manter o saldo corrente de cada conta bancária (banco, conta)
+#     em lancamentos.saldo, na ordem (data, id)
+#   - Conferir cada extrato OFX com o saldo informado pelo banco
+#     (LEDGERBAL) e marcar divergências e períodos sem extrato
+# ------------------------------------------------------------
+# Incremental: saldo IS NULL marca as linhas ainda sem saldo (as recém
+# inseridas). Por conta, só a cauda a partir da menor data pendente é
+# recalculada, com uma soma em janela sobre (data, id) que começa do
+# saldo da linha anterior. Nada é recalculado desde o início.
+# O saldo de abertura de cada conta vem do primeiro extrato com saldo
+# (a âncora). Linhas novas anteriores a todas as outras recuam a
+# abertura, então o saldo das linhas antigas não muda. Uma âncora sem
+# lançamentos (extrato só com saldo, mês sem movimento) vale como
+# saldo da conta até a chegada das primeiras linhas.
+# Só linhas com conta (as lidas de um OFX) têm saldo: as da carga
+# histórica (modules.carga_historica) entram sem conta e são ignoradas
+# aqui, até um OFX com os mesmos lançamentos as associar à conta.
+# As funções recebem o cursor de quem importa: tudo roda na mesma
+# transação da gravação dos lançamentos.
+# ============================================================
+
+from datetime import date, timedelta
+from decimal import Decimal
+from functools import lru_cache
+
+import pandas as pd
+
+from modules.database import conectar, sql_coluna_id
+
+TOLERANCIA = Decimal("0.005")
+CENTAVO = Decimal("0.01")
+
+SITUACOES = {
+    "conciliado": "✅ Conciliado",
+    "divergente": "❌ Divergente",
+}
+
+# Recalcula o saldo da cauda de uma conta (linhas com data >= inicio)
+SQL_SALDO_CAUDA = """
+    UPDATE lancamentos
+    SET saldo = cauda.saldo
+    FROM (
+        SELECT
+            id,
+            data,
+            ROUND(
+                CAST(%(base)s AS NUMERIC)
+                + SUM(valor) OVER (ORDER BY data, id ROWS UNBOUNDED PRECEDING),
+                2
+            ) AS saldo
+        FROM lancamentos
+        WHERE banco = %(banco)s AND conta = %(conta)s AND data >= %(inicio)s
+    ) cauda
+    WHERE lancamentos.id = cauda.id
+      AND lancamentos.data = cauda.data
+      AND lancamentos.data >= %(inicio)s
+      AND lancamentos.saldo IS DISTINCT FROM cauda.saldo
+"""
+
+# ============================================================
+# 🔹 TABELA
+# ============================================================
+@lru_cache(maxsize=1)
+def criar_tabela_extratos():
+    # Um extrato por (banco, conta, data do saldo); reimportar atualiza
+    conn = conectar()
+    cur = conn.cursor()
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS extratos (
+            id {sql_coluna_id()},
+            banco TEXT NOT NULL,
+            conta TEXT NOT NULL,
+            codigo_banco TEXT,
+            arquivo_origem TEXT,
+            data_inicio DATE,
+            data_fim DATE,
+            data_saldo DATE NOT NULL,
+            saldo_informado NUMERIC(14,2) NOT NULL,
+            saldo_disponivel NUMERIC(14,2),
+            saldo_calculado NUMERIC(14,2),
+            diferenca NUMERIC(14,2),
+            situacao TEXT,
+            ancora BOOLEAN NOT NULL DEFAULT FALSE,
+            lacuna_inicio DATE,
+            lacuna_fim DATE,
+            importado_em TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (banco, conta, data_saldo)
+        )
+    """)
+    conn.commit()
+    cur.close()
+    conn.close()
+    return True
+
+# ============================================================
+# 🔹 SALDO CORRENTE
+# ============================================================
+def decimal(valor):
+    # NUMERIC do Postgres (Decimal) ou REAL do SQLite (float)
+    return Decimal(str(valor)).quantize(CENTAVO)
+
+def como_data(valor):
+    # MIN(data) no SQLite volta como texto
+    if valor is None or isinstance(valor, date):
+        return valor
+    return date.fromisoformat(str(valor)[:10])
+
+def saldo_abertura(cur, banco, conta):
+    # Saldo antes da primeira linha com saldo (0 numa conta nova)
+    cur.execute("""
+        SELECT data, saldo - valor FROM lancamentos
+        WHERE banco = %s AND conta = %s AND saldo IS NOT NULL
+        ORDER BY data, id
+        LIMIT 1
+    """, (banco, conta))
+    return cur.fetchone()
+
+def saldo_ancora(cur, banco, conta):
+    # (data, saldo) do extrato âncora da conta, ou None
+    cur.execute("""
+        SELECT data_saldo, saldo_informado FROM extratos
+        WHERE banco = %s AND conta = %s AND ancora
+    """, (banco, conta))
+    linha = cur.fetchone()
+    return (como_data(linha[0]), decimal(linha[1])) if linha else None
+
+def saldo_em(cur, banco, conta, dia):
+    # Saldo no fim do dia: o da última linha até ele, a abertura ou,
+    # numa conta ainda sem linhas, o da âncora
+    cur.execute("""
+        SELECT saldo FROM lancamentos
+        WHERE banco = %s AND conta = %s AND data <= %s AND saldo IS NOT NULL
+        ORDER BY data DESC, id DESC
+        LIMIT 1
+    """, (banco, conta, dia))
+    linha = cur.fetchone()
+    if linha:
+        return decimal(linha[0])
+    abertura = saldo_abertura(cur, banco, conta)
+    if abertura:
+        return decimal(abertura[1])
+    ancora = saldo_ancora(cur, banco, conta)
+    return ancora[1] if ancora else Decimal(0)
+
+def atualizar_saldos(cur, contas):
+    # contas: {(banco, conta)} que receberam linhas. Retorna, por conta
+    # recalculada, a data em que a cauda começou.
+    recalculadas = {}
+    for banco, conta in contas:
+        cur.execute("""
+            SELECT MIN(data) FROM lancamentos
+            WHERE banco = %s AND conta = %s AND saldo IS NULL
+        """, (banco, conta))
+        inicio = como_data(cur.fetchone()[0])
+        if inicio is None:
+            continue
+
+        cur.execute("""
+            SELECT saldo FROM lancamentos
+            WHERE banco = %s AND conta = %s AND data < %s
+            ORDER BY data DESC, id DESC
+            LIMIT 1
+        """, (banco, conta, inicio))
+        anterior = cur.fetchone()
+        if anterior:
+            base = decimal(anterior[0])
+        else:
+            # Nada antes da cauda: parte da abertura, recuada do que as
+            # linhas novas anteriores à primeira antiga somam
+            abertura = saldo_abertura(cur, banco, conta)
+            ancora = None if abertura else saldo_ancora(cur, banco, conta)
+            base = Decimal(0)
+            if abertura:
+                cur.execute("""
+                    SELECT COALESCE(SUM(valor), 0) FROM lancamentos
+                    WHERE banco = %s AND conta = %s AND saldo IS NULL AND data < %s
+                """, (banco, conta, abertura[0]))
+                base = decimal(abertura[1]) - decimal(cur.fetchone()[0])
+            elif ancora:
+                # Primeiras linhas de uma conta ancorada sem lançamentos:
+                # o saldo no fim do dia da âncora tem de ser o informado
+                cur.execute("""
+                    SELECT COALESCE(SUM(valor), 0) FROM lancamentos
+                    WHERE banco = %s AND conta = %s AND saldo IS NULL AND data <= %s
+                """, (banco, conta, ancora[0]))
+                base = ancora[1] - decimal(cur.fetchone()[0])
+
+        cur.execute(SQL_SALDO_CAUDA, {"base": base, "banco": banco, "conta": conta, "inicio": inicio})
+        recalculadas[(banco, conta)] = inicio
+    return recalculadas
+
+# ============================================================
+# 🔹 CONCILIAÇÃO
+# ============================================================
+def extratos_conferidos(extratos):
+    # Os que entram na conciliação: conta e saldo (LEDGERBAL) com data.
+    # Um extrato só com saldo, sem lançamentos, também é gravado.
+    return [e for e in extratos if e.conta and e.saldo is not None and e.data_saldo]
+
+def juntar(recalculadas, chave, desde):
+    # desde=None: a conta inteira
+    if desde is None or recalculadas.get(chave, desde) is None:
+        recalculadas[chave] = None
+    else:
+        recalculadas[chave] = min(recalculadas.get(chave, desde), desde)
+
+def conciliar(cur, extratos, recalculadas=None):
+    # Grava os extratos com conta e saldo, confere com o saldo corrente e
+    # revê os extratos já gravados das contas cujo saldo mudou. Preenche
+    # saldo_calculado, diferenca e situacao de cada extrato recebido.
+    recalculadas = dict(recalculadas or {})
+    conferidos = extratos_conferidos(extratos)
+
+    for extrato in conferidos:
+        chave = (extrato.banco, extrato.conta)
+        cur.execute("SELECT COUNT(*) FROM extratos WHERE banco = %s AND conta = %s AND ancora", chave)
+        ancora = cur.fetchone()[0] == 0
+        if ancora:
+            # Primeiro extrato da conta: desloca o saldo corrente para
+            # bater com o informado (a abertura passa a ser conhecida)
+            ajuste = decimal(extrato.saldo) - saldo_em(cur, *chave, extrato.data_saldo)
+            if ajuste:
+                cur.execute("""
+                    UPDATE lancamentos SET saldo = ROUND(saldo + %s, 2)
+                    WHERE banco = %s AND conta = %s AND saldo IS NOT NULL
+                """, (ajuste, *chave))
+                juntar(recalculadas, chave, None)
+
+        cur.execute("""
+            INSERT INTO extratos (banco, conta, codigo_banco, arquivo_origem, data_inicio, data_fim,
+                                  data_saldo, saldo_informado, saldo_disponivel, ancora)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (banco, conta, data_saldo) DO UPDATE
+            SET codigo_banco = excluded.codigo_banco,
+                arquivo_origem = excluded.arquivo_origem,
+                data_inicio = excluded.data_inicio,
+                data_fim = excluded.data_fim,
+                saldo_informado = excluded.saldo_informado,
+                saldo_disponivel = excluded.saldo_disponivel,
+                importado_em = CURRENT_TIMESTAMP
+        """, (
+            extrato.banco, extrato.conta, extrato.codigo_banco, extrato.arquivo_origem,
+            extrato.data_inicio, extrato.data_fim, extrato.data_saldo,
+            decimal(extrato.saldo),
+            None if extrato.saldo_disponivel is None else decimal(extrato.saldo_disponivel),
+            ancora,
+        ))
+        juntar(recalculadas, chave, date.fromisoformat(extrato.data_saldo))
+
+    for (banco, conta), desde in recalculadas.items():
+        reverificar_conta(cur, banco, conta, desde)
+
+    for extrato in conferidos:
+        cur.execute("""
+            SELECT saldo_calculado, diferenca, situacao FROM extratos
+            WHERE banco = %s AND conta = %s AND data_saldo = %s
+        """, (extrato.banco, extrato.conta, extrato.data_saldo))
+        calculado, diferenca, extrato.situacao = cur.fetchone()
+        extrato.saldo_calculado, extrato.diferenca = float(calculado), float(diferenca)
+    return conferidos
+
+def reverificar_conta(cur, banco, conta, desde=None):
+    # Confere de novo os extratos com saldo a partir de "desde" e refaz
+    # as lacunas (períodos entre extratos que nenhum deles cobre)
+    filtro, params = "", [banco, conta]
+    if desde is not None:
+        filtro, params = "AND data_saldo >= %s", params + [desde]
+    cur.execute(f"""
+        SELECT id, data_saldo, saldo_informado FROM extratos
+        WHERE banco = %s AND conta = %s {filtro}
+    """, params)
+    for extrato_id, data_saldo, informado in cur.fetchall():
+        calculado = saldo_em(cur, banco, conta, data_saldo)
+        diferenca = decimal(informado) - calculado
+        situacao = "conciliado" if abs(diferenca) < TOLERANCIA else "divergente"
+        cur.execute("""
+            UPDATE extratos SET saldo_calculado = %s, diferenca = %s, situacao = %s
+            WHERE id = %s
+        """, (calculado, diferenca, situacao, extrato_id))
+
+    cur.execute("""
+        SELECT id, data_inicio, data_fim, lacuna_inicio, lacuna_fim FROM extratos
+        WHERE banco = %s AND conta = %s AND data_inicio IS NOT NULL AND data_fim IS NOT NULL
+        ORDER BY data_inicio, data_fim
+    """, (banco, conta))
+    coberto_ate = None
+    for extrato_id, inicio, fim, lacuna_inicio, lacuna_fim in cur.fetchall():
+        lacuna = (None, None)
+        if coberto_ate is not None and inicio > coberto_ate + timedelta(days=1):
+            lacuna = (coberto_ate + timedelta(days=1), inicio - timedelta(days=1))
+        if lacuna != (lacuna_inicio, lacuna_fim):
+            cur.execute(
+                "UPDATE extratos SET lacuna_inicio = %s, lacuna_fim = %s WHERE id = %s",
+                (*lacuna, extrato_id)
+            )
+        coberto_ate = fim if coberto_ate is None else max(coberto_ate, fim)
+
+def resumo_conciliacao(extratos):
+    # Texto curto para a mensagem do job
+    partes = []
+    for e in extratos:
+        if e.situacao is None:
+            continue
+        texto = f"Conta {e.conta}: {SITUACOES[e.situacao]}"
+        if e.situacao == "divergente":
+            texto += f" (diferença de {e.diferenca:+.2f} em {e.data_saldo})"
+        partes.append(texto)
+    return "; ".join(partes)
+
+# ============================================================
+# 🔹 CONSULTA (PARA A PÁGINA)
+# ============================================================
+def consultar_extratos(limite=50):
+    # Extratos mais recentes por data do saldo, com a situação
+    criar_tabela_extratos()
+    conn = conectar()
+    df = pd.read_sql("""
+        SELECT banco, conta, data_inicio, data_fim, data_saldo, saldo_informado,
+               saldo_calculado, diferenca, situacao, lacuna_inicio, lacuna_fim, arquivo_origem
+        FROM extratos
+        ORDER BY data_saldo DESC, banco, conta
+        LIMIT %s
+    """, conn, params=(limite,))
+    conn.close()
+    return df
@@ -10,22 +10,41 @@
 #   - Servir como base para classificação de lançamentos
 # ============================================================
 
+import re
 import pandas as pd
-from modules.database import conectar
+from modules.database import conectar, executar_lote, usa_sqlite
+from modules.tipos import tipar_dataframe, TIPO_TEXTO
+from modules.cache import em_cache, invalidar
 
 # ============================================================
 # 🔹 1. CARREGAMENTO DAS CONTAS
 # ============================================================
+SCHEMA_CONTAS = {
+    coluna: TIPO_TEXTO for coluna in (
+        "mestre", "subchave", "registro",
+        "nome_mestre", "nome_subchave", "nome_registro", "caminho"
+    )
+}
 
-def carregar_contas():
+
+@em_cache("contas")
+def carregar_contas(prefixo=None):
+    # prefixo: carrega só a conta e as contas abaixo dela (ex: "1.0")
     conn = conectar()
-    df = pd.read_sql("""
+    filtro, params = "", ()
+    if prefixo:
+        caminho = caminho_codigo(prefixo)
+        filtro = "WHERE caminho = %s OR caminho LIKE %s"
+        params = (caminho, caminho + ".%")
+
+    df = pd.read_sql(f"""
         SELECT *
         FROM contas
-        ORDER BY mestre, subchave, registro
-    """, conn)
+        {filtro}
+        ORDER BY caminho
+    """, conn, params=params)
     conn.close()
-    return df
+    return tipar_dataframe(df, SCHEMA_CONTAS)
 
 # ============================================================
 # 🔹 2. INSERÇÃO DE NOVA CONTA
@@ -34,21 +53,28 @@ def carregar_contas():
 def inserir_conta(mestre, subchave, registro,
                   nome_mestre, nome_subchave, nome_registro):
 
+    for codigo in (mestre, subchave, registro):
+        if not validar_codigo(codigo):
+            raise ValueError(f"Código de conta inválido: {codigo!r}")
+
     conn = conectar()
     cur = conn.cursor()
 
     cur.execute("""
         INSERT INTO contas (
             mestre, subchave, registro,
-            nome_mestre, nome_subchave, nome_registro
+            nome_mestre, nome_subchave, nome_registro,
+            caminho
         )
-        VALUES (%s, %s, %s, %s, %s, %s)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
     """, (mestre, subchave, registro,
-          nome_mestre, nome_subchave, nome_registro))
+          nome_mestre, nome_subchave, nome_registro,
+          caminho_codigo(registro)))
 
     conn.commit()
     cur.close()
     conn.close()
+    invalidar("contas")
 
 # ============================================================
 # 🔹 3. EDIÇÃO DE CONTA EXISTENTE
@@ -74,6 +100,7 @@ def editar_conta(mestre, subchave, registro,
     conn.commit()
     cur.close()
     conn.close()
+    invalidar("contas")
 
 # ============================================================
 # 🔹 4. EXCLUSÃO DE CONTA
@@ -93,11 +120,146 @@ def excluir_conta(mestre, subchave, registro):
     conn.commit()
     cur.close()
     conn.close()
+    invalidar("contas")
 
 # ============================================================
-# 🔹 5. FUNÇÕES AUXILIARES
+# 🔹 5. ALTERAÇÕES EM LOTE (EDITOR DE CONTAS)
 # ============================================================
 
+CAMPOS_EDITAVEIS = ["nome_mestre", "nome_subchave", "nome_registro"]
+
+def calcular_alteracoes_contas(df_exibido, estado_editor):
+    # estado_editor é o st.session_state[key] do st.data_editor:
+    # {"edited_rows": {posição: {coluna: novo_valor}}, ...}
+    # Só entram as linhas em que algo realmente mudou.
+    alteradas, excluidas = [], []
+
+    def valor(v):
+        return None if pd.isna(v) else v
+
+    for posicao, mudancas in (estado_editor or {}).get("edited_rows", {}).items():
+        linha = df_exibido.iloc[int(posicao)]
+        chave = (linha["mestre"], linha["subchave"], linha["registro"])
+
+        novos = [valor(mudancas.get(campo, linha[campo])) for campo in CAMPOS_EDITAVEIS]
+        originais = [valor(linha[campo]) for campo in CAMPOS_EDITAVEIS]
+        if novos != originais:
+            alteradas.append(chave + tuple(novos))
+
+        if mudancas.get("excluir", False):
+            excluidas.append(chave)
+
+    return alteradas, excluidas
+
+
+def salvar_alteracoes_contas(alteradas=(), excluidas=()):
+    # Aplica atualizações e exclusões em uma única transação, com um
+    # statement por tipo. Retorna (alteradas, excluídas, lançamentos que
+    # ainda apontam para registros excluídos).
+    conn = conectar()
+    cur = conn.cursor()
+    try:
+        salvar = salvar_alteracoes_contas_sqlite if usa_sqlite() else salvar_alteracoes_contas_postgres
+        resultado = salvar(cur, alteradas, excluidas)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+    invalidar("contas")
+    return resultado
+
+def salvar_alteracoes_contas_postgres(cur, alteradas, excluidas):
+    qtd_alteradas, qtd_excluidas, lanc_orfaos = 0, 0, 0
+    if alteradas:
+        executar_lote(cur, """
+            UPDATE contas AS c
+            SET nome_mestre = v.nome_mestre,
+                nome_subchave = v.nome_subchave,
+                nome_registro = v.nome_registro
+            FROM (VALUES %s) AS v (
+                mestre, subchave, registro,
+                nome_mestre, nome_subchave, nome_registro
+            )
+            WHERE c.mestre = v.mestre
+              AND c.subchave = v.subchave
+              AND c.registro = v.registro
+        """, list(alteradas))
+        qtd_alteradas = cur.rowcount
+
+    if excluidas:
+        # Exclusão e verificação de lançamentos órfãos no mesmo statement
+        resultado = executar_lote(cur, """
+            WITH excluidas AS (
+                DELETE FROM contas AS c
+                USING (VALUES %s) AS v (mestre, subchave, registro)
+                WHERE c.mestre = v.mestre
+                  AND c.subchave = v.subchave
+                  AND c.registro = v.registro
+                RETURNING c.mestre, c.subchave, c.registro
+            )
+            SELECT
+                (SELECT COUNT(*) FROM excluidas),
+                (SELECT COUNT(*) FROM lancamentos l
+                 WHERE l.conta_registro IN (SELECT registro FROM excluidas)
+                   -- O statement ainda enxerga as linhas excluídas em contas:
+                   -- o registro só fica órfão se nenhuma outra linha o mantém
+                   AND NOT EXISTS (
+                       SELECT 1 FROM contas c
+                       WHERE c.registro = l.conta_registro
+                         AND NOT EXISTS (
+                             SELECT 1 FROM excluidas e
+                             WHERE e.mestre = c.mestre
+                               AND e.subchave = c.subchave
+                               AND e.registro = c.registro
+                         )
+                   ))
+        """, list(excluidas), fetch=True)
+        qtd_excluidas, lanc_orfaos = resultado[0]
+    return qtd_alteradas, qtd_excluidas, lanc_orfaos
+
+def salvar_alteracoes_contas_sqlite(cur, alteradas, excluidas):
+    # Sem UPDATE ... FROM (VALUES) nem DELETE ... USING: um statement
+    # preparado executado por linha, na mesma transação
+    qtd_alteradas, qtd_excluidas, lanc_orfaos = 0, 0, 0
+    if alteradas:
+        cur.executemany("""
+            UPDATE contas
+            SET nome_mestre = %s, nome_subchave = %s, nome_registro = %s
+            WHERE mestre = %s AND subchave = %s AND registro = %s
+        """, [(*linha[3:], *linha[:3]) for linha in alteradas])
+        qtd_alteradas = cur.rowcount
+
+    if excluidas:
+        cur.executemany(
+            "DELETE FROM contas WHERE mestre = %s AND subchave = %s AND registro = %s",
+            list(excluidas)
+        )
+        qtd_excluidas = cur.rowcount
+        registros = sorted({linha[2] for linha in excluidas})
+        cur.execute(f"""
+            SELECT COUNT(*) FROM lancamentos
+            WHERE conta_registro IN ({', '.join(['%s'] * len(registros))})
+              AND conta_registro NOT IN (SELECT registro FROM contas)
+        """, registros)
+        lanc_orfaos = cur.fetchone()[0]
+    return qtd_alteradas, qtd_excluidas, lanc_orfaos
+
+# ============================================================
+# 🔹 6. FUNÇÕES AUXILIARES
+# ============================================================
+
+# Códigos no formato "1", "1.0", "1.0.1"... com até 4 dígitos por nível
+LARGURA_NIVEL = 4
+PADRAO_CODIGO = re.compile(r"^\d{1,%d}(\.\d{1,%d})*$" % (LARGURA_NIVEL, LARGURA_NIVEL))
+
 def validar_codigo(codigo):
-    # TODO: implementar validação de formato
-    return True
+    return bool(PADRAO_CODIGO.match(str(codigo).strip()))
+
+def caminho_codigo(codigo):
+    # "1.10.2" -> "0001.0010.0002": ordena corretamente como texto
+    # (1.9 < 1.10) e permite buscar por prefixo no índice
+    return ".".join(parte.zfill(LARGURA_NIVEL) for parte in str(codigo).strip().split("."))
@@ -0,0 +1,320 @@
+# ============================================================
+# 📘 MÓDULO: DASHBOARD (MOTOR DE CÁLCULO)
+# ------------------------------------------------------------
+# Responsável por:
+#   - Receber os filtros do Dashboard (período e contas)
+#   - Montar a árvore Mestre → Subchave → Registro com totais
+#   - Calcular o total geral e os dados do gráfico de pizza
+#   - Memorizar o resultado por assinatura de filtros + versão dos
+#     dados (cada chamada recebe uma cópia: o memorizado é do processo)
+#   - Montar a DFC por período (dia/semana/mês/trimestre/ano) com
+#     fluxo, saldo acumulado e variação entre períodos
+# ------------------------------------------------------------
+# Não depende do Streamlit: o núcleo (montar_dashboard) recebe
+# um DataFrame de totais e pode ser testado/medido isoladamente.
+# ============================================================
+
+import copy
+from dataclasses import dataclass, field
+from datetime import date
+from functools import lru_cache
+from typing import Callable, Optional
+
+import pandas as pd
+
+from modules.perfil import medido
+
+# Mestre que não entra no gráfico de pizza
+MESTRE_FORA_PIZZA = "6"
+
+COLUNAS_TOTAIS = [
+    "mestre", "subchave", "registro",
+    "nome_mestre", "nome_subchave", "nome_registro",
+    "caminho", "total", "qtd", "nivel",
+]
+
+# ============================================================
+# 🔹 TIPOS
+# ============================================================
+@dataclass(frozen=True)
+class FiltrosDashboard:
+    data_inicio: Optional[date] = None
+    data_fim: Optional[date] = None
+    mestres: tuple = ()
+    subchaves: tuple = ()
+    registros: tuple = ()
+
+    @classmethod
+    def criar(cls, data_inicio=None, data_fim=None,
+              mestres=(), subchaves=(), registros=()):
+        # Listas vindas dos widgets viram tuplas (filtros precisam ser hasháveis)
+        return cls(data_inicio, data_fim,
+                   tuple(mestres), tuple(subchaves), tuple(registros))
+
+
+@dataclass
+class NoHierarquia:
+    codigo: str
+    nome: str
+    total: float
+    qtd: int
+    filhos: list = field(default_factory=list)
+
+
+@dataclass
+class DashboardResult:
+    filtros: FiltrosDashboard
+    arvore: list
+    total_geral: float
+    qtd_total: int
+    df_pizza: pd.DataFrame
+
+    @property
+    def vazio(self):
+        return self.qtd_total == 0
+
+
+@dataclass
+class DFCResult:
+    filtros: FiltrosDashboard
+    periodicidade: str
+    matriz: pd.DataFrame      # conta, nivel + uma coluna por período
+    fluxo: pd.Series          # total de cada período
+    saldo: pd.Series          # saldo acumulado ao fim de cada período
+    variacao: pd.Series       # % sobre o período anterior
+    saldo_inicial: float = 0.0
+
+    @property
+    def periodos(self):
+        return list(self.fluxo.index)
+
+    @property
+    def vazio(self):
+        return self.fluxo.empty
+
+# ============================================================
+# 🔹 NÚCLEO: TOTAIS (ROLLUP) → RESULTADO
+# ============================================================
+@medido("dashboard: árvore", linhas=lambda r: r.qtd_total)
+def montar_dashboard(df_totais, filtros=None):
+    # df_totais no formato de carregar_totais_hierarquia: uma linha por
+    # registro, subchave, mestre e o total geral, ordenadas pelo caminho
+    filtros = filtros or FiltrosDashboard()
+    df_niveis = df_totais[df_totais["mestre"].notna()]
+
+    subchaves_por_mestre = {
+        mestre: grupo for mestre, grupo in
+        df_niveis[df_niveis["nivel"] == "subchave"].groupby("mestre", sort=False)
+    }
+    registros_por_subchave = {
+        chave: grupo for chave, grupo in
+        df_niveis[df_niveis["nivel"] == "registro"].groupby(["mestre", "subchave"], sort=False)
+    }
+
+    arvore = []
+    for mes in df_niveis[df_niveis["nivel"] == "mestre"].itertuples():
+        no_mestre = NoHierarquia(mes.mestre, mes.nome_mestre, float(mes.total), int(mes.qtd))
+        if mes.mestre in subchaves_por_mestre:
+            for sub in subchaves_por_mestre[mes.mestre].itertuples():
+                no_sub = NoHierarquia(sub.subchave, sub.nome_subchave, float(sub.total), int(sub.qtd))
+                if (mes.mestre, sub.subchave) in registros_por_subchave:
+                    no_sub.filhos = [
+                        NoHierarquia(reg.registro, reg.nome_registro, float(reg.total), int(reg.qtd))
+                        for reg in registros_por_subchave[(mes.mestre, sub.subchave)].itertuples()
+                    ]
+                no_mestre.filhos.append(no_sub)
+        arvore.append(no_mestre)
+
+    df_geral = df_totais[df_totais["nivel"] == "geral"]
+
+    df_pizza = df_niveis[df_niveis["nivel"] == "mestre"]
+    df_pizza = df_pizza[df_pizza["mestre"] != MESTRE_FORA_PIZZA]
+    df_pizza = df_pizza[["mestre", "nome_mestre", "total"]].rename(columns={"total": "valor"})
+    df_pizza["valor"] = df_pizza["valor"].abs()
+
+    return DashboardResult(
+        filtros=filtros,
+        arvore=arvore,
+        total_geral=float(df_geral["total"].sum()),
+        qtd_total=int(df_geral["qtd"].sum()),
+        df_pizza=df_pizza.reset_index(drop=True),
+    )
+
+# ============================================================
+# 🔹 NÚCLEO: LANÇAMENTOS EM MEMÓRIA → TOTAIS
+# ============================================================
+def totais_de_lancamentos(df_lanc, df_contas, filtros=None):
+    # Mesmo resultado de carregar_totais_hierarquia, calculado em pandas a
+    # partir de lançamentos (data, valor, conta_registro) já em memória
+    filtros = filtros or FiltrosDashboard()
+    df = df_lanc[["data", "valor", "conta_registro"]]
+    datas = pd.to_datetime(df["data"], errors="coerce")
+    mascara = pd.Series(True, index=df.index)
+    if filtros.data_inicio:
+        mascara &= datas >= pd.Timestamp(filtros.data_inicio)
+    if filtros.data_fim:
+        mascara &= datas <= pd.Timestamp(filtros.data_fim)
+    df = df[mascara]
+
+    df = df.merge(df_contas, left_on="conta_registro", right_on="registro", how="left")
+    for coluna, valores in (("mestre", filtros.mestres),
+                            ("subchave", filtros.subchaves),
+                            ("registro", filtros.registros)):
+        if valores:
+            df = df[df[coluna].isin(valores)]
+
+    nomes = {"mestre": "nome_mestre", "subchave": "nome_subchave", "registro": "nome_registro"}
+    niveis = [
+        ("registro", ["mestre", "subchave", "registro"]),
+        ("subchave", ["mestre", "subchave"]),
+        ("mestre", ["mestre"]),
+    ]
+    partes = []
+    for nivel, chaves in niveis:
+        agregacoes = {nomes[c]: (nomes[c], "max") for c in chaves}
+        agregacoes.update(caminho=("caminho", "min"), total=("valor", "sum"), qtd=("valor", "size"))
+        parte = df.groupby(chaves, sort=False).agg(**agregacoes).reset_index()
+        parte["nivel"] = nivel
+        partes.append(parte)
+    partes.append(pd.DataFrame([{
+        "caminho": None, "total": float(df["valor"].sum()), "qtd": len(df), "nivel": "geral"
+    }]))
+
+    df_totais = pd.concat(partes, ignore_index=True).reindex(columns=COLUNAS_TOTAIS)
+    df_totais["ordem_nivel"] = df_totais["nivel"].map({"mestre": 0, "subchave": 1, "registro": 2, "geral": 3})
+    df_totais = df_totais.sort_values(["caminho", "ordem_nivel"], na_position="last", kind="stable")
+    return df_totais.drop(columns="ordem_nivel").reset_index(drop=True)
+
+# ============================================================
+# 🔹 NÚCLEO: TOTAIS POR PERÍODO → DFC
+# ============================================================
+PERIODICIDADES = {
+    "dia": "Diária",
+    "semana": "Semanal",
+    "mes": "Mensal",
+    "trimestre": "Trimestral",
+    "ano": "Anual",
+}
+
+def rotulo_periodo(periodo, periodicidade):
+    periodo = pd.Timestamp(periodo)
+    if periodicidade == "ano":
+        return f"{periodo.year}"
+    if periodicidade == "trimestre":
+        return f"T{periodo.quarter}/{periodo.year}"
+    if periodicidade == "mes":
+        return periodo.strftime("%m/%Y")
+    return periodo.strftime("%d/%m/%Y")
+
+@medido("dashboard: DFC por período", linhas=lambda r: len(r.matriz))
+def pivotar_dfc(df_periodos, filtros=None, periodicidade="mes", saldo_inicial=0.0):
+    # df_periodos no formato de carregar_totais_periodo: uma linha por
+    # (período, registro). Os subtotais de subchave e mestre saem de um
+    # pivot por nível, sem laço por conta ou por período.
+    filtros = filtros or FiltrosDashboard()
+    df = df_periodos.copy()
+    df["total"] = df["total"].astype(float)
+    periodos = sorted(df["periodo"].unique())
+
+    niveis = [
+        ("mestre", ["mestre"], "nome_mestre", 0),
+        ("subchave", ["mestre", "subchave"], "nome_subchave", 1),
+        ("registro", ["mestre", "subchave", "registro"], "nome_registro", 2),
+    ]
+    classificados = df[df["mestre"].notna()]
+    partes = []
+    for nivel, chaves, coluna_nome, profundidade in niveis:
+        codigo = chaves[-1]
+        base = classificados[classificados[codigo].notna()]
+        if base.empty:
+            continue
+        valores = base.pivot_table(
+            index=chaves, columns="periodo", values="total", aggfunc="sum", fill_value=0.0
+        )
+        info = base.groupby(chaves).agg(nome=(coluna_nome, "max"), caminho=("caminho", "min"))
+        parte = info.join(valores).reset_index()
+        parte["conta"] = "\u2003" * profundidade + parte[codigo].astype(str) + " - " + parte["nome"].fillna("")
+        parte["nivel"] = nivel
+        parte["ordem_nivel"] = profundidade
+        partes.append(parte)
+
+    sem_conta = df[df["mestre"].isna()]
+    if not sem_conta.empty:
+        parte = sem_conta.groupby("periodo")["total"].sum().to_frame().T.reset_index(drop=True)
+        parte["conta"] = "(sem classificação)"
+        parte["nivel"] = "mestre"
+        parte["caminho"] = None
+        parte["ordem_nivel"] = 0
+        partes.append(parte)
+
+    if partes:
+        matriz = pd.concat(partes, ignore_index=True)
+        matriz = matriz.sort_values(["caminho", "ordem_nivel"], na_position="last", kind="stable")
+        matriz = matriz.reindex(columns=["conta", "nivel"] + periodos)
+        matriz[periodos] = matriz[periodos].fillna(0.0)
+    else:
+        matriz = pd.DataFrame(columns=["conta", "nivel"])
+
+    fluxo = df.groupby("periodo")["total"].sum().reindex(periodos, fill_value=0.0)
+    saldo = saldo_inicial + fluxo.cumsum()
+    anterior = fluxo.shift(1)
+    variacao = ((fluxo - anterior) / anterior.abs() * 100).where(anterior != 0)
+
+    return DFCResult(
+        filtros=filtros,
+        periodicidade=periodicidade,
+        matriz=matriz.reset_index(drop=True),
+        fluxo=fluxo,
+        saldo=saldo,
+        variacao=variacao,
+        saldo_inicial=float(saldo_inicial),
+    )
+
+# ============================================================
+# 🔹 API: build_dashboard(filtros) -> DashboardResult
+# ============================================================
+@lru_cache(maxsize=32)
+def _build_memorizado(filtros, versao, carregar_totais):
+    df_totais = carregar_totais(
+        filtros.data_inicio, filtros.data_fim,
+        list(filtros.mestres), list(filtros.subchaves), list(filtros.registros)
+    )
+    return montar_dashboard(df_totais, filtros)
+
+def build_dashboard(filtros: FiltrosDashboard, versao=None,
+                    carregar_totais: Optional[Callable] = None) -> DashboardResult:
+    # versao: token dos dados (padrão: cache.versao("lancamentos", "contas")
+    # do período); o resultado é reaproveitado enquanto filtros e versão
+    # forem os mesmos
+    if versao is None:
+        from modules.cache import versao as versao_dados
+        versao = versao_dados("lancamentos", "contas", inicio=filtros.data_inicio, fim=filtros.data_fim)
+    if carregar_totais is None:
+        from modules.classificacao import carregar_totais_hierarquia as carregar_totais
+    return copy.deepcopy(_build_memorizado(filtros, versao, carregar_totais))
+
+# ============================================================
+# 🔹 API: build_dfc(filtros, periodicidade) -> DFCResult
+# ============================================================
+@lru_cache(maxsize=32)
+def _build_dfc_memorizado(filtros, periodicidade, versao, carregar_periodos, carregar_saldo):
+    contas = (list(filtros.mestres), list(filtros.subchaves), list(filtros.registros))
+    df_periodos = carregar_periodos(periodicidade, filtros.data_inicio, filtros.data_fim, *contas)
+    saldo_inicial = carregar_saldo(filtros.data_inicio, *contas) if carregar_saldo else 0.0
+    return pivotar_dfc(df_periodos, filtros, periodicidade, saldo_inicial)
+
+def build_dfc(filtros: FiltrosDashboard, periodicidade="mes", versao=None,
+              carregar_periodos: Optional[Callable] = None,
+              carregar_saldo: Optional[Callable] = None) -> DFCResult:
+    if periodicidade not in PERIODICIDADES:
+        raise ValueError(f"Periodicidade inválida: {periodicidade!r}")
+    if versao is None:
+        # O saldo inicial lê tudo antes do período: versão sem início
+        from modules.cache import versao as versao_dados
+        versao = versao_dados("lancamentos", "contas", fim=filtros.data_fim)
+    if carregar_periodos is None:
+        from modules.classificacao import carregar_totais_periodo as carregar_periodos
+        from modules.classificacao import carregar_saldo_anterior as carregar_saldo
+    return copy.deepcopy(
+        _build_dfc_memorizado(filtros, periodicidade, versao, carregar_periodos, carregar_saldo)
+    )
@@ -1,18 +1,152 @@
+import os
+import sqlite3
+import threading
+import warnings
 import psycopg2
+import psycopg2.extras
+import psycopg2.pool
+from contextlib import contextmanager
+from functools import lru_cache
 import streamlit as st
-import pandas as pd
+from datetime import date
+from modules.cache import invalidar, ano_de
+
+# Erros de banco dos dois motores (para os except de quem chama)
+ErroBanco = (psycopg2.Error, sqlite3.Error)
+
+# O pd.read_sql avisa a cada chamada com conexão que não é SQLAlchemy
+# nem sqlite3 pura: a do psycopg2 e a ConexaoSQLite (que traduz os %s)
+# são as conexões do sistema, usadas de propósito.
+warnings.filterwarnings(
+    "ignore", message="pandas only supports SQLAlchemy connectable", category=UserWarning
+)
+
+# ------------------------------------------------------------
+# 🔹 Motor do banco: Postgres (padrão) ou SQLite embutido
+# ------------------------------------------------------------
+# DFC_BANCO=sqlite (variável de ambiente ou st.secrets) usa o arquivo
+# de modules.banco_sqlite: instalação de uma empresa só, sem rede.
+# Postgres: versão 11 ou mais nova (partição DEFAULT, gatilhos com
+# EXECUTE FUNCTION).
+MOTORES = ("postgres", "sqlite")
+
+@lru_cache(maxsize=1)
+def motor():
+    escolhido = os.environ.get("DFC_BANCO")
+    if not escolhido:
+        try:
+            escolhido = st.secrets.get("DFC_BANCO")
+        except FileNotFoundError:   # sem secrets.toml
+            escolhido = None
+    escolhido = (escolhido or "postgres").lower()
+    if escolhido not in MOTORES:
+        raise ValueError(f"DFC_BANCO inválido: {escolhido!r} (use {' ou '.join(MOTORES)})")
+    return escolhido
+
+def usa_sqlite():
+    return motor() == "sqlite"
 
 # ------------------------------------------------------------
 # 🔹 Conexão com Supabase/Postgres
 # ------------------------------------------------------------
+# DFC_DSN (ex: "postgresql://..."), quando definida, tem precedência
+# sobre o st.secrets: usada por benchmarks e scripts fora do Streamlit.
+def parametros_conexao():
+    dsn = os.environ.get("DFC_DSN")
+    if dsn:
+        return {"dsn": dsn}
+    return {
+        "host": st.secrets["PGHOST"],
+        "port": st.secrets["PGPORT"],
+        "dbname": st.secrets["PGDATABASE"],
+        "user": st.secrets["PGUSER"],
+        "password": st.secrets["PGPASSWORD"],
+    }
+
 def conectar():
-    return psycopg2.connect(
-        host=st.secrets["PGHOST"],
-        port=st.secrets["PGPORT"],
-        dbname=st.secrets["PGDATABASE"],
-        user=st.secrets["PGUSER"],
-        password=st.secrets["PGPASSWORD"]
-    )
+    if usa_sqlite():
+        from modules import banco_sqlite
+        return banco_sqlite.conectar()
+    return psycopg2.connect(**parametros_conexao())
+
+# ------------------------------------------------------------
+# 🔹 Pool de conexões (um por processo)
+# ------------------------------------------------------------
+# Para consultas curtas e frequentes (login, permissões): evita abrir
+# uma conexão nova (TLS + autenticação) a cada chamada.
+# Tamanho: DFC_POOL_MAX (variável de ambiente ou st.secrets); o padrão
+# soma as sessões simultâneas e as threads dos jobs de importação, que
+# também pegam conexões daqui. Com o pool cheio, conexao() espera até
+# ESPERA_POOL_SEGUNDOS por uma devolução e então abre uma conexão avulsa.
+POOL_MIN, POOL_SESSOES = 1, 5
+THREADS_JOBS = 2            # modules.jobs.MAX_THREADS
+ESPERA_POOL_SEGUNDOS = 10
+
+def tamanho_pool():
+    configurado = os.environ.get("DFC_POOL_MAX")
+    if not configurado:
+        try:
+            configurado = st.secrets.get("DFC_POOL_MAX")
+        except FileNotFoundError:   # sem secrets.toml
+            configurado = None
+    return int(configurado) if configurado else POOL_SESSOES + THREADS_JOBS
+
+@st.cache_resource(show_spinner=False)
+def pool_conexoes():
+    # O semáforo conta as vagas: getconn() com o pool cheio falha na hora
+    tamanho = tamanho_pool()
+    pool = psycopg2.pool.ThreadedConnectionPool(min(POOL_MIN, tamanho), tamanho, **parametros_conexao())
+    return pool, threading.BoundedSemaphore(tamanho)
+
+@contextmanager
+def conexao_avulsa():
+    # Conexão própria, fechada no fim (commit ao sair; rollback em erro)
+    conn = conectar()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+@contextmanager
+def conexao():
+    # with conexao() as conn: ...  (commit ao sair; rollback em erro)
+    if usa_sqlite():
+        # Abrir o arquivo custa microssegundos: sem pool
+        with conexao_avulsa() as conn:
+            yield conn
+        return
+
+    pool, vagas = pool_conexoes()
+    if not vagas.acquire(timeout=ESPERA_POOL_SEGUNDOS):
+        print(f"[DEBUG] Pool de conexões cheio há {ESPERA_POOL_SEGUNDOS}s; usando conexão avulsa")
+        with conexao_avulsa() as conn:
+            yield conn
+        return
+
+    try:
+        conn = pool.getconn()
+        if conn.closed:
+            pool.putconn(conn, close=True)
+            conn = pool.getconn()
+        descartar = False
+        try:
+            yield conn
+            conn.commit()
+        except psycopg2.OperationalError:
+            # Conexão caiu (ex: servidor reiniciou): não volta para o pool
+            descartar = True
+            raise
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            pool.putconn(conn, close=descartar or bool(conn.closed))
+    finally:
+        vagas.release()
 
 # ------------------------------------------------------------
 # 🔹 Função genérica para executar queries
@@ -32,6 +166,58 @@ def executar_query(query, params=None, fetch=False):
     conn.close()
     return result
 
+# ------------------------------------------------------------
+# 🔹 Executar um comando com várias linhas em um único VALUES
+# ------------------------------------------------------------
+def executar_lote(cur, query, linhas, fetch=False):
+    # A query deve conter um único "VALUES %s"; todas as linhas vão
+    # no mesmo statement (uma ida ao banco, em vez de uma por linha)
+    if not linhas:
+        return [] if fetch else None
+    if usa_sqlite():
+        # Sem execute_values: executemany com uma tupla de placeholders
+        # (o SQLite prepara o statement uma vez e reaproveita)
+        query = query.replace("VALUES %s", f"VALUES ({', '.join(['%s'] * len(linhas[0]))})")
+        if not fetch:
+            cur.executemany(query, linhas)
+            return None
+        resultado = []
+        for linha in linhas:
+            cur.execute(query, linha)
+            resultado.extend(cur.fetchall())
+        return resultado
+    return psycopg2.extras.execute_values(
+        cur, query, linhas, page_size=len(linhas), fetch=fetch
+    )
+
+# ------------------------------------------------------------
+# 🔹 SQL que muda de um motor para o outro
+# ------------------------------------------------------------
+# Início do período (unidade: day, week, month, quarter, year) como DATE
+INICIO_PERIODO_SQLITE = {
+    "day": "date({coluna})",
+    "week": "date({coluna}, '-6 days', 'weekday 1')",
+    "month": "date({coluna}, 'start of month')",
+    "quarter": ("date({coluna}, 'start of month', "
+                "printf('-%%d months', (CAST(strftime('%%m', {coluna}) AS INTEGER) - 1) %% 3))"),
+    "year": "date({coluna}, 'start of year')",
+}
+
+def sql_inicio_periodo(unidade, coluna):
+    if usa_sqlite():
+        return INICIO_PERIODO_SQLITE[unidade].format(coluna=coluna)
+    return f"date_trunc('{unidade}', {coluna})::date"
+
+def sql_contem(coluna):
+    # Trecho sem diferenciar maiúsculas (padrão já escapado com busca.escapar_like)
+    if usa_sqlite():
+        return f"{coluna} LIKE %s ESCAPE '\\'"
+    return f"{coluna} ILIKE %s"
+
+def sql_coluna_id():
+    # Chave inteira gerada pelo banco
+    return "INTEGER PRIMARY KEY" if usa_sqlite() else "SERIAL PRIMARY KEY"
+
 # ------------------------------------------------------------
 # 🔹 Criar tabelas no banco Supabase
 # ------------------------------------------------------------
@@ -39,20 +225,17 @@ def criar_tabelas():
     conn = conectar()
     cur = conn.cursor()
 
-    # Tabela de lançamentos
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS lancamentos (
-            id SERIAL PRIMARY KEY,
-            data DATE,
-            valor NUMERIC(12,2),
-            banco TEXT,
-            historico TEXT,
-            conta_registro TEXT,
-            arquivo_origem TEXT,
-            -- 🔹 Constraint simplificada: só considera duplicado se data+valor+historico forem iguais
-            UNIQUE (data, valor, historico)
-        )
-    """)
+    if usa_sqlite():
+        from modules import banco_sqlite
+        banco_sqlite.criar_tabelas(cur)
+        conn.commit()
+        cur.close()
+        conn.close()
+        return
+
+    # Tabela de lançamentos (particionada por ano em instalações novas;
+    # bases antigas migram com: python -m modules.database particionar)
+    criar_tabela_lancamentos(cur)
 
     # Tabela de contas contábeis
     cur.execute("""
@@ -63,20 +246,367 @@ def criar_tabelas():
             nome_mestre TEXT,
             nome_subchave TEXT,
             nome_registro TEXT,
+            caminho TEXT COLLATE "C",
             PRIMARY KEY (mestre, subchave, registro)
         )
     """)
 
+    # Caminho materializado do registro (ex: "0001.0000.0001"), usado
+    # para ORDER BY e buscas por prefixo direto no índice
+    cur.execute('ALTER TABLE contas ADD COLUMN IF NOT EXISTS caminho TEXT COLLATE "C"')
+    cur.execute("""
+        UPDATE contas
+        SET caminho = (
+            SELECT string_agg(
+                CASE WHEN length(parte) < 4 THEN lpad(parte, 4, '0') ELSE parte END,
+                '.' ORDER BY n
+            )
+            FROM unnest(string_to_array(trim(registro), '.')) WITH ORDINALITY AS t(parte, n)
+        )
+        WHERE caminho IS NULL
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_contas_caminho ON contas (caminho)")
+
+    # Índices usados pelos filtros de período e pelo detalhe por registro
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_lanc_data ON lancamentos (data)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_lanc_conta_data ON lancamentos (conta_registro, data)")
+    # Paginação por chave (data DESC, id DESC) da grade de importados
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_lanc_data_id ON lancamentos (data, id)")
+    # Lista de pendentes de classificação (paginação por id)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_lanc_pendentes ON lancamentos (id) WHERE conta_registro IS NULL")
+
+    # Conta bancária do extrato (ACCTID do OFX) e saldo corrente depois do
+    # lançamento, mantidos por modules.conciliacao
+    criar_colunas_saldo(cur)
+    criar_indices_saldo(cur)
+
+    # Busca por histórico (trecho e aproximada). Sem permissão para criar a
+    # extensão, a busca usa o índice em memória de modules.busca.
+    cur.execute("SAVEPOINT trigramas")
+    try:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_lanc_historico_trgm
+            ON lancamentos USING gin (historico gin_trgm_ops)
+        """)
+        cur.execute("RELEASE SAVEPOINT trigramas")
+    except psycopg2.Error as e:
+        print(f"[DEBUG] pg_trgm indisponível: {e}")
+        cur.execute("ROLLBACK TO SAVEPOINT trigramas")
+
+    # Resumo mensal por banco e conta, mantido pelos gatilhos abaixo
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS resumo_mensal (
+            mes DATE NOT NULL,
+            banco TEXT NOT NULL DEFAULT '',
+            conta_registro TEXT NOT NULL DEFAULT '',
+            total NUMERIC(14,2) NOT NULL DEFAULT 0,
+            qtd INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (mes, banco, conta_registro)
+        )
+    """)
+    cur.execute("""
+        SELECT COUNT(*) FROM pg_trigger
+        WHERE tgrelid = 'lancamentos'::regclass AND tgname LIKE 'trg_resumo_%'
+    """)
+    if cur.fetchone()[0] < 3:
+        criar_gatilhos_resumo(cur)
+    else:
+        # Gatilhos já existem: só a função, que pode ter mudado de versão
+        criar_funcao_resumo(cur)
+
+    # Primeira execução com lançamentos já existentes: popular o resumo
+    cur.execute("""
+        SELECT NOT EXISTS (SELECT 1 FROM resumo_mensal)
+           AND EXISTS (SELECT 1 FROM lancamentos WHERE data IS NOT NULL)
+    """)
+    if cur.fetchone()[0]:
+        popular_resumo_mensal(cur)
+
+    # Partições do ano atual e do próximo sempre existem
+    if lancamentos_particionada(cur):
+        ano = date.today().year
+        garantir_particoes(cur, [ano, ano + 1])
+
     conn.commit()
     cur.close()
     conn.close()
 
 # ------------------------------------------------------------
-# 🔹 Importar contas de um Excel para Supabase
+# 🔹 Resumo mensal (mes, banco, conta_registro) incremental
 # ------------------------------------------------------------
-def importar_contas_excel(arquivo):
+def criar_funcao_resumo(cur):
+    # Gatilhos por statement com tabelas de transição: um INSERT em lote
+    # de N linhas atualiza o resumo com um único INSERT ... GROUP BY.
+    # No UPDATE só entram as linhas em que data, valor, banco ou
+    # conta_registro mudaram: a conciliação grava conta/saldo de contas
+    # inteiras sem mexer no resumo (gatilho por statement com tabelas
+    # de transição não aceita lista de colunas).
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION atualizar_resumo_mensal() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'UPDATE' THEN
+                INSERT INTO resumo_mensal AS r (mes, banco, conta_registro, total, qtd)
+                SELECT date_trunc('month', data)::date, COALESCE(banco, ''),
+                       COALESCE(conta_registro, ''), COALESCE(SUM(valor * sinal), 0), SUM(sinal)
+                FROM (
+                    SELECT a.data, a.valor, a.banco, a.conta_registro, -1 AS sinal
+                    FROM antigos a JOIN novos n ON n.id = a.id
+                    WHERE (a.data, a.valor, a.banco, a.conta_registro)
+                          IS DISTINCT FROM (n.data, n.valor, n.banco, n.conta_registro)
+                    UNION ALL
+                    SELECT n.data, n.valor, n.banco, n.conta_registro, 1
+                    FROM antigos a JOIN novos n ON n.id = a.id
+                    WHERE (a.data, a.valor, a.banco, a.conta_registro)
+                          IS DISTINCT FROM (n.data, n.valor, n.banco, n.conta_registro)
+                ) alteradas
+                WHERE data IS NOT NULL
+                GROUP BY 1, 2, 3
+                ON CONFLICT (mes, banco, conta_registro) DO UPDATE
+                SET total = r.total + EXCLUDED.total,
+                    qtd = r.qtd + EXCLUDED.qtd;
+            END IF;
+
+            IF TG_OP = 'DELETE' THEN
+                INSERT INTO resumo_mensal AS r (mes, banco, conta_registro, total, qtd)
+                SELECT date_trunc('month', data)::date, COALESCE(banco, ''),
+                       COALESCE(conta_registro, ''), -COALESCE(SUM(valor), 0), -COUNT(*)
+                FROM antigos
+                WHERE data IS NOT NULL
+                GROUP BY 1, 2, 3
+                ON CONFLICT (mes, banco, conta_registro) DO UPDATE
+                SET total = r.total + EXCLUDED.total,
+                    qtd = r.qtd + EXCLUDED.qtd;
+            END IF;
+
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO resumo_mensal AS r (mes, banco, conta_registro, total, qtd)
+                SELECT date_trunc('month', data)::date, COALESCE(banco, ''),
+                       COALESCE(conta_registro, ''), COALESCE(SUM(valor), 0), COUNT(*)
+                FROM novos
+                WHERE data IS NOT NULL
+                GROUP BY 1, 2, 3
+                ON CONFLICT (mes, banco, conta_registro) DO UPDATE
+                SET total = r.total + EXCLUDED.total,
+                    qtd = r.qtd + EXCLUDED.qtd;
+            END IF;
+
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+def criar_gatilhos_resumo(cur):
+    # DROP + CREATE na mesma transação (CREATE OR REPLACE TRIGGER só
+    # existe a partir do Postgres 14)
+    criar_funcao_resumo(cur)
+    for gatilho in ("trg_resumo_insert", "trg_resumo_update", "trg_resumo_delete"):
+        cur.execute(f"DROP TRIGGER IF EXISTS {gatilho} ON lancamentos")
+    cur.execute("""
+        CREATE TRIGGER trg_resumo_insert
+        AFTER INSERT ON lancamentos
+        REFERENCING NEW TABLE AS novos
+        FOR EACH STATEMENT EXECUTE FUNCTION atualizar_resumo_mensal()
+    """)
+    cur.execute("""
+        CREATE TRIGGER trg_resumo_update
+        AFTER UPDATE ON lancamentos
+        REFERENCING OLD TABLE AS antigos NEW TABLE AS novos
+        FOR EACH STATEMENT EXECUTE FUNCTION atualizar_resumo_mensal()
+    """)
+    cur.execute("""
+        CREATE TRIGGER trg_resumo_delete
+        AFTER DELETE ON lancamentos
+        REFERENCING OLD TABLE AS antigos
+        FOR EACH STATEMENT EXECUTE FUNCTION atualizar_resumo_mensal()
+    """)
+
+def popular_resumo_mensal(cur):
+    # Recalcula tudo a partir dos lançamentos (bloqueia escritas enquanto isso)
+    if usa_sqlite():
+        from modules import banco_sqlite
+        banco_sqlite.popular_resumo_mensal(cur)
+        return
+    cur.execute("LOCK TABLE lancamentos IN SHARE MODE")
+    cur.execute("TRUNCATE resumo_mensal")
+    cur.execute("""
+        INSERT INTO resumo_mensal (mes, banco, conta_registro, total, qtd)
+        SELECT date_trunc('month', data)::date, COALESCE(banco, ''),
+               COALESCE(conta_registro, ''), COALESCE(SUM(valor), 0), COUNT(*)
+        FROM lancamentos
+        WHERE data IS NOT NULL
+        GROUP BY 1, 2, 3
+    """)
+
+def reconstruir_resumo_mensal():
+    # Reconstrução completa, para reparo: python -m modules.database reconstruir-resumo
+    conn = conectar()
+    cur = conn.cursor()
+    popular_resumo_mensal(cur)
+    conn.commit()
+    cur.close()
+    conn.close()
+    invalidar("lancamentos")
+
+# ------------------------------------------------------------
+# 🔹 Lançamentos particionados por ano (data)
+# ------------------------------------------------------------
+# Cada ano fica em lancamentos_<ano>; consultas com "l.data >= %s AND
+# l.data <= %s" só leem as partições do período (partition pruning).
+# Lançamentos sem data (ou de um ano ainda sem partição) caem em
+# lancamentos_default até a partição do ano ser criada.
+def criar_tabela_lancamentos(cur, nome="lancamentos"):
+    # A chave única precisa conter a coluna de partição: (id, data) no
+    # lugar da PRIMARY KEY (id), que obrigaria data NOT NULL
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL", (nome,))
+    if cur.fetchone()[0]:
+        return
+
+    cur.execute(f"""
+        CREATE TABLE {nome} (
+            id SERIAL,
+            data DATE,
+            valor NUMERIC(12,2),
+            banco TEXT,
+            historico TEXT,
+            conta_registro TEXT,
+            arquivo_origem TEXT,
+            conta TEXT,
+            saldo NUMERIC(14,2),
+            UNIQUE (id, data),
+            -- 🔹 Constraint simplificada: só considera duplicado se data+valor+historico forem iguais
+            UNIQUE (data, valor, historico)
+        ) PARTITION BY RANGE (data)
+    """)
+    cur.execute(f"CREATE TABLE {nome}_default PARTITION OF {nome} DEFAULT")
+
+def criar_colunas_saldo(cur, tabela="lancamentos"):
+    # Bases anteriores à conciliação não têm as colunas
+    cur.execute(f"ALTER TABLE {tabela} ADD COLUMN IF NOT EXISTS conta TEXT")
+    cur.execute(f"ALTER TABLE {tabela} ADD COLUMN IF NOT EXISTS saldo NUMERIC(14,2)")
+
+def criar_indices_saldo(cur):
+    # Ordem do saldo corrente de cada conta e fila dos que ainda não têm
+    # saldo (só lançamentos com conta bancária; os dois motores)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_lanc_conta_bancaria
+        ON lancamentos (banco, conta, data, id) WHERE conta IS NOT NULL
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_lanc_saldo_pendente
+        ON lancamentos (banco, conta, data) WHERE conta IS NOT NULL AND saldo IS NULL
+    """)
+
+def lancamentos_particionada(cur, tabela="lancamentos"):
+    if usa_sqlite():
+        return False
+    cur.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = %s::regclass", (tabela,))
+    return cur.fetchone()[0]
+
+def criar_particao_ano(cur, ano, tabela="lancamentos"):
+    nome = f"{tabela}_{int(ano)}"
+    inicio, fim = date(ano, 1, 1), date(ano + 1, 1, 1)
+
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL", (nome,))
+    if cur.fetchone()[0]:
+        return False
+
+    cur.execute("""
+        SELECT EXISTS (SELECT 1 FROM {tabela}_default WHERE data >= %s AND data < %s)
+    """.format(tabela=tabela), (inicio, fim))
+    if cur.fetchone()[0]:
+        # Linhas do ano já estão na partição padrão: move para a tabela
+        # nova antes de anexá-la (direto nas partições, sem passar pelos
+        # gatilhos do resumo, que continuam valendo)
+        cur.execute(f"CREATE TABLE {nome} (LIKE {tabela} INCLUDING DEFAULTS)")
+        cur.execute(f"""
+            WITH movidos AS (
+                DELETE FROM {tabela}_default
+                WHERE data >= %s AND data < %s
+                RETURNING *
+            )
+            INSERT INTO {nome} SELECT * FROM movidos
+        """, (inicio, fim))
+        cur.execute(f"ALTER TABLE {tabela} ATTACH PARTITION {nome} FOR VALUES FROM (%s) TO (%s)", (inicio, fim))
+    else:
+        cur.execute(f"CREATE TABLE {nome} PARTITION OF {tabela} FOR VALUES FROM (%s) TO (%s)", (inicio, fim))
+    return True
+
+def garantir_particoes(cur, anos, tabela="lancamentos"):
+    # Cria as partições que faltam; retorna os anos criados
+    return [ano for ano in sorted({int(a) for a in anos if a}) if criar_particao_ano(cur, ano, tabela)]
+
+def migrar_para_particionada():
+    # Troca a tabela comum por uma particionada, copiando tudo numa única
+    # transação. A tabela antiga fica como lancamentos_legado.
+    if usa_sqlite():
+        raise ValueError("Particionamento só existe no Postgres.")
     conn = conectar()
-    df = pd.read_excel(arquivo)
+    cur = conn.cursor()
+    try:
+        if lancamentos_particionada(cur):
+            return 0
+
+        cur.execute("LOCK TABLE lancamentos IN ACCESS EXCLUSIVE MODE")
+        # A cópia lê conta/saldo: bases antigas ganham as colunas antes
+        criar_colunas_saldo(cur)
+        cur.execute("ALTER TABLE lancamentos RENAME TO lancamentos_legado")
+        # Índices e constraints têm nomes globais no schema
+        cur.execute("""
+            SELECT indexname FROM pg_indexes
+            WHERE schemaname = current_schema() AND tablename = 'lancamentos_legado'
+        """)
+        for (indice,) in cur.fetchall():
+            cur.execute(f'ALTER INDEX "{indice}" RENAME TO "{indice}_legado"')
+        for gatilho in ("trg_resumo_insert", "trg_resumo_update", "trg_resumo_delete"):
+            cur.execute(f"DROP TRIGGER IF EXISTS {gatilho} ON lancamentos_legado")
+
+        criar_tabela_lancamentos(cur)
+        cur.execute("""
+            SELECT DISTINCT EXTRACT(YEAR FROM data)::int
+            FROM lancamentos_legado WHERE data IS NOT NULL
+        """)
+        ano = date.today().year
+        garantir_particoes(cur, [a for (a,) in cur.fetchall()] + [ano, ano + 1])
+
+        cur.execute("""
+            INSERT INTO lancamentos (id, data, valor, banco, historico, conta_registro, arquivo_origem, conta, saldo)
+            SELECT id, data, valor, banco, historico, conta_registro, arquivo_origem, conta, saldo
+            FROM lancamentos_legado
+        """)
+        copiados = cur.rowcount
+        cur.execute("""
+            SELECT setval(pg_get_serial_sequence('lancamentos', 'id'),
+                          COALESCE((SELECT MAX(id) FROM lancamentos), 0) + 1, false)
+        """)
+
+        # Gatilhos só depois da cópia: o resumo mensal não muda
+        criar_gatilhos_resumo(cur)
+        cur.execute("ANALYZE lancamentos")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+    invalidar("lancamentos")
+    return copiados
+
+# ------------------------------------------------------------
+# 🔹 Importar contas de um Excel para Supabase
+# ------------------------------------------------------------
+LINHAS_POR_LOTE_CONTAS = 500
+
+def importar_contas_excel(arquivo, progresso=None):
+    # progresso(processadas, total), chamado a cada lote gravado.
+    # Retorna o número de contas gravadas.
+    import pandas as pd
+    from modules.contas import validar_codigo, caminho_codigo
+
+    # Ler tudo como texto: códigos como 1.10 não podem virar 1.1
+    df = pd.read_excel(arquivo, dtype=str)
     df = df.rename(columns={
         "MESTRE": "mestre",
         "NOME MESTRE": "nome_mestre",
@@ -86,28 +616,51 @@ def importar_contas_excel(arquivo):
         "NOME REGISTRO": "nome_registro"
     })
 
+    for coluna in ("mestre", "subchave", "registro"):
+        df[coluna] = df[coluna].str.strip()
+        invalidos = df.loc[~df[coluna].map(validar_codigo), coluna]
+        if not invalidos.empty:
+            raise ValueError(f"Códigos de {coluna} inválidos: {', '.join(invalidos.astype(str).head(10))}")
+
+    # Uma mesma chave duas vezes no mesmo INSERT ... ON CONFLICT DO UPDATE
+    # é erro no Postgres: vale a última linha da planilha
+    df = df.drop_duplicates(subset=["mestre", "subchave", "registro"], keep="last")
+    linhas = [
+        (
+            str(row.mestre), str(row.nome_mestre),
+            str(row.subchave), str(row.nome_subchave),
+            str(row.registro), str(row.nome_registro),
+            caminho_codigo(row.registro)
+        )
+        for row in df.itertuples(index=False)
+    ]
+
+    conn = conectar()
     cur = conn.cursor()
-    for _, row in df.iterrows():
-        cur.execute("""
-            INSERT INTO contas (mestre, nome_mestre, subchave, nome_subchave, registro, nome_registro)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            ON CONFLICT (mestre, subchave, registro)
-            DO UPDATE SET
-                nome_mestre = EXCLUDED.nome_mestre,
-                nome_subchave = EXCLUDED.nome_subchave,
-                nome_registro = EXCLUDED.nome_registro
-        """, (
-            str(row["mestre"]),
-            str(row["nome_mestre"]),
-            str(row["subchave"]),
-            str(row["nome_subchave"]),
-            str(row["registro"]),
-            str(row["nome_registro"])
-        ))
+    try:
+        for inicio in range(0, len(linhas), LINHAS_POR_LOTE_CONTAS):
+            executar_lote(cur, """
+                INSERT INTO contas (mestre, nome_mestre, subchave, nome_subchave, registro, nome_registro, caminho)
+                VALUES %s
+                ON CONFLICT (mestre, subchave, registro)
+                DO UPDATE SET
+                    nome_mestre = EXCLUDED.nome_mestre,
+                    nome_subchave = EXCLUDED.nome_subchave,
+                    nome_registro = EXCLUDED.nome_registro,
+                    caminho = EXCLUDED.caminho
+            """, linhas[inicio:inicio + LINHAS_POR_LOTE_CONTAS])
+            if progresso:
+                progresso(min(inicio + LINHAS_POR_LOTE_CONTAS, len(linhas)), len(linhas))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
 
-    conn.commit()
-    cur.close()
-    conn.close()
+    invalidar("contas")
+    return len(linhas)
 
 # ------------------------------------------------------------
 # 🔹 Atualizar lançamentos (classificação)
@@ -119,7 +672,26 @@ def atualizar_lancamentos(id_lancamentos, registro):
         UPDATE lancamentos
         SET conta_registro = %s
         WHERE id = %s
+        RETURNING data
     """, (registro, id_lancamentos))
+    anos = {ano_de(data) for (data,) in cursor.fetchall()}
     conn.commit()
     cursor.close()
     conn.close()
+    if anos:
+        invalidar("lancamentos", anos=anos)
+
+
+if __name__ == "__main__":
+    import sys
+    from modules.invalidacao import avisar_outros_processos
+
+    avisar_outros_processos()
+    if sys.argv[1:] == ["reconstruir-resumo"]:
+        reconstruir_resumo_mensal()
+        print("Resumo mensal reconstruído.")
+    elif sys.argv[1:] == ["particionar"]:
+        copiados = migrar_para_particionada()
+        print(f"{copiados} lançamentos copiados para a tabela particionada (antiga: lancamentos_legado).")
+    else:
+        print("Uso: python -m modules.database reconstruir-resumo | particionar")
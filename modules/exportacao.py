@@ -0,0 +1,215 @@
+# ============================================================
+# 📘 MÓDULO: EXPORTAÇÃO DE LANÇAMENTOS
+# ------------------------------------------------------------
+# Responsável por:
+#   - Gerar o arquivo só quando o usuário pede (não a cada rerun)
+#   - Ler os lançamentos filtrados com cursor no servidor, em lotes
+#   - Escrever Excel (modo write-only), CSV ou Parquet em disco,
+#     com memória constante independente do número de linhas
+#   - Limitar o número de linhas e medir o tempo de geração
+#   - Apagar arquivos esquecidos (sessões encerradas) a cada exportação
+# ============================================================
+
+import csv
+import glob
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+
+from modules.database import conectar
+from modules.classificacao import filtros_sql
+from modules.perfil import medido
+
+LINHAS_POR_LOTE = 5_000
+PREFIXO_ARQUIVO = "dfc_export_"
+# Arquivos mais antigos que isso são de sessões que já acabaram
+HORAS_VALIDADE = 6
+
+FORMATOS = {
+    "xlsx": {
+        "rotulo": "Excel (.xlsx)",
+        "mime": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        "limite": 1_048_575,   # limite de linhas de uma planilha do Excel
+    },
+    "csv": {
+        "rotulo": "CSV (.csv)",
+        "mime": "text/csv",
+        "limite": 10_000_000,
+    },
+    "parquet": {
+        "rotulo": "Parquet (.parquet)",
+        "mime": "application/vnd.apache.parquet",
+        "limite": 50_000_000,
+    },
+}
+
+COLUNAS = [
+    "id", "data", "valor", "historico", "banco", "conta_registro",
+    "mestre", "nome_mestre", "subchave", "nome_subchave",
+    "registro", "nome_registro",
+]
+
+
+@dataclass
+class ResultadoExportacao:
+    caminho: str
+    formato: str
+    linhas: int
+    segundos: float
+    truncado: bool
+
+    @property
+    def nome_arquivo(self):
+        return f"lancamentos_filtrados.{self.formato}"
+
+    @property
+    def mime(self):
+        return FORMATOS[self.formato]["mime"]
+
+# ============================================================
+# 🔹 LEITURA EM LOTES (CURSOR NO SERVIDOR)
+# ============================================================
+def ler_lotes(filtros, limite):
+    # Gera listas de tuplas (no máximo LINHAS_POR_LOTE por vez); só as
+    # linhas do lote atual ficam em memória
+    where, params = filtros_sql(
+        filtros.data_inicio, filtros.data_fim,
+        filtros.mestres, filtros.subchaves, filtros.registros
+    )
+    query = f"""
+        SELECT l.id, l.data, l.valor, l.historico, l.banco, l.conta_registro,
+               c.mestre, c.nome_mestre, c.subchave, c.nome_subchave,
+               c.registro, c.nome_registro
+        FROM lancamentos l
+        LEFT JOIN contas c
+            ON l.conta_registro = c.registro
+        {where}
+        ORDER BY l.data, l.id
+        LIMIT %s
+    """
+    conn = conectar()
+    cur = conn.cursor(name="exportacao_lancamentos")
+    cur.itersize = LINHAS_POR_LOTE
+    try:
+        cur.execute(query, params + [limite])
+        while True:
+            lote = cur.fetchmany(LINHAS_POR_LOTE)
+            if not lote:
+                break
+            yield lote
+    finally:
+        cur.close()
+        conn.close()
+
+# ============================================================
+# 🔹 ESCRITORES POR FORMATO
+# ============================================================
+def escrever_xlsx(lotes, caminho):
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Lançamentos")
+    ws.append(COLUNAS)
+    linhas = 0
+    for lote in lotes:
+        for linha in lote:
+            ws.append(linha)
+        linhas += len(lote)
+    wb.save(caminho)
+    return linhas
+
+def escrever_csv(lotes, caminho):
+    linhas = 0
+    with open(caminho, "w", newline="", encoding="utf-8-sig") as arquivo:
+        writer = csv.writer(arquivo, delimiter=";")
+        writer.writerow(COLUNAS)
+        for lote in lotes:
+            writer.writerows(lote)
+            linhas += len(lote)
+    return linhas
+
+def escrever_parquet(lotes, caminho):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("data", pa.date32()),
+        ("valor", pa.decimal128(12, 2)),
+    ] + [(coluna, pa.string()) for coluna in COLUNAS[3:]])
+
+    linhas = 0
+    with pq.ParquetWriter(caminho, schema) as writer:
+        for lote in lotes:
+            colunas = list(zip(*lote))
+            writer.write_batch(pa.record_batch(
+                [pa.array(valores, type=campo.type) for valores, campo in zip(colunas, schema)],
+                schema=schema
+            ))
+            linhas += len(lote)
+    return linhas
+
+ESCRITORES = {
+    "xlsx": escrever_xlsx,
+    "csv": escrever_csv,
+    "parquet": escrever_parquet,
+}
+
+# ============================================================
+# 🔹 EXPORTAR (SOB DEMANDA)
+# ============================================================
+@medido("exportação", linhas=lambda r: r.linhas)
+def exportar_lancamentos(filtros, formato="xlsx"):
+    # filtros: modules.dashboard.FiltrosDashboard
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de exportação inválido: {formato!r}")
+
+    limpar_exportacoes_antigas()
+    limite = FORMATOS[formato]["limite"]
+    descritor, caminho = tempfile.mkstemp(prefix=PREFIXO_ARQUIVO, suffix=f".{formato}")
+    os.close(descritor)
+
+    inicio = time.perf_counter()
+    try:
+        # Pede uma linha a mais que o limite só para saber se houve corte
+        linhas_lidas = [0]
+
+        def lotes_limitados():
+            for lote in ler_lotes(filtros, limite + 1):
+                restante = limite - linhas_lidas[0]
+                linhas_lidas[0] += len(lote)
+                if restante <= 0:
+                    continue
+                yield lote[:restante]
+
+        linhas = ESCRITORES[formato](lotes_limitados(), caminho)
+    except Exception:
+        os.remove(caminho)
+        raise
+
+    return ResultadoExportacao(
+        caminho=caminho,
+        formato=formato,
+        linhas=linhas,
+        segundos=time.perf_counter() - inicio,
+        truncado=linhas_lidas[0] > limite,
+    )
+
+def remover_exportacao(resultado):
+    if resultado and os.path.exists(resultado.caminho):
+        os.remove(resultado.caminho)
+
+def limpar_exportacoes_antigas(horas=HORAS_VALIDADE):
+    # A sessão só apaga o próprio arquivo quando gera outro; os de
+    # sessões abandonadas são varridos aqui. Retorna quantos apagou.
+    limite = time.time() - horas * 3600
+    apagados = 0
+    for caminho in glob.glob(os.path.join(tempfile.gettempdir(), f"{PREFIXO_ARQUIVO}*")):
+        try:
+            if os.path.getmtime(caminho) < limite:
+                os.remove(caminho)
+                apagados += 1
+        except OSError:
+            pass   # já apagado por outro processo
+    return apagados
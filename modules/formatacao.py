@@ -1,3 +1,8 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
 def moeda(valor):
     return f"R$ {valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
 
@@ -5,14 +10,50 @@ def percentual(valor):
     return f"{valor:,.2f}%".replace(",", "X").replace(".", ",").replace("X", ".")
 
 def data_br(data):
-
-    return data.strftime("%d/%m/%Y")
-
-def data_br(data):
-    import pandas as pd
     if pd.isnull(data) or data is None:
         return ""
     try:
         return pd.to_datetime(data).strftime("%d/%m/%Y")
     except Exception:
         return str(data)
+
+# ------------------------------------------------------------
+# 🔹 Versões vetorizadas (coluna inteira de uma vez, via Arrow)
+# ------------------------------------------------------------
+def _serie_texto(valores, index):
+    return pd.Series(pd.arrays.ArrowStringArray(valores), index=index)
+
+def _numero_br(valores, prefixo="", sufixo=""):
+    # 1234.5 -> "1.234,50" sem formatar valor por valor: separa inteiro e
+    # centavos, e agrupa os milhares no texto invertido ("4321" -> "432.1")
+    serie = pd.Series(valores)
+    if isinstance(serie.dtype, pd.ArrowDtype):
+        numeros = serie.astype("float64")   # ex: valor decimal128 dos loaders
+    else:
+        numeros = pd.to_numeric(serie, errors="coerce").astype("float64")
+    centavos = pc.round(pa.array(numeros.to_numpy() * 100, from_pandas=True), round_mode="half_towards_infinity")
+    centavos = pc.cast(centavos, pa.int64())
+
+    negativo = pc.less(centavos, 0)
+    absoluto = pc.abs(centavos)
+    inteiro = pc.cast(pc.divide(absoluto, 100), pa.string())
+    inteiro = pc.utf8_reverse(pc.utf8_rtrim(
+        pc.replace_substring_regex(pc.utf8_reverse(inteiro), r"(\d{3})", r"\1."),
+        characters="."
+    ))
+    decimais = pc.utf8_lpad(pc.cast(pc.subtract(absoluto, pc.multiply(pc.divide(absoluto, 100), 100)), pa.string()), 2, "0")
+
+    sinal = pc.if_else(negativo, pa.scalar(prefixo + "-"), pa.scalar(prefixo))
+    texto = pc.binary_join_element_wise(sinal, inteiro, ",", decimais, sufixo, "")
+    return _serie_texto(pc.fill_null(texto, ""), numeros.index)
+
+def moeda_series(valores):
+    return _numero_br(valores, prefixo="R$ ")
+
+def percentual_series(valores):
+    return _numero_br(valores, sufixo="%")
+
+def data_br_series(datas):
+    datas = pd.to_datetime(pd.Series(datas), errors="coerce")
+    texto = pc.strftime(pa.array(datas, from_pandas=True), format="%d/%m/%Y")
+    return _serie_texto(pc.fill_null(texto, ""), datas.index)
@@ -0,0 +1,206 @@
+# ============================================================
+# 📘 MÓDULO: INVALIDAÇÃO DO CACHE ENTRE PROCESSOS
+# ------------------------------------------------------------
+# Responsável por:
+#   - Avisar os outros processos do servidor (vários Streamlit atrás
+#     de um balanceador, jobs, linha de comando) de cada invalidação
+#     local: tabelas e anos afetados
+#   - Escutar os avisos numa thread por processo e invalidar aqui só
+#     as entradas correspondentes (modules.cache, notificar=False)
+# ------------------------------------------------------------
+# Postgres: NOTIFY/LISTEN no canal CANAL. O aviso sai depois do commit
+# da escrita, então quem recebe já enxerga os dados novos.
+# SQLite: não tem LISTEN; os avisos vão para a tabela cache_avisos e
+# cada processo a consulta a cada INTERVALO_SQLITE segundos.
+# Ao reconectar, o processo invalida tudo (pode ter perdido avisos).
+# DFC_AVISOS=0 desliga (servidor com um processo só).
+# Teste com dois processos:
+#   python -m modules.invalidacao escutar                     # terminal 1
+#   python -m modules.invalidacao enviar lancamentos 2024     # terminal 2
+# ============================================================
+
+import json
+import os
+import select
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+from modules import cache
+from modules.database import conectar, conexao, parametros_conexao, usa_sqlite
+
+CANAL = "dfc_cache"
+ESPERA_SEGUNDOS = 30        # sem aviso nesse tempo: testa a conexão
+MAX_ESPERA_RECONEXAO = 30
+INTERVALO_SQLITE = 1.0
+RETENCAO_SQLITE = timedelta(hours=1)
+
+# Identifica este processo nos avisos (os próprios são ignorados)
+ORIGEM = uuid.uuid4().hex[:12]
+
+_thread = None
+_trava = threading.Lock()
+
+
+def ligado():
+    return os.environ.get("DFC_AVISOS") != "0"
+
+# ============================================================
+# 🔹 ENVIO
+# ============================================================
+@lru_cache(maxsize=1)
+def criar_tabela_avisos():
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS cache_avisos (
+                id INTEGER PRIMARY KEY,
+                aviso TEXT NOT NULL,
+                criado_em TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cur.close()
+    return True
+
+def montar_aviso(tabelas, anos=None):
+    return json.dumps({"o": ORIGEM, "t": list(tabelas), "a": sorted(anos) if anos else None})
+
+def notificar(tabelas, anos=None):
+    # Observador de modules.cache: repassa a invalidação local
+    aviso = montar_aviso(tabelas, anos)
+    if usa_sqlite():
+        criar_tabela_avisos()
+        with conexao() as conn:
+            cur = conn.cursor()
+            cur.execute("INSERT INTO cache_avisos (aviso) VALUES (%s)", (aviso,))
+            cur.close()
+        return
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT pg_notify(%s, %s)", (CANAL, aviso))
+        cur.close()
+
+def avisar_outros_processos():
+    # Só o envio (ex: linha de comando que escreve no banco)
+    if ligado():
+        cache.ao_invalidar(notificar)
+
+# ============================================================
+# 🔹 RECEBIMENTO
+# ============================================================
+def aplicar(aviso):
+    # Invalida o que o aviso pede; devolve o aviso (dict) ou None se
+    # era deste processo ou não pôde ser lido
+    try:
+        dados = json.loads(aviso)
+    except ValueError:
+        return None
+    if dados.get("o") == ORIGEM:
+        return None
+    cache.invalidar(*dados["t"], anos=dados.get("a"), notificar=False)
+    return dados
+
+def escutar_postgres(ao_receber, ao_conectar):
+    import psycopg2
+
+    conn = psycopg2.connect(**parametros_conexao())
+    conn.autocommit = True
+    cur = conn.cursor()
+    try:
+        cur.execute(f"LISTEN {CANAL}")
+        ao_conectar()
+        while True:
+            if select.select([conn], [], [], ESPERA_SEGUNDOS) == ([], [], []):
+                # Conexão parada há muito tempo: um SELECT descobre se caiu
+                cur.execute("SELECT 1")
+            conn.poll()
+            while conn.notifies:
+                ao_receber(conn.notifies.pop(0).payload)
+    finally:
+        cur.close()
+        conn.close()
+
+def escutar_sqlite(ao_receber, ao_conectar):
+    criar_tabela_avisos()
+    conn = conectar()
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT COALESCE(MAX(id), 0) FROM cache_avisos")
+        ultimo = cur.fetchone()[0]
+        ao_conectar()
+        limpeza = time.monotonic()
+        while True:
+            time.sleep(INTERVALO_SQLITE)
+            cur.execute("SELECT id, aviso FROM cache_avisos WHERE id > %s ORDER BY id", (ultimo,))
+            for ultimo, aviso in cur.fetchall():
+                ao_receber(aviso)
+            if time.monotonic() - limpeza > RETENCAO_SQLITE.total_seconds():
+                cur.execute(
+                    "DELETE FROM cache_avisos WHERE criado_em < %s",
+                    (datetime.now(timezone.utc) - RETENCAO_SQLITE,)
+                )
+                limpeza = time.monotonic()
+            conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+def escutar(ao_receber=aplicar):
+    # Bloqueia (roda na thread de iniciar_escuta ou no terminal);
+    # reconecta com espera crescente se a conexão cair
+    escutar_motor = escutar_sqlite if usa_sqlite() else escutar_postgres
+    espera, reconexao = 1, False
+
+    def ao_conectar():
+        nonlocal espera
+        espera = 1
+        if reconexao:
+            cache.invalidar(*cache.tabelas_em_cache(), notificar=False)
+
+    while True:
+        try:
+            escutar_motor(ao_receber, ao_conectar)
+        except Exception as e:
+            print(f"[DEBUG] Escuta de invalidações caiu ({e}); nova tentativa em {espera}s")
+        time.sleep(espera)
+        espera = min(espera * 2, MAX_ESPERA_RECONEXAO)
+        reconexao = True
+
+def iniciar_escuta():
+    # Uma vez por processo: envia as invalidações locais e escuta as dos
+    # outros numa thread daemon. Retorna se está ligado.
+    global _thread
+    if not ligado():
+        return False
+    with _trava:
+        if _thread is None:
+            avisar_outros_processos()
+            _thread = threading.Thread(target=escutar, name="invalidacao_cache", daemon=True)
+            _thread.start()
+    return True
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:2] == ["escutar"]:
+        def mostrar(aviso):
+            dados = aplicar(aviso)
+            if dados:
+                anos = ", ".join(map(str, dados["a"])) if dados["a"] else "todos"
+                print(f"{datetime.now():%H:%M:%S} {', '.join(dados['t'])} (anos: {anos}) "
+                      f"→ versões {cache.versao(*dados['t'])}", flush=True)
+
+        print(f"Escutando invalidações (processo {ORIGEM}). Ctrl+C para sair.", flush=True)
+        try:
+            escutar(mostrar)
+        except KeyboardInterrupt:
+            pass
+    elif sys.argv[1:2] == ["enviar"] and len(sys.argv) >= 3:
+        anos = {int(ano) for ano in sys.argv[3:]} or None
+        notificar([sys.argv[2]], anos)
+        print(f"Aviso enviado: {montar_aviso([sys.argv[2]], anos)}")
+    else:
+        print("Uso: python -m modules.invalidacao escutar | enviar TABELA [ANO ...]")
@@ -0,0 +1,277 @@
+# ============================================================
+# 📘 MÓDULO: FILA DE IMPORTAÇÕES EM SEGUNDO PLANO
+# ------------------------------------------------------------
+# Responsável por:
+#   - Receber importações (OFX, plano de contas em Excel e carga
+#     histórica em CSV/Parquet/Excel) e
+#     executá-las em threads, fora do script do Streamlit
+#   - Guardar o estado de cada job na tabela import_jobs
+#     (sobrevive a reruns e a recarregar a página)
+#   - Ignorar envios repetidos do mesmo arquivo (hash do conteúdo)
+#   - Informar progresso e velocidade (linhas/s)
+# ------------------------------------------------------------
+# Uso:
+#   job_id, novo = enviar_job("ofx", nome, conteudo, usuario="...")
+#   job = consultar_jobs([job_id]).iloc[0]
+# ============================================================
+
+import hashlib
+import io
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+import pandas as pd
+
+from modules.database import conectar, executar_query, usa_sqlite, sql_coluna_id, THREADS_JOBS
+from modules import perfil
+
+TIPOS = {
+    "ofx": "📥 Extrato OFX",
+    "contas_excel": "📚 Plano de contas (Excel)",
+    "carga_historica": "📦 Carga histórica",
+}
+SITUACOES_ATIVAS = ("pendente", "executando")
+MAX_THREADS = THREADS_JOBS   # o pool de conexões reserva uma vaga por thread
+LINHAS_POR_LOTE = 2_000
+# Job "executando" sem notícia há mais que isso: o processo morreu
+MINUTOS_SEM_PROGRESSO = 10
+
+_executor = None
+_trava = threading.Lock()
+
+# ============================================================
+# 🔹 TABELA
+# ============================================================
+@lru_cache(maxsize=1)
+def criar_tabela_jobs():
+    # Uma vez por processo; também devolve à fila o que ficou para trás
+    # Datas sempre em UTC, enviadas pelo Python (o mesmo SQL nos dois motores)
+    json_tipo, binario = ("TEXT", "BLOB") if usa_sqlite() else ("JSONB", "BYTEA")
+    conn = conectar()
+    cur = conn.cursor()
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS import_jobs (
+            id {sql_coluna_id()},
+            tipo TEXT NOT NULL,
+            nome_arquivo TEXT,
+            hash TEXT NOT NULL,
+            opcoes {json_tipo} NOT NULL DEFAULT '{{}}',
+            conteudo {binario},
+            usuario TEXT,
+            situacao TEXT NOT NULL DEFAULT 'pendente',
+            total INTEGER,
+            processados INTEGER NOT NULL DEFAULT 0,
+            inseridos INTEGER NOT NULL DEFAULT 0,
+            ignorados INTEGER NOT NULL DEFAULT 0,
+            mensagem TEXT,
+            criado_em TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            iniciado_em TIMESTAMPTZ,
+            atualizado_em TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            concluido_em TIMESTAMPTZ
+        )
+    """)
+    # O mesmo arquivo só entra de novo se a tentativa anterior deu erro
+    cur.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_hash
+        ON import_jobs (tipo, hash) WHERE situacao <> 'erro'
+    """)
+    cur.execute("""
+        UPDATE import_jobs
+        SET situacao = 'pendente'
+        WHERE situacao = 'executando'
+          AND atualizado_em < %s
+    """, (agora() - timedelta(minutes=MINUTOS_SEM_PROGRESSO),))
+    cur.execute("SELECT id FROM import_jobs WHERE situacao = 'pendente' ORDER BY id")
+    pendentes = [job_id for (job_id,) in cur.fetchall()]
+    conn.commit()
+    cur.close()
+    conn.close()
+
+    for job_id in pendentes:
+        _agendar(job_id)
+    return True
+
+def agora():
+    return datetime.now(timezone.utc)
+
+# ============================================================
+# 🔹 ENVIO
+# ============================================================
+def hash_conteudo(tipo, conteudo):
+    return hashlib.sha256(tipo.encode() + b"\0" + conteudo).hexdigest()
+
+def enviar_job(tipo, nome_arquivo, conteudo, opcoes=None, usuario=None):
+    # Retorna (job_id, novo). Arquivo igual a um job pendente, em execução
+    # ou concluído devolve o job existente (novo=False) sem reprocessar.
+    if tipo not in TIPOS:
+        raise ValueError(f"Tipo de importação inválido: {tipo!r}")
+    criar_tabela_jobs()
+
+    hash_arquivo = hash_conteudo(tipo, conteudo)
+    resultado = executar_query("""
+        INSERT INTO import_jobs (tipo, nome_arquivo, hash, opcoes, conteudo, usuario)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON CONFLICT (tipo, hash) WHERE situacao <> 'erro' DO NOTHING
+        RETURNING id
+    """, (tipo, nome_arquivo, hash_arquivo, json.dumps(opcoes or {}),
+          memoryview(conteudo), usuario), fetch=True)
+    if resultado:
+        _agendar(resultado[0][0])
+        return resultado[0][0], True
+
+    existente = executar_query("""
+        SELECT id FROM import_jobs
+        WHERE tipo = %s AND hash = %s AND situacao <> 'erro'
+    """, (tipo, hash_arquivo), fetch=True)
+    return existente[0][0], False
+
+def _agendar(job_id):
+    global _executor
+    with _trava:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_THREADS, thread_name_prefix="importacao")
+        _executor.submit(executar_job, job_id)
+
+# ============================================================
+# 🔹 EXECUÇÃO (NAS THREADS)
+# ============================================================
+def _atualizar(job_id, **campos):
+    colunas = ", ".join(f"{campo} = %s" for campo in campos)
+    executar_query(
+        f"UPDATE import_jobs SET {colunas}, atualizado_em = %s WHERE id = %s",
+        list(campos.values()) + [agora(), job_id]
+    )
+
+def executar_job(job_id):
+    # Só um processo/thread pega o job: a troca pendente → executando é atômica
+    resultado = executar_query("""
+        UPDATE import_jobs
+        SET situacao = 'executando', iniciado_em = %s, atualizado_em = %s
+        WHERE id = %s AND situacao = 'pendente'
+        RETURNING tipo, nome_arquivo, opcoes, conteudo
+    """, (agora(), agora(), job_id), fetch=True)
+    if not resultado:
+        return
+
+    tipo, nome_arquivo, opcoes, conteudo = resultado[0]
+    if isinstance(opcoes, str):   # SQLite: JSON guardado como texto
+        opcoes = json.loads(opcoes)
+    try:
+        with perfil.execucao(f"job #{job_id} ({tipo})"):
+            inseridos, ignorados = EXECUTORES[tipo](job_id, nome_arquivo, bytes(conteudo), opcoes or {})
+    except Exception as e:
+        print(f"[DEBUG] Job {job_id} falhou: {e}")
+        _atualizar(job_id, situacao="erro", mensagem=str(e)[:500], concluido_em=agora())
+        return
+
+    # O conteúdo do arquivo não é mais necessário depois de importado
+    _atualizar(
+        job_id, situacao="concluido", inseridos=inseridos, ignorados=ignorados,
+        conteudo=None, concluido_em=agora()
+    )
+
+def _executar_ofx(job_id, nome_arquivo, conteudo, opcoes):
+    from modules.ofx_reader import ler_ofx, importar_lancamentos
+    from modules.conciliacao import extratos_conferidos, resumo_conciliacao
+
+    arquivo = io.BytesIO(conteudo)
+    arquivo.name = nome_arquivo
+    lancamentos, extratos = ler_ofx(arquivo, com_extratos=True)
+    _atualizar(job_id, total=len(lancamentos))
+
+    # Cada lote recalcula o saldo na sua transação; a conciliação, no
+    # último, revê os extratos desde a primeira data de cada conta no
+    # arquivo (não só desde a do último lote)
+    primeiras = {}
+    for l in lancamentos:
+        if l.get("conta") and l["data"]:
+            chave = (l["banco"], l["conta"])
+            primeiras[chave] = min(primeiras.get(chave, l["data"]), l["data"])
+
+    # Extrato só com saldo (mês sem movimento): um lote vazio grava e confere
+    inicios = range(0, len(lancamentos), LINHAS_POR_LOTE) or ([0] if extratos_conferidos(extratos) else [])
+
+    inseridos = ignorados = 0
+    for inicio in inicios:
+        lote = lancamentos[inicio:inicio + LINHAS_POR_LOTE]
+        # O saldo do extrato é conferido na transação do último lote
+        ultimo = inicio + LINHAS_POR_LOTE >= len(lancamentos)
+        novos, repetidos = importar_lancamentos(
+            lote, opcoes.get("incluir_possiveis", True),
+            extratos=extratos if ultimo else None,
+            recalculadas=primeiras if ultimo else None,
+        )
+        inseridos += novos
+        ignorados += repetidos
+        _atualizar(job_id, processados=inicio + len(lote), inseridos=inseridos, ignorados=ignorados)
+
+    resumo = resumo_conciliacao(extratos)
+    if resumo:
+        _atualizar(job_id, mensagem=resumo[:500])
+    return inseridos, ignorados
+
+def _executar_contas_excel(job_id, nome_arquivo, conteudo, opcoes):
+    from modules.database import importar_contas_excel
+
+    def progresso(processadas, total):
+        _atualizar(job_id, processados=processadas, total=total)
+
+    gravadas = importar_contas_excel(io.BytesIO(conteudo), progresso=progresso)
+    return gravadas, 0
+
+def _executar_carga_historica(job_id, nome_arquivo, conteudo, opcoes):
+    from modules.carga_historica import carregar_arquivo, contar_linhas_arquivo, formato_arquivo
+
+    arquivo = io.BytesIO(conteudo)
+    _atualizar(job_id, total=contar_linhas_arquivo(arquivo, formato_arquivo(nome_arquivo)))
+
+    def progresso(parcial):
+        _atualizar(job_id, processados=parcial.lidas, inseridos=parcial.inseridas, ignorados=parcial.ignoradas)
+
+    resultado = carregar_arquivo(arquivo, nome=nome_arquivo, progresso=progresso, **opcoes)
+    _atualizar(job_id, mensagem=resultado.resumo()[:500])
+    return resultado.inseridas, resultado.ignoradas
+
+EXECUTORES = {
+    "ofx": _executar_ofx,
+    "contas_excel": _executar_contas_excel,
+    "carga_historica": _executar_carga_historica,
+}
+
+# ============================================================
+# 🔹 CONSULTA (PARA A PÁGINA ACOMPANHAR)
+# ============================================================
+def consultar_jobs(ids=None, limite=20):
+    # DataFrame com o estado dos jobs (os ids pedidos ou os mais recentes),
+    # com a velocidade em linhas/s
+    criar_tabela_jobs()
+    where, params = "", []
+    if ids is not None:
+        if not ids:
+            return pd.DataFrame()
+        where = f"WHERE id IN ({', '.join(['%s'] * len(ids))})"
+        params = list(ids)
+
+    conn = conectar()
+    df = pd.read_sql(f"""
+        SELECT id, tipo, nome_arquivo, usuario, situacao, total, processados,
+               inseridos, ignorados, mensagem, criado_em, iniciado_em, concluido_em
+        FROM import_jobs
+        {where}
+        ORDER BY id DESC
+        LIMIT %s
+    """, conn, params=params + [limite])
+    conn.close()
+
+    fim = pd.to_datetime(df.pop("concluido_em"), utc=True).fillna(pd.Timestamp(agora()))
+    df["segundos"] = (fim - pd.to_datetime(df.pop("iniciado_em"), utc=True)).dt.total_seconds()
+    df["linhas_por_segundo"] = (df["processados"] / df["segundos"].where(df["segundos"] > 0)).fillna(0)
+    df["fracao"] = (df["processados"] / df["total"].where(df["total"] > 0)).fillna(0).clip(0, 1)
+    df.loc[df["situacao"] == "concluido", "fracao"] = 1.0
+    return df
+
+def algum_ativo(df_jobs):
+    return not df_jobs.empty and df_jobs["situacao"].isin(SITUACOES_ATIVAS).any()
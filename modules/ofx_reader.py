@@ -1,6 +1,50 @@
 import re
+from dataclasses import dataclass
 from datetime import datetime
-from modules.database import executar_query
+
+import pandas as pd
+
+from modules.database import (
+    conectar,
+    executar_query,
+    executar_lote,
+    lancamentos_particionada,
+    garantir_particoes,
+    usa_sqlite
+)
+from modules.cache import invalidar, ano_de
+from modules.conciliacao import (
+    atualizar_saldos, como_data, conciliar, criar_tabela_extratos, extratos_conferidos, juntar
+)
+from modules.perfil import medido
+
+# Mesmo valor com data até N dias de distância = possível duplicado
+JANELA_POSSIVEL_DUPLICADO = 3
+AMOSTRA_PREVIA = 10
+
+SITUACOES = {
+    "novo": "🆕 Novos",
+    "duplicado": "♻️ Duplicados",
+    "possivel": "⚠️ Possíveis duplicados",
+}
+
+
+@dataclass
+class Extrato:
+    # Um <STMTRS> do arquivo: conta e saldos informados pelo banco.
+    # saldo_calculado/diferenca/situacao: preenchidos na conciliação.
+    banco: str
+    conta: str = None              # ACCTID
+    codigo_banco: str = None       # BANKID
+    data_inicio: str = None        # DTSTART/DTEND da lista de transações
+    data_fim: str = None
+    saldo: float = None            # LEDGERBAL (fechamento em data_saldo)
+    data_saldo: str = None
+    saldo_disponivel: float = None # AVAILBAL
+    arquivo_origem: str = None
+    saldo_calculado: float = None
+    diferenca: float = None
+    situacao: str = None
 
 
 class OFXParser:
@@ -8,6 +52,7 @@ class OFXParser:
     def __init__(self, texto):
         self.texto = texto.replace("\r", "").replace("\n", "")
         self.banco = self.detectar_banco()
+        self.extratos = []
 
     def detectar_banco(self):
         t = self.texto.upper()
@@ -21,32 +66,65 @@ class OFXParser:
             return "SICREDI"
         return "DESCONHECIDO"
 
-    def extrair(self, tag):
+    def extrair(self, tag, texto=None):
         padrao = f"<{tag}>([^<]+)"
-        return re.findall(padrao, self.texto)
+        return re.findall(padrao, self.texto if texto is None else texto)
+
+    def primeiro(self, tag, texto):
+        valores = self.extrair(tag, texto)
+        return valores[0].strip() if valores else None
+
+    def extrair_saldo(self, tag, texto):
+        # <LEDGERBAL>/<AVAILBAL>: BALAMT e depois DTASOF; (valor, data)
+        m = re.search(rf"<{tag}>\s*<BALAMT>([^<]+)(?:</BALAMT>)?\s*<DTASOF>([^<]+)", texto)
+        if not m:
+            return None, None
+        data = self.converter_data(m.group(2))
+        return self.converter_valor(m.group(1)), str(data.date()) if data else None
 
     def parse(self):
+        # Um bloco por conta (<STMTRS>); arquivo sem os agregados = um bloco
         transacoes = []
+        blocos = re.findall("<STMTRS>(.*?)</STMTRS>", self.texto) or [self.texto]
+
+        for bloco in blocos:
+            extrato = self.ler_extrato(bloco)
+            self.extratos.append(extrato)
 
-        datas = self.extrair("DTPOSTED")
-        valores = self.extrair("TRNAMT")
-        memos = self.extrair("MEMO")
+            datas = self.extrair("DTPOSTED", bloco)
+            valores = self.extrair("TRNAMT", bloco)
+            memos = self.extrair("MEMO", bloco)
 
-        for i in range(len(valores)):
+            for i in range(len(valores)):
 
-            data = self.converter_data(datas[i]) if i < len(datas) else None
-            valor = self.converter_valor(valores[i])
-            memo = memos[i] if i < len(memos) else ""
+                data = self.converter_data(datas[i]) if i < len(datas) else None
+                valor = self.converter_valor(valores[i])
+                memo = memos[i] if i < len(memos) else ""
 
-            transacoes.append({
-                "banco": self.banco,
-                "data": str(data.date()) if data else None,
-                "valor": valor,
-                "historico": memo.strip(),
-            })
+                transacoes.append({
+                    "banco": self.banco,
+                    "conta": extrato.conta,
+                    "data": str(data.date()) if data else None,
+                    "valor": valor,
+                    "historico": memo.strip(),
+                })
 
         return transacoes
 
+    def ler_extrato(self, bloco):
+        extrato = Extrato(
+            banco=self.banco,
+            conta=self.primeiro("ACCTID", bloco),
+            codigo_banco=self.primeiro("BANKID", bloco),
+        )
+        for campo, tag in (("data_inicio", "DTSTART"), ("data_fim", "DTEND")):
+            texto = self.primeiro(tag, bloco)
+            data = self.converter_data(texto) if texto else None
+            setattr(extrato, campo, str(data.date()) if data else None)
+        extrato.saldo, extrato.data_saldo = self.extrair_saldo("LEDGERBAL", bloco)
+        extrato.saldo_disponivel, _ = self.extrair_saldo("AVAILBAL", bloco)
+        return extrato
+
     def converter_data(self, d):
         d = d.split("[")[0].strip()
         if len(d) >= 14:
@@ -63,13 +141,15 @@ class OFXParser:
             return 0.0
 
 
-def ler_ofx(arquivo):
+@medido("ofx: leitura")
+def ler_ofx(arquivo, com_extratos=False):
+    # com_extratos=True: retorna (lançamentos, extratos) para a conciliação
     arquivo.seek(0)
     content = arquivo.read()
 
     if not content:
         print("[DEBUG] Arquivo vazio.")
-        return []
+        return ([], []) if com_extratos else []
 
     for enc in ["utf-8", "latin-1", "cp1252"]:
         try:
@@ -78,19 +158,22 @@ def ler_ofx(arquivo):
             parser = OFXParser(text)
             lancamentos = parser.parse()
 
+            nome = getattr(arquivo, "name", "OFX")
             for l in lancamentos:
-                l["arquivo_origem"] = getattr(arquivo, "name", "OFX")
+                l["arquivo_origem"] = nome
+            for extrato in parser.extratos:
+                extrato.arquivo_origem = nome
 
             print(f"[DEBUG] Banco detectado: {parser.banco}")
             print(f"[DEBUG] Lançamentos encontrados: {len(lancamentos)}")
 
-            return lancamentos
+            return (lancamentos, parser.extratos) if com_extratos else lancamentos
 
         except Exception as e:
             print(f"[DEBUG] Falha encoding {enc}: {e}")
             continue
 
-    return []
+    return ([], []) if com_extratos else []
 
 
 def existe_lancamento(lanc):
@@ -119,23 +202,216 @@ def salvar_lancamento(lanc):
         lanc["banco"],
         lanc["arquivo_origem"]
     ))
+    invalidar("lancamentos", anos={ano_de(lanc["data"])})
+
+
+# ============================================================
+# 🔹 PRÉVIA DA IMPORTAÇÃO (NOVOS / DUPLICADOS / POSSÍVEIS)
+# ============================================================
+# O lote lido do arquivo vai para uma tabela temporária da sessão e é
+# classificado com um único anti-join contra lancamentos:
+#   - duplicado: mesma data+valor+historico (a chave UNIQUE), já no banco
+#     ou repetido dentro do próprio arquivo
+#   - possivel: mesmo valor em data próxima, com histórico diferente
+#   - novo: o resto
+SQL_CLASSIFICAR = """
+    SELECT
+        t.linha,
+        CASE
+            WHEN e.id IS NOT NULL
+              OR ROW_NUMBER() OVER (
+                     PARTITION BY t.data, t.valor, t.historico ORDER BY t.linha
+                 ) > 1 THEN 'duplicado'
+            WHEN p.data IS NOT NULL THEN 'possivel'
+            ELSE 'novo'
+        END AS situacao,
+        p.data AS data_existente,
+        p.historico AS historico_existente
+    FROM tmp_importacao t
+    LEFT JOIN lancamentos e
+        ON e.data = t.data AND e.valor = t.valor AND e.historico = t.historico
+    LEFT JOIN LATERAL (
+        SELECT l.data, l.historico
+        FROM lancamentos l
+        WHERE e.id IS NULL
+          AND l.valor = t.valor
+          AND l.data BETWEEN t.data - %(janela)s AND t.data + %(janela)s
+        ORDER BY abs(l.data - t.data)
+        LIMIT 1
+    ) p ON TRUE
+"""
+
+# SQLite: sem LATERAL nem aritmética de datas (e sem colunas de fora
+# no ORDER BY de subconsulta); o vizinho mais próximo é o primeiro de
+# cada linha do arquivo numa junção ordenada por janela
+SQL_CLASSIFICAR_SQLITE = """
+    SELECT
+        t.linha,
+        CASE
+            WHEN e.id IS NOT NULL
+              OR ROW_NUMBER() OVER (
+                     PARTITION BY t.data, t.valor, t.historico ORDER BY t.linha
+                 ) > 1 THEN 'duplicado'
+            WHEN p.data IS NOT NULL THEN 'possivel'
+            ELSE 'novo'
+        END AS situacao,
+        p.data AS data_existente,
+        p.historico AS historico_existente
+    FROM tmp_importacao t
+    LEFT JOIN lancamentos e
+        ON e.data = t.data AND e.valor = t.valor AND e.historico = t.historico
+    LEFT JOIN (
+        SELECT
+            v.linha,
+            l.id,
+            ROW_NUMBER() OVER (
+                PARTITION BY v.linha
+                ORDER BY abs(julianday(l.data) - julianday(v.data))
+            ) AS ordem
+        FROM tmp_importacao v
+        JOIN lancamentos l
+            ON l.valor = v.valor
+           AND l.data BETWEEN date(v.data, printf('-%%d days', %(janela)s))
+                          AND date(v.data, printf('+%%d days', %(janela)s))
+    ) vizinho
+        ON vizinho.linha = t.linha AND vizinho.ordem = 1
+    LEFT JOIN lancamentos p
+        ON e.id IS NULL AND p.id = vizinho.id
+"""
+
+def sql_classificar():
+    return SQL_CLASSIFICAR_SQLITE if usa_sqlite() else SQL_CLASSIFICAR
+
+
+@dataclass
+class PreviaImportacao:
+    df: pd.DataFrame   # lançamentos do arquivo + situacao e o possível par
+
+    def contagem(self, situacao):
+        return int((self.df["situacao"] == situacao).sum())
+
+    def amostra(self, situacao, n=AMOSTRA_PREVIA):
+        return self.df[self.df["situacao"] == situacao].head(n)
+
+    @property
+    def total(self):
+        return len(self.df)
+
+
+@medido("ofx: tabela temporária", linhas=None)
+def carregar_temporaria(cur, lancamentos):
+    # No SQLite não há ON COMMIT DROP: a tabela some ao fechar a conexão
+    if usa_sqlite():
+        cur.execute("DROP TABLE IF EXISTS temp.tmp_importacao")
+    cur.execute(f"""
+        CREATE TEMP TABLE tmp_importacao (
+            linha INTEGER PRIMARY KEY,
+            data DATE,
+            valor NUMERIC(12,2),
+            historico TEXT,
+            banco TEXT,
+            arquivo_origem TEXT,
+            conta TEXT
+        ) {"" if usa_sqlite() else "ON COMMIT DROP"}
+    """)
+    executar_lote(cur, """
+        INSERT INTO tmp_importacao (linha, data, valor, historico, banco, arquivo_origem, conta)
+        VALUES %s
+    """, [
+        (i, l["data"], l["valor"], l["historico"], l["banco"], l.get("arquivo_origem"), l.get("conta"))
+        for i, l in enumerate(lancamentos)
+    ])
+    cur.execute("ANALYZE tmp_importacao")
+
+
+@medido("ofx: prévia", linhas=lambda previa: previa.total)
+def previa_importacao(lancamentos, janela=JANELA_POSSIVEL_DUPLICADO):
+    # Tudo na mesma conexão/transação; a tabela temporária some no rollback
+    conn = conectar()
+    cur = conn.cursor()
+    try:
+        carregar_temporaria(cur, lancamentos)
+        cur.execute(sql_classificar() + " ORDER BY t.linha", {"janela": janela})
+        classificados = cur.fetchall()
+    finally:
+        conn.rollback()
+        cur.close()
+        conn.close()
+
+    df = pd.DataFrame(lancamentos, columns=["data", "valor", "historico", "banco"])
+    df_situacao = pd.DataFrame(
+        classificados,
+        columns=["linha", "situacao", "data_existente", "historico_existente"]
+    ).set_index("linha")
+    return PreviaImportacao(df.join(df_situacao))
+
+
+@medido("ofx: gravação", linhas=sum)
+def importar_lancamentos(lancamentos, incluir_possiveis=True, janela=JANELA_POSSIVEL_DUPLICADO,
+                         extratos=None, recalculadas=None):
+    # Insere o lote inteiro em um statement; retorna (inseridos, ignorados).
+    # Na mesma transação: saldo corrente das contas do lote e conciliação
+    # dos extratos (num arquivo em vários lotes, passar com o último).
+    # recalculadas: {(banco, conta): data} cujo saldo lotes anteriores do
+    # mesmo arquivo recalcularam; os extratos a partir dela são revistos.
+    if not lancamentos and not extratos:
+        return 0, 0
+    criar_tabela_extratos()
+
+    situacoes = ("'novo', 'possivel'" if incluir_possiveis else "'novo'")
+    conn = conectar()
+    cur = conn.cursor()
+    try:
+        if lancamentos_particionada(cur):
+            garantir_particoes(cur, {str(l["data"])[:4] for l in lancamentos if l["data"]})
+        carregar_temporaria(cur, lancamentos)
+        cur.execute(f"""
+            WITH classificados AS ({sql_classificar()})
+            INSERT INTO lancamentos (data, valor, historico, banco, arquivo_origem, conta)
+            SELECT t.data, t.valor, t.historico, t.banco, t.arquivo_origem, t.conta
+            FROM tmp_importacao t
+            JOIN classificados c ON c.linha = t.linha
+            WHERE c.situacao IN ({situacoes})
+            ON CONFLICT (data, valor, historico) DO NOTHING
+        """, {"janela": janela})
+        inseridos = cur.rowcount
+
+        # Já importados antes de a conta ser lida do arquivo: passam a
+        # pertencer a ela (e entram no saldo corrente)
+        cur.execute("""
+            UPDATE lancamentos SET conta = t.conta
+            FROM tmp_importacao t
+            WHERE lancamentos.data = t.data
+              AND lancamentos.valor = t.valor
+              AND lancamentos.historico = t.historico
+              AND lancamentos.banco = t.banco
+              AND lancamentos.conta IS NULL
+              AND t.conta IS NOT NULL
+        """)
+        contas = {(l["banco"], l["conta"]) for l in lancamentos if l.get("conta")}
+        recalculadas_lote = atualizar_saldos(cur, contas)
+        for chave, desde in (recalculadas or {}).items():
+            juntar(recalculadas_lote, chave, como_data(desde))
+        conciliar(cur, extratos or [], recalculadas_lote)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+    if inseridos:
+        invalidar("lancamentos", anos={ano_de(l["data"]) for l in lancamentos})
+    return inseridos, len(lancamentos) - inseridos
 
 
 def importar_ofx(arquivo):
-    lancamentos = ler_ofx(arquivo)
+    lancamentos, extratos = ler_ofx(arquivo, com_extratos=True)
 
-    if not lancamentos:
+    if not lancamentos and not extratos_conferidos(extratos):
         print("[DEBUG] Nenhum lançamento encontrado.")
         return 0, 0
 
-    inseridos = 0
-    ignorados = 0
-
-    for lanc in lancamentos:
-        if not existe_lancamento(lanc):
-            salvar_lancamento(lanc)
-            inseridos += 1
-        else:
-            ignorados += 1
-
-    return inseridos, ignorados
+    # Extrato só com saldo (mês sem movimento): grava e confere o saldo
+    return importar_lancamentos(lancamentos, extratos=extratos)
@@ -0,0 +1,207 @@
+# ============================================================
+# 📘 MÓDULO: PERFIL DAS EXECUÇÕES (OPT-IN)
+# ------------------------------------------------------------
+# Responsável por:
+#   - Medir trechos quentes (loaders, pipeline OFX, árvore do
+#     Dashboard, exportação): tempo, linhas e memória
+#   - Agrupar as medições por execução (rerun da página, rerun de
+#     um fragmento ou job em segundo plano)
+#   - Guardar as últimas MAX_EXECUCOES execuções (buffer circular)
+#     e exportá-las em JSON para comparar fora do app
+# ------------------------------------------------------------
+# Desligado por padrão (custo de uma checagem por trecho). Liga com
+# DFC_PERFIL=1 ou pelo painel do super_admin. Com o perfil ligado a
+# memória é medida com tracemalloc, que deixa as alocações mais
+# lentas: os tempos ficam maiores que em produção.
+# Uso:
+#   with execucao("sistema"):
+#       with medir("carregar_contas") as m:
+#           df = carregar_contas()
+#           m.linhas = len(df)
+#
+#   @medido("ler_ofx")
+#   def ler_ofx(...): ...
+# ============================================================
+
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+
+MAX_EXECUCOES = 50
+
+_ligado = os.environ.get("DFC_PERFIL") == "1"
+_execucoes = deque(maxlen=MAX_EXECUCOES)
+_trava = threading.Lock()
+# Execução em andamento nesta thread (cada rerun/job tem a sua)
+_atual = contextvars.ContextVar("perfil_execucao", default=None)
+
+
+@dataclass
+class Medicao:
+    secao: str
+    nivel: int
+    ms: float = 0.0
+    linhas: int = None
+    memoria_kb: float = None
+    detalhe: str = None
+
+
+@dataclass
+class Execucao:
+    nome: str
+    inicio: str
+    ms: float = None
+    medicoes: list = field(default_factory=list)
+    _nivel: int = 0
+    _comeco: float = field(default_factory=time.perf_counter)
+
+    def como_dict(self):
+        dados = asdict(self)
+        dados.pop("_nivel")
+        dados.pop("_comeco")
+        return dados
+
+    def encerrar(self):
+        self.ms = round((time.perf_counter() - self._comeco) * 1000, 1)
+
+# ============================================================
+# 🔹 LIGAR / DESLIGAR
+# ============================================================
+def ativo():
+    return _ligado
+
+def ativar(ligado=True):
+    # Vale para o processo inteiro (todas as sessões)
+    global _ligado
+    _ligado = ligado
+    if ligado and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not ligado and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+if _ligado:
+    ativar(True)
+
+def _memoria():
+    return tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+
+# ============================================================
+# 🔹 EXECUÇÕES E TRECHOS
+# ============================================================
+@contextmanager
+def execucao(nome):
+    # Abre uma execução; dentro de outra já aberta, vira só um trecho
+    if not _ligado:
+        yield None
+        return
+    if _atual.get() is not None:
+        with medir(nome) as medicao:
+            yield medicao
+        return
+
+    atual = Execucao(nome=nome, inicio=datetime.now().isoformat(timespec="seconds"))
+    with _trava:
+        _execucoes.append(atual)
+    token = _atual.set(atual)
+    try:
+        yield atual
+    finally:
+        atual.encerrar()
+        _atual.reset(token)
+
+def iniciar_execucao(nome):
+    # Para o topo de um script, onde não cabe um "with": encerrar com
+    # encerrar_execucao() (num finally) no fim do script
+    if not _ligado:
+        return
+    atual = Execucao(nome=nome, inicio=datetime.now().isoformat(timespec="seconds"))
+    with _trava:
+        _execucoes.append(atual)
+    _atual.set(atual)
+
+def encerrar_execucao():
+    atual = _atual.get()
+    if atual is None:
+        return
+    atual.encerrar()
+    _atual.set(None)
+
+@contextmanager
+def medir(secao):
+    # Rende a Medicao para quem chama preencher linhas/detalhe. Fora de
+    # uma execução (ex: thread sem rerun), abre uma só para o trecho.
+    if not _ligado:
+        yield Medicao(secao, 0)
+        return
+    atual = _atual.get()
+    if atual is None:
+        with execucao(secao):
+            with medir(secao) as medicao:
+                yield medicao
+        return
+
+    medicao = Medicao(secao, atual._nivel)
+    atual.medicoes.append(medicao)
+    atual._nivel += 1
+    memoria = _memoria()
+    inicio = time.perf_counter()
+    try:
+        yield medicao
+    finally:
+        medicao.ms = round((time.perf_counter() - inicio) * 1000, 1)
+        depois = _memoria()
+        if memoria is not None and depois is not None:
+            medicao.memoria_kb = round((depois - memoria) / 1024, 1)
+        atual._nivel -= 1
+
+def contar_linhas(resultado):
+    # DataFrame/lista: len; tupla (df, ...) dos loaders paginados: o df
+    if isinstance(resultado, tuple) and resultado:
+        resultado = resultado[0]
+    try:
+        return len(resultado)
+    except TypeError:
+        return None
+
+def medido(secao=None, linhas=contar_linhas):
+    # linhas: função resultado -> nº de linhas processadas (ou None)
+    def decorador(func):
+        nome = secao or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _ligado:
+                return func(*args, **kwargs)
+            with medir(nome) as medicao:
+                resultado = func(*args, **kwargs)
+                medicao.linhas = linhas(resultado) if linhas else None
+            return resultado
+        return wrapper
+    return decorador
+
+# ============================================================
+# 🔹 CONSULTA / EXPORTAÇÃO
+# ============================================================
+def execucoes_recentes():
+    # Mais recentes primeiro
+    with _trava:
+        return [e.como_dict() for e in reversed(_execucoes)]
+
+def exportar_json():
+    return json.dumps(
+        {"gerado_em": datetime.now().isoformat(timespec="seconds"),
+         "execucoes": execucoes_recentes()},
+        ensure_ascii=False, indent=2
+    )
+
+def limpar():
+    with _trava:
+        _execucoes.clear()
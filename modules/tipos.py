@@ -0,0 +1,27 @@
+# ============================================================
+# 📘 MÓDULO: TIPOS DOS DATAFRAMES CARREGADOS DO BANCO
+# ------------------------------------------------------------
+# Fora de modules.database para que páginas que só precisam de
+# conexão (ex: Login) não carreguem pandas/pyarrow na abertura.
+# ============================================================
+
+import pandas as pd
+import pyarrow as pa
+
+# pd.read_sql devolve tudo como object; os loaders convertem para:
+#   - data: datetime64[ns] (uma vez só, no carregamento)
+#   - valor: decimal de precisão fixa (NUMERIC(12,2))
+#   - códigos/banco: category (poucos valores distintos, muitas linhas)
+#   - textos livres: strings do Arrow
+TIPO_VALOR = pd.ArrowDtype(pa.decimal128(12, 2))
+TIPO_TEXTO = "string[pyarrow]"
+
+def tipar_dataframe(df, schema):
+    for coluna, tipo in schema.items():
+        if coluna not in df.columns:
+            continue
+        if tipo == "datetime64[ns]":
+            df[coluna] = pd.to_datetime(df[coluna], errors="coerce")
+        else:
+            df[coluna] = df[coluna].astype(tipo)
+    return df
@@ -5,24 +5,59 @@
 #   - Inicialização do sistema
 #   - Carregamento das tabelas
 #   - Interface de gerenciamento das contas contábeis
+# ------------------------------------------------------------
+# Só a seção escolhida na navegação é executada, e cada seção é um
+# st.fragment (widgets dentro dela reexecutam só a seção).
+# Com DFC_TEMPOS=1 a página mostra o tempo de cada execução.
+# Com o perfil ligado (DFC_PERFIL=1 ou pelo painel ⏱️ Perfil, só
+# super_admin) cada execução fica registrada em modules.perfil.
 # ============================================================
 
 
 import os
+import time
+import functools
+from contextlib import contextmanager
+from pathlib import Path
 import pandas as pd
 import streamlit as st
-from io import BytesIO
-import pandas as pd
-from modules.formatacao import data_br, moeda, percentual
-from modules.database import importar_contas_excel, criar_tabelas
+
+INICIO_EXECUCAO = time.perf_counter()
+from modules.formatacao import moeda, percentual, data_br, data_br_series, moeda_series
+from modules.database import criar_tabelas
 from modules.contas import (
     carregar_contas,
     inserir_conta,
-    editar_conta,
-    excluir_conta
+    calcular_alteracoes_contas,
+    salvar_alteracoes_contas,
+    caminho_codigo
 )
 
-from modules.classificacao import carregar_lancamentos
+from modules.classificacao import (
+    carregar_intervalo_datas,
+    carregar_lancamentos_registro,
+    classificar_lancamento,
+    carregar_pagina_importados,
+    carregar_pagina_pendentes,
+    contar_importados,
+    SEM_CLASSIFICACAO,
+    TAMANHO_PAGINA_DETALHE,
+    TAMANHO_PAGINA_IMPORTADOS
+)
+from modules.dashboard import (
+    FiltrosDashboard,
+    build_dashboard,
+    build_dfc,
+    PERIODICIDADES,
+    rotulo_periodo
+)
+from modules.cache import versao
+from modules import perfil
+from modules.invalidacao import iniciar_escuta
+from modules.busca import buscar_historicos
+from modules.auth import sessao_atual
+from modules.jobs import TIPOS, enviar_job, consultar_jobs, algum_ativo
+from modules.exportacao import FORMATOS, exportar_lancamentos, remover_exportacao
 
 st.set_page_config(
     page_title="💰 Sistema",
@@ -30,691 +65,901 @@ st.set_page_config(
     layout="wide"
 )
 
-# 🚨 Verifica login
-if "logado" not in st.session_state or not st.session_state["logado"]:
+# 🚨 Verifica login (token assinado na sessão; o banco só é consultado
+# de tempos em tempos para confirmar que o usuário continua válido)
+sessao = sessao_atual()
+if not sessao:
     st.warning("⚠️ Você precisa fazer login primeiro na página inicial.")
     st.stop()
 
 # Se chegou aqui, já está logado
-permissao = st.session_state.get("permissao", "visualizador")
+permissao = sessao["permissao"] or "visualizador"
+perfil.iniciar_execucao("sistema")
 
 # ============================================================
-# 🔹 Função utilitária para exportar DataFrame em Excel
+# 📥 Exportação dos lançamentos filtrados (gerada sob demanda)
 # ============================================================
-def to_excel(df):
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-        df.to_excel(writer, index=False, sheet_name="Lançamentos")
-    processed_data = output.getvalue()
-    return processed_data
+def exibir_exportacao(filtros):
+    st.markdown("### 📥 Exportar lançamentos filtrados")
+    col_formato, col_botao = st.columns([2, 1])
+    formato = col_formato.selectbox(
+        "Formato",
+        options=list(FORMATOS),
+        format_func=lambda f: FORMATOS[f]["rotulo"],
+        key="formato_exportacao"
+    )
+
+    anterior = st.session_state.get("exportacao")
+    if col_botao.button("⚙️ Gerar arquivo", key="gerar_exportacao"):
+        remover_exportacao(anterior and anterior["resultado"])
+        with st.spinner("Gerando arquivo..."):
+            resultado = exportar_lancamentos(filtros, formato)
+        anterior = st.session_state["exportacao"] = {"filtros": filtros, "resultado": resultado}
+
+    # O arquivo gerado só vale para os filtros com que foi gerado
+    if not anterior or anterior["filtros"] != filtros:
+        return
+
+    resultado = anterior["resultado"]
+    if not os.path.exists(resultado.caminho):
+        # Varrido por limpar_exportacoes_antigas (sessão parada há horas)
+        st.session_state.pop("exportacao", None)
+        st.info("O arquivo gerado expirou. Gere novamente.")
+        return
+    st.caption(f"{resultado.linhas:,} linha(s) em {resultado.segundos:.2f}s".replace(",", "."))
+    if resultado.truncado:
+        st.warning(f"O arquivo foi limitado a {resultado.linhas:,} linhas.".replace(",", "."))
+
+    # Lido só no clique (não a cada rerun do fragmento)
+    caminho = Path(resultado.caminho)
+    st.download_button(
+        label="📥 Baixar todos os lançamentos filtrados",
+        data=lambda: caminho.read_bytes(),
+        file_name=resultado.nome_arquivo,
+        mime=resultado.mime
+    )
 
 # ============================================================
-# 🔹 CONFIGURAÇÃO INICIAL DO STREAMLIT
+# ⏱️ Tempo de execução da página e das seções (DFC_TEMPOS=1)
 # ============================================================
+MOSTRAR_TEMPOS = os.environ.get("DFC_TEMPOS") == "1"
+
+@contextmanager
+def cronometro(nome):
+    inicio = time.perf_counter()
+    yield
+    if MOSTRAR_TEMPOS:
+        st.caption(f"⏱️ {nome}: {(time.perf_counter() - inicio) * 1000:.0f} ms")
+
+def cronometrado(nome):
+    # Mede também as reexecuções só do fragmento (no perfil, uma
+    # reexecução do fragmento é uma execução própria)
+    def decorador(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with perfil.execucao(nome), cronometro(nome):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorador
 
-st.set_page_config(page_title="DFC Interativa", layout="wide")
-st.title("💰 Sistema de Fluxo de Caixa Interativo")
-
-# Criar tabelas no banco (se não existirem)
-criar_tabelas()
+# ============================================================
+# ⏳ Importações em segundo plano (fila de jobs)
+# ============================================================
+def enviar_importacao(tipo, arquivo, chave, opcoes=None):
+    # chave: lista de jobs desta sessão em st.session_state (por aba)
+    job_id, novo = enviar_job(
+        tipo, arquivo.name, arquivo.getvalue(), opcoes=opcoes,
+        usuario=st.session_state.get("usuario")
+    )
+    if not novo:
+        st.info(f"Este arquivo já foi enviado (importação #{job_id}).")
+    jobs = st.session_state.setdefault(chave, [])
+    if job_id not in jobs:
+        jobs.insert(0, job_id)
+
+def exibir_jobs(chave):
+    ids = st.session_state.get(chave)
+    if not ids:
+        return
+    # Enquanto houver job ativo, só este trecho da página é reexecutado
+    ativo = algum_ativo(consultar_jobs(ids))
+    st.fragment(painel_jobs, run_every=2 if ativo else None)(chave)
+
+def painel_jobs(chave):
+    df_jobs = consultar_jobs(st.session_state.get(chave, []))
+    for job in df_jobs.itertuples():
+        rotulo = f"{TIPOS[job.tipo]} — {job.nome_arquivo} (#{job.id})"
+        velocidade = f"{job.linhas_por_segundo:,.0f} linhas/s".replace(",", ".")
+        if job.situacao == "pendente":
+            st.progress(0.0, text=f"{rotulo}: na fila")
+        elif job.situacao == "executando":
+            total = "?" if pd.isna(job.total) else int(job.total)
+            st.progress(float(job.fracao), text=f"{rotulo}: {job.processados}/{total} ({velocidade})")
+        elif job.situacao == "concluido":
+            st.success(
+                f"{rotulo}: {job.inseridos} importado(s), {job.ignorados} ignorado(s) "
+                f"em {job.segundos:.1f}s ({velocidade})"
+            )
+            if job.mensagem:
+                st.caption(job.mensagem)
+        else:
+            st.error(f"{rotulo}: {job.mensagem}")
 
-# Mensagem temporária moderna
-st.toast("Sistema inicializado com sucesso!", icon="🎉")
+    # Quando o último job termina, recarrega a página inteira (dados novos)
+    ativo = algum_ativo(df_jobs)
+    if st.session_state.get(f"{chave}_ativo") and not ativo:
+        st.session_state[f"{chave}_ativo"] = False
+        st.rerun()
+    st.session_state[f"{chave}_ativo"] = ativo
 
-# 🔥 Carregar contas ANTES de qualquer aba
-if "contas_atualizadas" in st.session_state and st.session_state["contas_atualizadas"]:
-    df_contas = carregar_contas()
-    st.session_state["contas_atualizadas"] = False
-else:
-    df_contas = carregar_contas()
+# ============================================================
+# 🔹 Drill-down Mestre → Subchave → Registro (árvore do motor)
+# ============================================================
+def exibir_arvore(arvore, filtros):
+    for mes in arvore:
+        with st.expander(f"{mes.codigo} - {mes.nome} | Total: {moeda(mes.total)}"):
+            for sub in mes.filhos:
+                with st.expander(f"{sub.codigo} - {sub.nome} | Total: {moeda(sub.total)}"):
+                    for reg in sub.filhos:
+                        with st.expander(f"{reg.codigo} - {reg.nome} | Total: {moeda(reg.total)}"):
+                            exibir_detalhe_registro(reg.codigo, reg.qtd, filtros.data_inicio, filtros.data_fim)
+
+def exibir_detalhe_registro(registro, qtd, data_inicio, data_fim):
+    # Os lançamentos só são buscados quando o usuário pede, uma página por vez
+    if not st.toggle(f"Ver {qtd} lançamento(s)", key=f"ver_detalhe_{registro}"):
+        return
+
+    total_paginas = max(1, -(-int(qtd) // TAMANHO_PAGINA_DETALHE))
+    pagina = 1
+    if total_paginas > 1:
+        pagina = st.number_input(
+            f"Página (de {total_paginas})", min_value=1, max_value=total_paginas,
+            value=1, step=1, key=f"pagina_detalhe_{registro}"
+        )
 
+    st.dataframe(
+        carregar_lancamentos_registro(registro, data_inicio, data_fim, int(pagina)),
+        use_container_width=True
+    )
 
 # ============================================================
-# 🔹 ABAS DO SISTEMA
+# 📅 DFC por período (contas nas linhas, períodos nas colunas)
 # ============================================================
-
-if permissao in ["visualizador", "visitante"]:
-    # Usuário só pode ver o Dashboard
-    aba_dashboard, = st.tabs(["📊 Dashboard"])
-    with aba_dashboard:
-        st.subheader("📊 Dashboard Financeiro")
-
-        # 🔹 Funções de formatação (válidas apenas dentro do Dashboard)
-        def formatar_data(data):
-            if pd.isnull(data):
-                return ""
-            return pd.to_datetime(data).strftime("%d/%m/%Y")
-
-        def formatar_valor(valor):
-            if valor is None:
-                return "R$ 0,00"
-            return f"R$ {valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-
-        def formatar_percentual(pct):
-            if pct is None:
-                return "0%"
-            return f"{pct:.2f}%"
-
-        # 🔹 Carregar lançamentos classificados
-        df_lanc = carregar_lancamentos()
-        df_contas = carregar_contas()
-
-        # Juntar lançamentos com contas
-        df_lanc = df_lanc.merge(df_contas, left_on="conta_registro", right_on="registro", how="left")
-
-        # ============================================================
-        # 🎛️ Filtros (na sidebar)
-        # ============================================================
-        st.sidebar.markdown("### 🎛️ Filtros")
-        
-        # Converter coluna para datetime, ignorando erros
-        df_lanc["data"] = pd.to_datetime(df_lanc["data"], errors="coerce")
-        
-        # Remover valores nulos
-        datas_validas = df_lanc["data"].dropna()
-        
-        # Definir valores padrão seguros
-        if len(datas_validas) > 0:
-            data_inicial_padrao = datas_validas.min().date()
-            data_final_padrao = datas_validas.max().date()
-        else:
-            hoje = pd.Timestamp.today().date()
-            data_inicial_padrao = hoje
-            data_final_padrao = hoje
-        
-        # Usar no date_input
-        data_inicio = st.sidebar.date_input("Data inicial", value=data_inicial_padrao)
-        data_fim = st.sidebar.date_input("Data final", value=data_final_padrao)
-        
-        # Filtros de Mestre, Subchave e Registro
-        mestres_opcoes = sorted(df_lanc["mestre"].dropna().unique(), key=lambda x: float(x))
-        mestre_sel = st.sidebar.multiselect("Filtrar por Mestre", options=mestres_opcoes)
-        
-        subchaves_opcoes = sorted(df_lanc["subchave"].dropna().unique(), key=lambda x: float(x))
-        subchave_sel = st.sidebar.multiselect("Filtrar por Subchave", options=subchaves_opcoes)
-        
-        registros_opcoes = sorted(df_lanc["registro"].dropna().unique(), key=lambda x: float(x.replace(".", "")))
-        registro_sel = st.sidebar.multiselect("Filtrar por Registro", options=registros_opcoes)
-
-        # ============================================================
-        # 🔹 Aplicar filtros
-        # ============================================================
-        df_filtrado = df_lanc.copy()
-        
-        # Aqui você já converteu df_lanc["data"] para datetime com errors="coerce"
-        # Então pode usar direto sem reconverter
-        df_filtrado = df_filtrado[
-            (df_filtrado["data"].dt.date >= data_inicio) &
-            (df_filtrado["data"].dt.date <= data_fim)
+def exibir_dfc(filtros):
+    st.markdown("### 📅 DFC por período")
+    periodicidade = st.selectbox(
+        "Periodicidade",
+        options=list(PERIODICIDADES),
+        index=list(PERIODICIDADES).index("mes"),
+        format_func=PERIODICIDADES.get,
+        key="periodicidade_dfc"
+    )
+    # Saldo inicial: tudo antes do período também conta
+    dfc = build_dfc(filtros, periodicidade, versao=versao("lancamentos", "contas", fim=filtros.data_fim))
+    if dfc.vazio:
+        st.info("Nenhum lançamento no período.")
+        return
+
+    rotulos = {p: rotulo_periodo(p, periodicidade) for p in dfc.periodos}
+    tabela = dfc.matriz[["conta"]].copy()
+    for periodo in dfc.periodos:
+        tabela[rotulos[periodo]] = moeda_series(dfc.matriz[periodo])
+
+    rodape = pd.DataFrame({"conta": ["🔹 Fluxo do período", "💰 Saldo acumulado", "📈 Variação"]})
+    for periodo in dfc.periodos:
+        rodape[rotulos[periodo]] = [
+            moeda(dfc.fluxo[periodo]),
+            moeda(dfc.saldo[periodo]),
+            "" if pd.isna(dfc.variacao[periodo]) else percentual(dfc.variacao[periodo]),
         ]
-        
-        if mestre_sel:
-            df_filtrado = df_filtrado[df_filtrado["mestre"].isin(mestre_sel)]
-        if subchave_sel:
-            df_filtrado = df_filtrado[df_filtrado["subchave"].isin(subchave_sel)]
-        if registro_sel:
-            df_filtrado = df_filtrado[df_filtrado["registro"].isin(registro_sel)]
-
-
-        # ============================================================
-        # 🔹 Drill-down e gráficos
-        # ============================================================
-        if df_filtrado.empty:
-            st.info("Nenhum dado encontrado para os filtros selecionados.")
-        else:
-            mestres_ordenados = sorted(df_filtrado["mestre"].unique(), key=lambda x: float(x))
 
-            for mestre in mestres_ordenados:
-                df_mestre = df_filtrado[df_filtrado["mestre"] == mestre]
-                if not df_mestre.empty:
-                    nome_mestre = df_mestre["nome_mestre"].iloc[0]
-                    soma_mestre = df_mestre["valor"].sum()
-                else:
-                    nome_mestre = "(sem nome)"
-                    soma_mestre = 0
-
-                with st.expander(f"{mestre} - {nome_mestre} | Total: {formatar_valor(soma_mestre)}"):
-                    subchaves_ordenadas = sorted(df_mestre["subchave"].unique(), key=lambda x: float(x))
-                    for subchave in subchaves_ordenadas:
-                        df_sub = df_mestre[df_mestre["subchave"] == subchave]
-                        if not df_sub.empty:
-                            nome_sub = df_sub["nome_subchave"].iloc[0]
-                            soma_sub = df_sub["valor"].sum()
-                        else:
-                            nome_sub = "(sem nome)"
-                            soma_sub = 0
-
-                        with st.expander(f"{subchave} - {nome_sub} | Total: {formatar_valor(soma_sub)}"):
-                            registros_ordenados = sorted(df_sub["registro"].unique(), key=lambda x: float(x.replace(".", "")))
-                            for registro in registros_ordenados:
-                                df_reg = df_sub[df_sub["registro"] == registro]
-                                if not df_reg.empty:
-                                    nome_reg = df_reg["nome_registro"].iloc[0]
-                                    soma_reg = df_reg["valor"].sum()
-                                else:
-                                    nome_reg = "(sem nome)"
-                                    soma_reg = 0
-
-                                with st.expander(f"{registro} - {nome_reg} | Total: {formatar_valor(soma_reg)}"):
-                                    st.dataframe(
-                                        df_reg[["data", "valor", "historico"]].assign(
-                                            data=df_reg["data"].apply(formatar_data),
-                                            valor=df_reg["valor"].apply(formatar_valor)
-                                        ),
-                                        use_container_width=True
-                                    )
-    
-            # 📥 Botão geral para todos os lançamentos filtrados
-            st.download_button(
-                label="📥 Baixar todos os lançamentos filtrados",
-                data=to_excel(df_filtrado),
-                file_name="lancamentos_filtrados.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
-  
-            total_geral = df_filtrado["valor"].sum()
-            st.markdown(f"### 💰 Total Geral: {formatar_valor(total_geral)}")
-
-            st.markdown("### 🥧 Distribuição por Grupo")
-            df_pizza = df_filtrado.groupby(["mestre", "nome_mestre"])["valor"].sum().reset_index()
-            df_pizza["valor"] = df_pizza["valor"].abs()
-            df_pizza = df_pizza[df_pizza["mestre"] != "6"]
-
-            import plotly.express as px
-            fig = px.pie(
-                df_pizza,
-                names="nome_mestre",
-                values="valor",
-                title="Distribuição dos Valores por Grupo",
-                hole=0.3
-            )
-            st.plotly_chart(fig, use_container_width=True)
+    st.dataframe(
+        pd.concat([tabela, rodape], ignore_index=True).rename(columns={"conta": "Conta"}),
+        use_container_width=True,
+        hide_index=True
+    )
+    st.caption(f"Saldo inicial (antes do período): {moeda(dfc.saldo_inicial)}")
 
-else:
-    # Usuário com permissão total vê todas as abas
-    aba_contas, aba_importacao, aba_classificacao, aba_dashboard = st.tabs(
-        ["📚 Contas", "📥 Importação", "🧾 Classificação", "📊 Dashboard"]
+# ============================================================
+# 📊 DASHBOARD (mesma tela para todos os perfis)
+# ============================================================
+def exibir_dashboard(df_contas):
+    st.subheader("📊 Dashboard Financeiro")
+
+    # ============================================================
+    # 🎛️ Filtros (na sidebar)
+    # ============================================================
+    st.sidebar.markdown("### 🎛️ Filtros")
+
+    # Período padrão: do primeiro ao último lançamento
+    data_min, data_max = carregar_intervalo_datas()
+    hoje = pd.Timestamp.today().date()
+    data_inicio = st.sidebar.date_input("Data inicial", value=data_min or hoje)
+    data_fim = st.sidebar.date_input("Data final", value=data_max or hoje)
+
+    # Filtros de Mestre, Subchave e Registro (contas já vêm ordenadas pelo caminho)
+    mestre_sel = st.sidebar.multiselect("Filtrar por Mestre", options=df_contas["mestre"].dropna().unique().tolist())
+    subchave_sel = st.sidebar.multiselect("Filtrar por Subchave", options=df_contas["subchave"].dropna().unique().tolist())
+    registro_sel = st.sidebar.multiselect("Filtrar por Registro", options=df_contas["registro"].dropna().unique().tolist())
+
+    filtros = FiltrosDashboard.criar(data_inicio, data_fim, mestre_sel, subchave_sel, registro_sel)
+    secao_dashboard(filtros)
+
+# A sidebar não pode ser usada dentro de um fragmento: os filtros ficam
+# fora (mudá-los reexecuta a página) e o conteúdo fica aqui dentro
+@st.fragment
+@cronometrado("Dashboard")
+def secao_dashboard(filtros):
+    resultado = build_dashboard(
+        filtros, versao=versao("lancamentos", "contas", inicio=filtros.data_inicio, fim=filtros.data_fim)
     )
 
     # ============================================================
-    # 📚 GERENCIAMENTO DE CONTAS CONTÁBEIS
+    # 🔹 Drill-down e gráficos
     # ============================================================
-    with aba_contas:
-        st.subheader("📚 Gerenciamento de Contas Contábeis")
+    if resultado.vazio:
+        st.info("Nenhum dado encontrado para os filtros selecionados.")
+        return
 
-        # Recarregar sempre que entrar na aba
-        df_contas = carregar_contas()
+    with perfil.medir("dashboard: exibir árvore"):
+        exibir_arvore(resultado.arvore, filtros)
 
-        # ============================================================
-        # 📥 IMPORTAR PLANO DE CONTAS VIA EXCEL
-        # ============================================================
-        st.markdown("### 📥 Importar plano de contas do Excel")
+    with perfil.medir("dashboard: exibir DFC"):
+        exibir_dfc(filtros)
 
-        arquivo = st.file_uploader("Selecione o arquivo Excel", type=["xlsx"], key="upload_excel")
+    # 📥 Exportação (o arquivo só é gerado quando o usuário pede)
+    exibir_exportacao(filtros)
 
-        if arquivo is not None:
-            importar_contas_excel(arquivo)
-            st.success("Contas importadas com sucesso!")
-            st.session_state["contas_atualizadas"] = True
+    st.markdown(f"### 💰 Total Geral: {moeda(resultado.total_geral)}")
 
-        # ============================================================
-        # ➕ FORMULÁRIO PARA CRIAR NOVA CONTA
-        # ============================================================
-        st.markdown("### ➕ Criar nova conta contábil")
+    st.markdown("### 🥧 Distribuição por Grupo")
+    import plotly.express as px
+    fig = px.pie(
+        resultado.df_pizza,
+        names="nome_mestre",
+        values="valor",
+        title="Distribuição dos Valores por Grupo",
+        hole=0.3
+    )
+    st.plotly_chart(fig, use_container_width=True)
 
-        with st.form("form_criar_conta"):
-            col1, col2, col3 = st.columns(3)
+# ============================================================
+# 🔹 CONFIGURAÇÃO INICIAL DO STREAMLIT
+# ============================================================
+
+st.title("💰 Sistema de Fluxo de Caixa Interativo")
+
+# Criar tabelas no banco (se não existirem) e escutar as invalidações
+# dos outros processos, uma vez por processo
+@st.cache_resource(show_spinner=False)
+def inicializar_banco():
+    criar_tabelas()
+    iniciar_escuta()
+    return True
+
+inicializar_banco()
+
+# Mensagem temporária moderna (uma vez por sessão)
+if not st.session_state.get("sistema_inicializado"):
+    st.session_state["sistema_inicializado"] = True
+    st.toast("Sistema inicializado com sucesso!", icon="🎉")
+
+# 🔥 Carregar contas ANTES de qualquer aba
+# (em cache; toda escrita em contas invalida o cache automaticamente)
+df_contas = carregar_contas()
+
+
+# ============================================================
+# 📚 GERENCIAMENTO DE CONTAS CONTÁBEIS
+# ============================================================
+# Cada seção é um fragmento: um clique dentro dela reexecuta só a
+# seção, e só a seção escolhida na navegação é executada.
+@st.fragment
+@cronometrado("Contas")
+def secao_contas():
+    st.subheader("📚 Gerenciamento de Contas Contábeis")
+
+    # Recarregar sempre que entrar na aba
+    df_contas = carregar_contas()
+
+    # ============================================================
+    # 📥 IMPORTAR PLANO DE CONTAS VIA EXCEL
+    # ============================================================
+    st.markdown("### 📥 Importar plano de contas do Excel")
+
+    arquivo = st.file_uploader("Selecione o arquivo Excel", type=["xlsx"], key="upload_excel")
+
+    # Só importa quando o usuário pede (antes, todo rerun com o
+    # arquivo presente importava de novo)
+    if arquivo is not None and st.button("📥 Importar plano de contas", key="importar_excel"):
+        enviar_importacao("contas_excel", arquivo, "jobs_contas")
+
+    exibir_jobs("jobs_contas")
+
+    # ============================================================
+    # ➕ FORMULÁRIO PARA CRIAR NOVA CONTA
+    # ============================================================
+    st.markdown("### ➕ Criar nova conta contábil")
+
+    with st.form("form_criar_conta"):
+        col1, col2, col3 = st.columns(3)
 
-            mestre = col1.text_input("Código Mestre (ex: 1)")
-            nome_mestre = col1.text_input("Nome do Mestre (ex: RECEITAS)")
+        mestre = col1.text_input("Código Mestre (ex: 1)")
+        nome_mestre = col1.text_input("Nome do Mestre (ex: RECEITAS)")
 
-            subchave = col2.text_input("Código Subchave (ex: 1.0)")
-            nome_subchave = col2.text_input("Nome da Subchave (ex: RECEITA OPERACIONAL)")
+        subchave = col2.text_input("Código Subchave (ex: 1.0)")
+        nome_subchave = col2.text_input("Nome da Subchave (ex: RECEITA OPERACIONAL)")
 
-            registro = col3.text_input("Código Registro (ex: 1.0.1)")
-            nome_registro = col3.text_input("Nome do Registro (ex: VENDA DE MERCADORIAS)")
+        registro = col3.text_input("Código Registro (ex: 1.0.1)")
+        nome_registro = col3.text_input("Nome do Registro (ex: VENDA DE MERCADORIAS)")
 
-            submitted = st.form_submit_button("Salvar Conta")
+        submitted = st.form_submit_button("Salvar Conta")
 
-            if submitted:
-                if mestre and subchave and registro:
+        if submitted:
+            if mestre and subchave and registro:
+                try:
                     inserir_conta(
                         mestre, subchave, registro,
                         nome_mestre, nome_subchave, nome_registro
                     )
+                except ValueError as e:
+                    st.error(f"{e}. Use apenas números separados por ponto (ex: 1.0.1).")
+                else:
                     st.success("Conta criada com sucesso!")
                     st.rerun()
-                else:
-                    st.error("Preencha todos os códigos (mestre, subchave e registro).")
+            else:
+                st.error("Preencha todos os códigos (mestre, subchave e registro).")
 
-        # ============================================================
-        # ✏️ EDIÇÃO DE CONTAS EM MATRIZ EDITÁVEL
-        # ============================================================
-        st.markdown("### ✏️ Editar Contas Contábeis")
+    # ============================================================
+    # ✏️ EDIÇÃO DE CONTAS EM MATRIZ EDITÁVEL
+    # ============================================================
+    st.markdown("### ✏️ Editar Contas Contábeis")
 
-        # Resetar índice para alinhar com editor
-        df_contas = df_contas.reset_index(drop=True)
+    # Resetar índice para alinhar com editor
+    df_contas = df_contas.reset_index(drop=True)
 
-        # Adicionar coluna auxiliar para exclusão
-        df_contas["excluir"] = False
+    # Adicionar coluna auxiliar para exclusão
+    df_contas["excluir"] = False
 
-        # 🔍 Filtros
-        col1, col2, col3 = st.columns(3)
-
-        filtro_mestre = col1.selectbox(
-            "Filtrar por Mestre",
-            options=["Todos"] + sorted(df_contas["mestre"].unique()),
-            key="filtro_mestre"
-        )
+    # 🔍 Filtros
+    col1, col2, col3 = st.columns(3)
 
-        filtro_subchave = col2.selectbox(
-            "Filtrar por Subchave",
-            options=["Todos"] + sorted(df_contas["subchave"].unique()),
-            key="filtro_subchave"
-        )
+    filtro_mestre = col1.selectbox(
+        "Filtrar por Mestre",
+        options=["Todos"] + sorted(df_contas["mestre"].unique(), key=caminho_codigo),
+        key="filtro_mestre"
+    )
 
-        filtro_registro = col3.selectbox(
-            "Filtrar por Registro",
-            options=["Todos"] + sorted(df_contas["registro"].unique()),
-            key="filtro_registro"
-        )
+    filtro_subchave = col2.selectbox(
+        "Filtrar por Subchave",
+        options=["Todos"] + sorted(df_contas["subchave"].unique(), key=caminho_codigo),
+        key="filtro_subchave"
+    )
 
-        # Aplicar filtros
-        df_filtrado = df_contas.copy()
-        if filtro_mestre != "Todos":
-            df_filtrado = df_filtrado[df_filtrado["mestre"] == filtro_mestre]
-        if filtro_subchave != "Todos":
-            df_filtrado = df_filtrado[df_filtrado["subchave"] == filtro_subchave]
-        if filtro_registro != "Todos":
-            df_filtrado = df_filtrado[df_filtrado["registro"] == filtro_registro]
+    filtro_registro = col3.selectbox(
+        "Filtrar por Registro",
+        options=["Todos"] + sorted(df_contas["registro"].unique(), key=caminho_codigo),
+        key="filtro_registro"
+    )
 
-        # Matriz editável
-        edited_df = st.data_editor(
-            df_filtrado,
-            num_rows="fixed",
-            use_container_width=True,
-            key="editor_contas",
-            column_config={
-                "mestre": st.column_config.TextColumn("Mestre", disabled=True),
-                "subchave": st.column_config.TextColumn("Subchave", disabled=True),
-                "registro": st.column_config.TextColumn("Registro", disabled=True),
-                "nome_mestre": st.column_config.TextColumn("Nome Mestre"),
-                "nome_subchave": st.column_config.TextColumn("Nome Subchave"),
-                "nome_registro": st.column_config.TextColumn("Nome Registro"),
-                "excluir": st.column_config.CheckboxColumn("Excluir"),
-            }
-        )
+    # Aplicar filtros
+    df_filtrado = df_contas.copy()
+    if filtro_mestre != "Todos":
+        df_filtrado = df_filtrado[df_filtrado["mestre"] == filtro_mestre]
+    if filtro_subchave != "Todos":
+        df_filtrado = df_filtrado[df_filtrado["subchave"] == filtro_subchave]
+    if filtro_registro != "Todos":
+        df_filtrado = df_filtrado[df_filtrado["registro"] == filtro_registro]
+
+    # Matriz editável
+    edited_df = st.data_editor(
+        df_filtrado,
+        num_rows="fixed",
+        use_container_width=True,
+        key="editor_contas",
+        column_config={
+            "mestre": st.column_config.TextColumn("Mestre", disabled=True),
+            "subchave": st.column_config.TextColumn("Subchave", disabled=True),
+            "registro": st.column_config.TextColumn("Registro", disabled=True),
+            "nome_mestre": st.column_config.TextColumn("Nome Mestre"),
+            "nome_subchave": st.column_config.TextColumn("Nome Subchave"),
+            "nome_registro": st.column_config.TextColumn("Nome Registro"),
+            "excluir": st.column_config.CheckboxColumn("Excluir"),
+            "caminho": None,
+        }
+    )
 
-        # Botão para salvar alterações
-        if st.button("💾 Salvar alterações nas contas", key="save_contas"):
-            for _, row in edited_df.iterrows():
-                editar_conta(
-                    row["mestre"], row["subchave"], row["registro"],
-                    row["nome_mestre"], row["nome_subchave"], row["nome_registro"]
-                )
-            st.toast("Conta(s) atualizada(s) com sucesso!✅")
+    # Um botão só: edições e exclusões marcadas vão na mesma transação
+    if st.button("💾 Salvar alterações nas contas", key="save_contas"):
+        alteradas, excluidas = calcular_alteracoes_contas(df_filtrado, st.session_state.get("editor_contas"))
+        if alteradas or excluidas:
+            qtd_alteradas, qtd_excluidas, lanc_orfaos = salvar_alteracoes_contas(
+                alteradas=alteradas, excluidas=excluidas
+            )
+            st.session_state.pop("editor_contas", None)
+            if qtd_alteradas:
+                st.toast(f"{qtd_alteradas} conta(s) atualizada(s) com sucesso!✅")
+            if qtd_excluidas:
+                st.toast(f"{qtd_excluidas} conta(s) excluída(s) com sucesso!", icon="🗑️")
+            if lanc_orfaos:
+                st.toast(f"{lanc_orfaos} lançamento(s) ainda apontam para os registros excluídos.", icon="⚠️")
             st.rerun()
+        else:
+            st.info("Nenhuma alteração para salvar.")
 
-        # Botão para excluir registros marcados
-        if st.button("🗑️ Excluir contas selecionadas", key="delete_contas"):
-            for _, row in edited_df.iterrows():
-                if row["excluir"]:
-                    excluir_conta(row["mestre"], row["subchave"], row["registro"])
-            st.warning("Conta(s) excluída(s) com sucesso!")
-            st.rerun()
 
 
+    # ============================================================
+    # 📂 EXIBIR ESTRUTURA HIERÁRQUICA DAS CONTAS
+    # ============================================================
+    st.markdown("### 📂 Estrutura de Contas Contábeis")
 
-        # ============================================================
-        # 📂 EXIBIR ESTRUTURA HIERÁRQUICA DAS CONTAS
-        # ============================================================
-        st.markdown("### 📂 Estrutura de Contas Contábeis")
+    if df_contas.empty:
+        st.info("Nenhuma conta cadastrada ainda.")
+    else:
+        for mestre in df_contas["mestre"].unique():
+            df_mestre = df_contas[df_contas["mestre"] == mestre]
+            nome_mestre = df_mestre["nome_mestre"].iloc[0]
 
-        if df_contas.empty:
-            st.info("Nenhuma conta cadastrada ainda.")
-        else:
-            for mestre in df_contas["mestre"].unique():
-                df_mestre = df_contas[df_contas["mestre"] == mestre]
-                nome_mestre = df_mestre["nome_mestre"].iloc[0]
-
-                st.markdown(f"## **{mestre} — {nome_mestre}**")
-
-                for subchave in df_mestre["subchave"].unique():
-                    df_sub = df_mestre[df_mestre["subchave"] == subchave]
-                    nome_sub = df_sub["nome_subchave"].iloc[0]
-
-                    st.markdown(f"### 🔸 {subchave} — {nome_sub}")
-
-                    for _, row in df_sub.iterrows():
-                        st.markdown(f"- **{row['registro']} — {row['nome_registro']}**")
-
-        # ============================================================
-        # 📥 IMPORTAÇÃO DE ARQUIVOS OFX
-        # ============================================================
-        with aba_importacao:
-            st.subheader("📥 Importação de Arquivos OFX")
-        
-            from modules.ofx_reader import ler_ofx, salvar_lancamento, existe_lancamento
-            from modules.classificacao import (
-                carregar_lancamentos,
-                classificar_lancamento
-            )
-        
-            uploaded_file = st.file_uploader("Selecione um arquivo OFX", type=["ofx"], key="upload_ofx")
-        
-            if uploaded_file:
-                # Ler o arquivo apenas uma vez
-                lancamentos = ler_ofx(uploaded_file)
-                st.session_state["lancamentos_ofx"] = lancamentos
-        
-                # 🚨 Verificação imediata logo após upload
-                if len(lancamentos) == 0:
-                    st.warning("Nenhum lançamento encontrado no arquivo.")
-                else:
-                    st.info(f"{len(lancamentos)} lançamentos encontrados no arquivo.")
-        
-                # Botão para importar lançamentos
-                if st.button("Importar lançamentos"):
-                    inseridos, ignorados = 0, 0
-                    for lanc in st.session_state["lancamentos_ofx"]:
-                        if not existe_lancamento(lanc):
-                            salvar_lancamento(lanc)
-                            inseridos += 1
-                        else:
-                            ignorados += 1
-        
-                    if inseridos == 0 and ignorados > 0:
-                        st.warning("Nenhum lançamento novo adicionado.")
-                    else:
-                        st.success(f"{inseridos} lançamentos importados. {ignorados} ignorados.")
+            st.markdown(f"## **{mestre} — {nome_mestre}**")
 
-    # ============================================================
-    # 🧾 CLASSIFICAÇÃO DOS LANÇAMENTOS
-    # ============================================================
-    with aba_classificacao:
-        st.subheader("🧾 Classificação dos Lançamentos")
+            for subchave in df_mestre["subchave"].unique():
+                df_sub = df_mestre[df_mestre["subchave"] == subchave]
+                nome_sub = df_sub["nome_subchave"].iloc[0]
+
+                st.markdown(f"### 🔸 {subchave} — {nome_sub}")
 
-        df_contas = carregar_contas()
-        df_lanc = carregar_lancamentos()
+                for _, row in df_sub.iterrows():
+                    st.markdown(f"- **{row['registro']} — {row['nome_registro']}**")
 
-        # ============================================================
-        # 🔍 Lançamentos pendentes de classificação
-        # ============================================================
-        df_nao_classificados = df_lanc[df_lanc["conta_registro"].isna()]
 
-        if df_nao_classificados.empty:
-            st.info("Todos os lançamentos já foram classificados.")
+# ============================================================
+# 📥 IMPORTAÇÃO DE ARQUIVOS OFX
+# ============================================================
+@st.fragment
+@cronometrado("Importação")
+def secao_importacao():
+    st.subheader("📥 Importação de Arquivos OFX")
+
+    from modules.ofx_reader import (
+        ler_ofx,
+        previa_importacao,
+        SITUACOES
+    )
+    from modules.conciliacao import extratos_conferidos
+
+    uploaded_file = st.file_uploader("Selecione um arquivo OFX", type=["ofx"], key="upload_ofx")
+
+    if uploaded_file:
+        # Ler e classificar o arquivo apenas uma vez (não a cada rerun)
+        assinatura = (uploaded_file.name, uploaded_file.size)
+        if st.session_state.get("assinatura_ofx") != assinatura:
+            lancamentos, extratos = ler_ofx(uploaded_file, com_extratos=True)
+            st.session_state["lancamentos_ofx"] = lancamentos
+            st.session_state["extratos_ofx"] = extratos
+            st.session_state["previa_ofx"] = previa_importacao(lancamentos) if lancamentos else None
+            st.session_state["assinatura_ofx"] = assinatura
+
+        lancamentos = st.session_state["lancamentos_ofx"]
+        previa = st.session_state["previa_ofx"]
+        # Extrato só com saldo (mês sem movimento) também é importado
+        so_saldo = not lancamentos and extratos_conferidos(st.session_state["extratos_ofx"])
+
+        # 🚨 Verificação imediata logo após upload
+        if len(lancamentos) == 0 and not so_saldo:
+            st.warning("Nenhum lançamento encontrado no arquivo.")
         else:
-            st.markdown("### 🔍 Lançamentos pendentes de classificação")
+            if so_saldo:
+                st.info("Extrato sem lançamentos no período: só o saldo informado será gravado e conferido.")
+            else:
+                st.info(f"{len(lancamentos)} lançamentos encontrados no arquivo.")
+            for extrato in st.session_state["extratos_ofx"]:
+                if extrato.saldo is not None:
+                    st.caption(
+                        f"🏦 Conta {extrato.conta or '?'} ({extrato.banco}): saldo informado "
+                        f"{moeda(extrato.saldo)} em {data_br(extrato.data_saldo)}"
+                    )
 
-            for _, row in df_nao_classificados.iterrows():
-                with st.expander(f"{row['data']} — R$ {row['valor']} — {row['historico']}"):
-                    st.write("### Selecionar conta contábil")
+            incluir_possiveis = True
+            if previa is not None:
+                colunas = st.columns(len(SITUACOES))
+                for coluna, (situacao, rotulo) in zip(colunas, SITUACOES.items()):
+                    coluna.metric(rotulo, previa.contagem(situacao))
+
+                for situacao, rotulo in SITUACOES.items():
+                    qtd = previa.contagem(situacao)
+                    if qtd == 0:
+                        continue
+                    with st.expander(f"{rotulo} — amostra"):
+                        amostra = previa.amostra(situacao)
+                        if situacao != "possivel":
+                            amostra = amostra.drop(columns=["data_existente", "historico_existente"])
+                        st.dataframe(amostra.drop(columns="situacao"), use_container_width=True, hide_index=True)
+
+                incluir_possiveis = st.checkbox(
+                    "Importar também os possíveis duplicados",
+                    value=True,
+                    disabled=previa.contagem("possivel") == 0
+                )
 
-                    opcoes = df_contas["registro"] + " - " + df_contas["nome_registro"]
-                    reg_sel_formatado = st.selectbox(
-                        "Selecione a conta contábil",
-                        options=opcoes,
-                        key=f"select_{row['id']}"
-                    )
-                    reg_sel = reg_sel_formatado.split(" - ")[0]
+            # A importação roda em segundo plano; a página só acompanha
+            if st.button("Importar extrato" if so_saldo else "Importar lançamentos"):
+                enviar_importacao(
+                    "ofx", uploaded_file, "jobs_ofx",
+                    opcoes={"incluir_possiveis": incluir_possiveis}
+                )
+                st.session_state.pop("assinatura_ofx", None)
 
-                    if st.button("Classificar", key=f"class_{row['id']}"):
-                        classificar_lancamento(row["id"], reg_sel)
-                        st.success("Lançamento classificado com sucesso!", icon="📌")
+    exibir_jobs("jobs_ofx")
+    exibir_conciliacao()
 
+    if permissao == "super_admin":
+        exibir_carga_historica()
 
-        # ============================================================
-        # 📄 LANÇAMENTOS IMPORTADOS
-        # ============================================================
-        st.markdown("### 📄 Lançamentos Importados")
-        
-        if df_lanc.empty:
-            st.info("Nenhum lançamento importado ainda.")
-        else:
-            # Juntar lançamentos com plano de contas para trazer o nome
-            df_lanc = df_lanc.merge(
-                df_contas[["registro", "nome_registro"]],
-                left_on="conta_registro",
-                right_on="registro",
-                how="left"
-            )
 
-            # 🔍 Filtros acima da matriz
-            col1, col2, col3 = st.columns(3)
+def exibir_conciliacao():
+    # Saldo informado em cada extrato × saldo corrente dos lançamentos
+    with st.expander("🏦 Conciliação dos extratos"):
+        from modules.conciliacao import SITUACOES as SITUACOES_CONCILIACAO, consultar_extratos
 
-            filtro_data = col1.selectbox(
-                "Filtrar por Data",
-                options=["Todos"] + sorted(df_lanc["data"].astype(str).unique()),
-                key="filtro_data"
-            )
+        df = consultar_extratos()
+        if df.empty:
+            st.caption("Nenhum extrato com saldo importado ainda.")
+            return
 
-            filtro_historico = col2.selectbox(
-                "Filtrar por Histórico",
-                options=["Todos"] + sorted(df_lanc["historico"].unique()),
-                key="filtro_historico"
+        divergentes = int((df["situacao"] == "divergente").sum())
+        lacunas = int(df["lacuna_inicio"].notna().sum())
+        if divergentes or lacunas:
+            st.warning(f"{divergentes} extrato(s) com diferença de saldo, {lacunas} período(s) sem extrato.")
+        else:
+            st.success("Todos os extratos conferem com os lançamentos.")
+
+        lacuna = data_br_series(df["lacuna_inicio"]) + " a " + data_br_series(df["lacuna_fim"])
+        st.dataframe(pd.DataFrame({
+            "Banco": df["banco"],
+            "Conta": df["conta"],
+            "Período": data_br_series(df["data_inicio"]) + " a " + data_br_series(df["data_fim"]),
+            "Saldo em": data_br_series(df["data_saldo"]),
+            "Informado": moeda_series(df["saldo_informado"]),
+            "Calculado": moeda_series(df["saldo_calculado"]),
+            "Diferença": moeda_series(df["diferenca"]),
+            "Situação": df["situacao"].map(SITUACOES_CONCILIACAO),
+            "Sem extrato": lacuna.where(df["lacuna_inicio"].notna(), ""),
+        }), use_container_width=True, hide_index=True)
+
+
+def exibir_carga_historica():
+    # Anos de histórico de uma vez (CSV, Parquet ou Excel), na fila de jobs
+    with st.expander("📦 Carga histórica (CSV, Parquet ou Excel)"):
+        st.caption(
+            "Mesma chave de duplicidade do OFX: o que já existe é ignorado. "
+            "Arquivos muito grandes: python -m modules.carga_historica ARQUIVO"
+        )
+        arquivo = st.file_uploader(
+            "Selecione o arquivo", type=["csv", "txt", "parquet", "xlsx"], key="upload_carga"
+        )
+        if arquivo is not None:
+            from modules.carga_historica import (
+                CAMPOS,
+                OBRIGATORIOS,
+                formato_arquivo,
+                ler_amostra,
+                sugerir_mapeamento
             )
 
-            # Criar coluna formatada para exibir código + nome
-            df_lanc["conta_formatada"] = df_lanc["conta_registro"].astype(str) + " - " + df_lanc["nome_registro"].fillna("")
+            amostra = ler_amostra(arquivo, formato_arquivo(arquivo.name))
+            st.dataframe(amostra, use_container_width=True, hide_index=True)
+
+            # Mapeamento das colunas (sugerido pelo cabeçalho)
+            sugestao = sugerir_mapeamento(amostra.columns)
+            opcoes_colunas = ["—"] + list(amostra.columns)
+            mapeamento = {}
+            for coluna, (campo, rotulo) in zip(st.columns(len(CAMPOS)), CAMPOS.items()):
+                escolhida = coluna.selectbox(
+                    rotulo + (" *" if campo in OBRIGATORIOS else ""),
+                    options=opcoes_colunas,
+                    index=opcoes_colunas.index(sugestao.get(campo, "—")),
+                    key=f"carga_coluna_{campo}"
+                )
+                if escolhida != "—":
+                    mapeamento[campo] = escolhida
 
-            filtro_conta = col3.selectbox(
-                "Filtrar por Conta Registro",
-                options=["Todos"] + sorted(df_lanc["conta_formatada"].unique()),
-                key="filtro_conta"
+            col1, col2, col3 = st.columns(3)
+            banco_padrao = col1.text_input("Banco (sem coluna de banco)", key="carga_banco").strip().upper()
+            formato_data = col2.text_input(
+                "Formato da data", placeholder="automático (ex: %d/%m/%Y)", key="carga_formato_data"
+            ).strip()
+            decimal = col3.selectbox(
+                "Separador decimal", ["automático", ",", "."], key="carga_decimal"
             )
 
-            # Aplicar filtros
-            df_filtrado = df_lanc.copy()
-            if filtro_data != "Todos":
-                df_filtrado = df_filtrado[df_filtrado["data"].astype(str) == filtro_data]
-            if filtro_historico != "Todos":
-                df_filtrado = df_filtrado[df_filtrado["historico"] == filtro_historico]
-            if filtro_conta != "Todos":
-                cod_sel = filtro_conta.split(" - ")[0]
-                df_filtrado = df_filtrado[df_filtrado["conta_registro"].astype(str) == cod_sel]
-
-            # Paginação sobre o df_filtrado
-            page_size = 100
-            total_pages = (len(df_filtrado) // page_size) + (1 if len(df_filtrado) % page_size else 0)
-
-            if "page_import" not in st.session_state:
-                st.session_state.page_import = 1
-
-            col_prev, col_page, col_next = st.columns([1, 2, 1])
-            if col_prev.button("⬅️ Anterior") and st.session_state.page_import > 1:
-                st.session_state.page_import -= 1
-            col_page.write(f"Página {st.session_state.page_import} de {total_pages}")
-            if col_next.button("Próximo ➡️") and st.session_state.page_import < total_pages:
-                st.session_state.page_import += 1
-
-            start = (st.session_state.page_import - 1) * page_size
-            end = start + page_size
-            df_page = df_filtrado.iloc[start:end]
-
-            # Selecionar apenas as colunas desejadas
-            df_page = df_page[["id", "data", "valor", "historico", "conta_registro", "nome_registro"]]
-
-            # 🔹 Aplicar formatação de data e valor
-            df_page["data"] = df_page["data"].apply(data_br)
-   
-            # Torna a matriz editável
-            edited_df = st.data_editor(
-                df_page,
-                num_rows="fixed",
-                use_container_width=True,
-                key="editor_import",
-                column_config={
-                    "conta_registro": st.column_config.TextColumn("Conta Registro"),
-                    "nome_registro": st.column_config.TextColumn("Nome da Conta"),
-                    "data": st.column_config.TextColumn("Data", disabled=True),
-                    "valor": st.column_config.NumberColumn("Valor", disabled=True),
-                    "historico": st.column_config.TextColumn("Histórico", disabled=True),
-                    }
-            )
+            faltando = [CAMPOS[campo] for campo in OBRIGATORIOS if campo not in mapeamento]
+            if faltando:
+                st.warning(f"Escolha a coluna de: {', '.join(faltando)}")
+            elif st.button("📦 Carregar histórico", key="carregar_historico"):
+                enviar_importacao("carga_historica", arquivo, "jobs_carga", opcoes={
+                    "mapeamento": mapeamento,
+                    "banco_padrao": banco_padrao or None,
+                    "formato_data": formato_data or None,
+                    "decimal": None if decimal == "automático" else decimal,
+                })
+
+        exibir_jobs("jobs_carga")
 
-            # Botão para salvar alterações
-            if st.button("💾 Salvar alterações", key="save_import"):
-                for i, row in edited_df.iterrows():
-                    original = df_page.loc[i]
-                    if row["conta_registro"] != original["conta_registro"]:
-                        classificar_lancamento(row["id"], row["conta_registro"])
-                st.toast("Alterações salvas e lançamentos reclassificados com sucesso!✅")
 
-                # Recarregar dados para refletir nomes atualizados
-                df_lanc = carregar_lancamentos()
-                st.rerun()
+# ============================================================
+# 🧾 CLASSIFICAÇÃO DOS LANÇAMENTOS
+# ============================================================
+@st.fragment
+@cronometrado("Classificação")
+def secao_classificacao():
+    st.subheader("🧾 Classificação dos Lançamentos")
 
+    df_contas = carregar_contas()
 
     # ============================================================
-    # 📊 DASHBOARD
+    # 🔍 Lançamentos pendentes de classificação
     # ============================================================
-    with aba_dashboard:
-        st.subheader("📊 Dashboard Financeiro")
-
-        # 🔹 Funções de formatação
-        def formatar_data(data):
-            if pd.isnull(data):
-                return ""
-            return pd.to_datetime(data).strftime("%d/%m/%Y")
-
-        def formatar_valor(valor):
-            if valor is None:
-                return "R$ 0,00"
-            return f"R$ {valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-
-        def formatar_percentual(pct):
-            if pct is None:
-                return "0%"
-            return f"{pct:.2f}%"
-
-        # 🔹 Carregar lançamentos classificados
-        df_lanc = carregar_lancamentos()
-        df_contas = carregar_contas()
-
-        # Juntar lançamentos com contas
-        df_lanc = df_lanc.merge(df_contas, left_on="conta_registro", right_on="registro", how="left")
-
-        # ============================================================
-        # 🎛️ Filtros (na sidebar)
-        # ============================================================
-        st.sidebar.markdown("### 🎛️ Filtros")
-        
-        # Converter coluna para datetime, ignorando erros
-        df_lanc["data"] = pd.to_datetime(df_lanc["data"], errors="coerce")
-        
-        # Remover valores nulos
-        datas_validas = df_lanc["data"].dropna()
-        
-        # Definir valores padrão seguros
-        if len(datas_validas) > 0:
-            data_inicial_padrao = datas_validas.min().date()
-            data_final_padrao = datas_validas.max().date()
-        else:
-            hoje = pd.Timestamp.today().date()
-            data_inicial_padrao = hoje
-            data_final_padrao = hoje
-        
-        # Usar no date_input (apenas uma vez)
-        data_inicio = st.sidebar.date_input("Data inicial", value=data_inicial_padrao)
-        data_fim = st.sidebar.date_input("Data final", value=data_final_padrao)
-        
-        # Filtros de Mestre, Subchave e Registro
-        mestres_opcoes = sorted(df_lanc["mestre"].dropna().unique(), key=lambda x: float(x))
-        mestre_sel = st.sidebar.multiselect("Filtrar por Mestre", options=mestres_opcoes)
-        
-        subchaves_opcoes = sorted(df_lanc["subchave"].dropna().unique(), key=lambda x: float(x))
-        subchave_sel = st.sidebar.multiselect("Filtrar por Subchave", options=subchaves_opcoes)
-        
-        registros_opcoes = sorted(df_lanc["registro"].dropna().unique(), key=lambda x: float(x.replace(".", "")))
-        registro_sel = st.sidebar.multiselect("Filtrar por Registro", options=registros_opcoes)
-
-        # ============================================================
-        # 🔹 Aplicar filtros
-        # ============================================================
-        df_filtrado = df_lanc.copy()
-        df_filtrado = df_filtrado[
-            (pd.to_datetime(df_filtrado["data"]).dt.date >= data_inicio) &
-            (pd.to_datetime(df_filtrado["data"]).dt.date <= data_fim)
-        ]
+    # Uma página por vez, pela chave id (nada de ler a tabela inteira)
+    paginacao_pendentes = st.session_state.setdefault(
+        "paginacao_pendentes", {"chaves": [None], "pagina": 0}
+    )
+    pagina_pendentes = paginacao_pendentes["pagina"]
+    df_nao_classificados, proxima_pendentes = carregar_pagina_pendentes(
+        paginacao_pendentes["chaves"][pagina_pendentes]
+    )
+    if df_nao_classificados.empty and pagina_pendentes > 0:
+        # A página esvaziou (tudo classificado): volta ao início
+        st.session_state.pop("paginacao_pendentes")
+        st.rerun()
+
+    if df_nao_classificados.empty:
+        st.info("Todos os lançamentos já foram classificados.")
+    else:
+        st.markdown("### 🔍 Lançamentos pendentes de classificação")
+
+        for _, row in df_nao_classificados.iterrows():
+            with st.expander(f"{data_br(row['data'])} — {moeda(row['valor'])} — {row['historico']}"):
+                st.write("### Selecionar conta contábil")
+
+                opcoes = df_contas["registro"] + " - " + df_contas["nome_registro"]
+                reg_sel_formatado = st.selectbox(
+                    "Selecione a conta contábil",
+                    options=opcoes,
+                    key=f"select_{row['id']}"
+                )
+                reg_sel = reg_sel_formatado.split(" - ")[0]
 
-        if mestre_sel:
-            df_filtrado = df_filtrado[df_filtrado["mestre"].isin(mestre_sel)]
-        if subchave_sel:
-            df_filtrado = df_filtrado[df_filtrado["subchave"].isin(subchave_sel)]
-        if registro_sel:
-            df_filtrado = df_filtrado[df_filtrado["registro"].isin(registro_sel)]
-
-        # ============================================================
-        # 🔹 Drill-down e gráficos
-        # ============================================================
-        if df_filtrado.empty:
-            st.info("Nenhum dado encontrado para os filtros selecionados.")
-        else:
-            mestres_ordenados = sorted(df_filtrado["mestre"].unique(), key=lambda x: float(x))
+                if st.button("Classificar", key=f"class_{row['id']}"):
+                    classificar_lancamento(row["id"], reg_sel)
+                    st.success("Lançamento classificado com sucesso!", icon="📌")
 
-            for mestre in mestres_ordenados:
-                df_mestre = df_filtrado[df_filtrado["mestre"] == mestre]
-                if not df_mestre.empty:
-                    nome_mestre = df_mestre["nome_mestre"].iloc[0]
-                    soma_mestre = df_mestre["valor"].sum()
-                else:
-                    nome_mestre = "(sem nome)"
-                    soma_mestre = 0
-
-                with st.expander(f"{mestre} - {nome_mestre} | Total: {formatar_valor(soma_mestre)}"):
-                    subchaves_ordenadas = sorted(df_mestre["subchave"].unique(), key=lambda x: float(x))
-                    for subchave in subchaves_ordenadas:
-                        df_sub = df_mestre[df_mestre["subchave"] == subchave]
-                        if not df_sub.empty:
-                            nome_sub = df_sub["nome_subchave"].iloc[0]
-                            soma_sub = df_sub["valor"].sum()
-                        else:
-                            nome_sub = "(sem nome)"
-                            soma_sub = 0
-
-                        with st.expander(f"{subchave} - {nome_sub} | Total: {formatar_valor(soma_sub)}"):
-                            registros_ordenados = sorted(df_sub["registro"].unique(), key=lambda x: float(x.replace(".", "")))
-                            for registro in registros_ordenados:
-                                df_reg = df_sub[df_sub["registro"] == registro]
-                                if not df_reg.empty:
-                                    nome_reg = df_reg["nome_registro"].iloc[0]
-                                    soma_reg = df_reg["valor"].sum()
-                                else:
-                                    nome_reg = "(sem nome)"
-                                    soma_reg = 0
-
-                                with st.expander(f"{registro} - {nome_reg} | Total: {formatar_valor(soma_reg)}"):
-                                    st.dataframe(
-                                        df_reg[["data", "valor", "historico"]].assign(
-                                            data=df_reg["data"].apply(formatar_data),
-                                            valor=df_reg["valor"].apply(formatar_valor)
-                                        ),
-                                        use_container_width=True
-                                    )
-
-            # 📥 Botão geral para todos os lançamentos filtrados
-            st.download_button(
-                label="📥 Baixar todos os lançamentos filtrados",
-                data=to_excel(df_filtrado),
-                file_name="lancamentos_filtrados.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
-            
-            total_geral = df_filtrado["valor"].sum()
-            st.markdown(f"### 💰 Total Geral: {formatar_valor(total_geral)}")
-
-            st.markdown("### 🥧 Distribuição por Grupo")
-            df_pizza = df_filtrado.groupby(["mestre", "nome_mestre"])["valor"].sum().reset_index()
-            df_pizza["valor"] = df_pizza["valor"].abs()
-            df_pizza = df_pizza[df_pizza["mestre"] != "6"]
-
-            import plotly.express as px
-            fig = px.pie(
-                df_pizza,
-                names="nome_mestre",
-                values="valor",
-                title="Distribuição dos Valores por Grupo",
-                hole=0.3
+        col_prev, col_page, col_next = st.columns([1, 2, 1])
+        if col_prev.button("⬅️ Anteriores", disabled=pagina_pendentes == 0, key="pendentes_anterior"):
+            paginacao_pendentes["pagina"] -= 1
+            st.rerun()
+        col_page.write(f"Página {pagina_pendentes + 1}")
+        if col_next.button("Próximos ➡️", disabled=proxima_pendentes is None, key="pendentes_proxima"):
+            if len(paginacao_pendentes["chaves"]) == pagina_pendentes + 1:
+                paginacao_pendentes["chaves"].append(proxima_pendentes)
+            paginacao_pendentes["pagina"] += 1
+            st.rerun()
+
+
+    # ============================================================
+    # 📄 LANÇAMENTOS IMPORTADOS
+    # ============================================================
+    st.markdown("### 📄 Lançamentos Importados")
+    
+    if carregar_pagina_importados(None, tamanho=1)[0].empty:
+        st.info("Nenhum lançamento importado ainda.")
+    else:
+        # 🔍 Filtros acima da matriz (aplicados no banco, não em memória)
+        col1, col2, col3 = st.columns(3)
+
+        filtro_data = col1.date_input("Filtrar por Data", value=None, key="filtro_data")
+        filtro_historico = col2.text_input(
+            "Filtrar por Histórico",
+            placeholder="Digite parte do histórico...",
+            key="filtro_historico",
+            # Termo novo: a sugestão escolhida para o anterior não vale mais
+            on_change=lambda: st.session_state.update(sugestao_historico="")
+        ).strip()
+
+        # Sugestões ranqueadas no banco (trecho ou aproximado, no máximo 20)
+        historico_exato = False
+        sugestoes = buscar_historicos(filtro_historico)
+        if not sugestoes.empty:
+            escolha = col2.selectbox(
+                "Sugestões",
+                options=[""] + sugestoes["historico"].tolist(),
+                format_func=lambda h: f"Contém \"{filtro_historico}\"" if h == "" else h,
+                key="sugestao_historico"
             )
-            st.plotly_chart(fig, use_container_width=True)
+            if escolha:
+                filtro_historico, historico_exato = escolha, True
+
+        opcoes_conta = {"": "Todos", SEM_CLASSIFICACAO: "(sem classificação)"}
+        opcoes_conta.update(zip(
+            df_contas["registro"].astype(str),
+            df_contas["registro"].astype(str) + " - " + df_contas["nome_registro"].astype(str)
+        ))
+        filtro_conta = col3.selectbox(
+            "Filtrar por Conta Registro",
+            options=list(opcoes_conta),
+            format_func=opcoes_conta.get,
+            key="filtro_conta"
+        )
+        filtros_grade = (filtro_data, filtro_historico, filtro_conta, historico_exato)
+
+        # Paginação por chave: guarda a chave inicial de cada página já
+        # visitada e recomeça do zero quando os filtros mudam
+        paginacao = st.session_state.get("paginacao_importados")
+        if not paginacao or paginacao["filtros"] != filtros_grade:
+            paginacao = st.session_state["paginacao_importados"] = {
+                "filtros": filtros_grade, "chaves": [None], "pagina": 0
+            }
+        pagina = paginacao["pagina"]
+
+        df_page, proxima = carregar_pagina_importados(paginacao["chaves"][pagina], *filtros_grade)
+        total, aproximado = contar_importados(*filtros_grade)
+        total_pages = max(1, -(-total // TAMANHO_PAGINA_IMPORTADOS))
+
+        col_prev, col_page, col_next = st.columns([1, 2, 1])
+        if col_prev.button("⬅️ Anterior", disabled=pagina == 0):
+            paginacao["pagina"] -= 1
+            st.rerun()
+        col_page.write(f"Página {pagina + 1} de {'~' if aproximado else ''}{max(total_pages, pagina + 1)}")
+        if col_next.button("Próximo ➡️", disabled=proxima is None):
+            if len(paginacao["chaves"]) == pagina + 1:
+                paginacao["chaves"].append(proxima)
+            paginacao["pagina"] += 1
+            st.rerun()
+
+        df_page = df_page.copy()
+        df_page["conta_registro"] = df_page["conta_registro"].astype(object).where(df_page["conta_registro"].notna(), None)
+        df_page["valor"] = df_page["valor"].astype("float64")
+
+        # 🔹 Aplicar formatação de data e valor
+        df_page["data"] = data_br_series(df_page["data"])
+
+        # Torna a matriz editável
+        edited_df = st.data_editor(
+            df_page,
+            num_rows="fixed",
+            use_container_width=True,
+            key=f"editor_import_{hash(filtros_grade)}_{pagina}",
+            column_config={
+                "conta_registro": st.column_config.TextColumn("Conta Registro"),
+                "nome_registro": st.column_config.TextColumn("Nome da Conta"),
+                "data": st.column_config.TextColumn("Data", disabled=True),
+                "valor": st.column_config.NumberColumn("Valor", disabled=True),
+                "historico": st.column_config.TextColumn("Histórico", disabled=True),
+                }
+        )
+
+        # Botão para salvar alterações
+        if st.button("💾 Salvar alterações", key="save_import"):
+            for i, row in edited_df.iterrows():
+                original = df_page.loc[i]
+                if row["conta_registro"] != original["conta_registro"]:
+                    classificar_lancamento(row["id"], row["conta_registro"])
+            st.toast("Alterações salvas e lançamentos reclassificados com sucesso!✅")
+
+            st.rerun()
+
+        # Deixa a próxima página no cache enquanto o usuário lê esta
+        if proxima is not None:
+            carregar_pagina_importados(proxima, *filtros_grade)
+
+
+# ============================================================
+# ⏱️ PERFIL DAS EXECUÇÕES (SÓ SUPER_ADMIN)
+# ============================================================
+def rotulo_execucao(execucao):
+    duracao = "em andamento" if execucao["ms"] is None else f"{execucao['ms']:.0f} ms"
+    return f"{execucao['inicio']} — {execucao['nome']} ({duracao})"
+
+@st.fragment
+def secao_perfil():
+    st.subheader("⏱️ Perfil das execuções")
+    ligado = st.toggle(
+        "Registrar execuções (vale para todas as sessões; deixa o app mais lento)",
+        value=perfil.ativo(),
+        key="perfil_ligado"
+    )
+    if ligado != perfil.ativo():
+        perfil.ativar(ligado)
+
+    execucoes = perfil.execucoes_recentes()
+    if not execucoes:
+        st.info("Nenhuma execução registrada. Ligue o perfil e use o sistema.")
+        return
+
+    col_exportar, col_limpar = st.columns([3, 1])
+    col_exportar.download_button(
+        "📥 Exportar JSON",
+        data=perfil.exportar_json(),
+        file_name="perfil_execucoes.json",
+        mime="application/json"
+    )
+    if col_limpar.button("🗑️ Limpar"):
+        perfil.limpar()
+        st.rerun(scope="fragment")
+
+    medicoes = pd.DataFrame([
+        {"execucao": e["nome"], **m} for e in execucoes for m in e["medicoes"]
+    ])
+    if not medicoes.empty:
+        medicoes[["linhas", "memoria_kb"]] = medicoes[["linhas", "memoria_kb"]].astype(float)
+        st.markdown("#### Trechos (últimas execuções)")
+        resumo = medicoes.groupby("secao").agg(
+            chamadas=("ms", "size"),
+            ms_medio=("ms", "mean"),
+            ms_max=("ms", "max"),
+            linhas_medias=("linhas", "mean"),
+            memoria_kb_media=("memoria_kb", "mean"),
+        ).sort_values("ms_max", ascending=False)
+        st.dataframe(resumo.round(1), use_container_width=True)
+
+    st.markdown("#### Execução")
+    indice = st.selectbox(
+        "Execução",
+        options=range(len(execucoes)),
+        format_func=lambda i: rotulo_execucao(execucoes[i]),
+        label_visibility="collapsed"
+    )
+    detalhe = pd.DataFrame(execucoes[indice]["medicoes"])
+    if detalhe.empty:
+        st.caption("Nenhum trecho medido nesta execução.")
+        return
+    # Trechos dentro de outros trechos aparecem recuados
+    detalhe["secao"] = detalhe["nivel"].map(lambda n: "\u2003" * n + ("↳ " if n else "")) + detalhe["secao"]
+    st.dataframe(
+        detalhe.drop(columns="nivel").rename(columns={
+            "secao": "Trecho", "ms": "ms", "linhas": "Linhas",
+            "memoria_kb": "Memória (KB)", "detalhe": "Origem"
+        }),
+        use_container_width=True,
+        hide_index=True
+    )
+
+# ============================================================
+# 🔹 SEÇÕES DO SISTEMA (SÓ A ATIVA É EXECUTADA)
+# ============================================================
+SECOES = {
+    "📚 Contas": secao_contas,
+    "📥 Importação": secao_importacao,
+    "🧾 Classificação": secao_classificacao,
+    "📊 Dashboard": lambda: exibir_dashboard(df_contas),
+    "⏱️ Perfil": secao_perfil,
+}
+
+if permissao in ["visualizador", "visitante"]:
+    # Usuário só pode ver o Dashboard
+    secoes_visiveis = ["📊 Dashboard"]
+elif permissao == "super_admin":
+    secoes_visiveis = list(SECOES)
+else:
+    # Usuário com permissão total vê todas as seções (o perfil é só do super_admin)
+    secoes_visiveis = [s for s in SECOES if s != "⏱️ Perfil"]
+
+secao = st.segmented_control(
+    "Seção",
+    options=secoes_visiveis,
+    default=secoes_visiveis[0],
+    key="secao_ativa",
+    label_visibility="collapsed"
+) or secoes_visiveis[0]
+
+try:
+    SECOES[secao]()
+finally:
+    perfil.encerrar_execucao()
+
+if MOSTRAR_TEMPOS:
+    tempo_total = (time.perf_counter() - INICIO_EXECUCAO) * 1000
+    st.caption(f"⏱️ Execução completa da página: {tempo_total:.0f} ms")
+    if not st.session_state.get("primeira_renderizacao"):
+        st.session_state["primeira_renderizacao"] = tempo_total
+        print(f"[PERFIL] sistema: primeira renderização em {tempo_total:.0f} ms")
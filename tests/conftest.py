@@ -0,0 +1,15 @@
+# ============================================================
+# 🧪 CONFIGURAÇÃO DOS TESTES
+# ------------------------------------------------------------
+# Os testes que usam banco rodam no SQLite embutido, num arquivo
+# temporário por execução, sem avisos entre processos. As variáveis
+# precisam existir antes do primeiro import de modules.database
+# (o motor é lido uma vez).
+# ============================================================
+
+import os
+import tempfile
+
+os.environ["DFC_BANCO"] = "sqlite"
+os.environ["DFC_SQLITE"] = os.path.join(tempfile.mkdtemp(prefix="dfc_testes_"), "testes.db")
+os.environ["DFC_AVISOS"] = "0"
@@ -0,0 +1,28 @@
+# ============================================================
+# 🧪 CARGA HISTÓRICA: LEITURA DOS VALORES (SEM BANCO)
+# ------------------------------------------------------------
+# Os valores chegam como texto (dtype=str na leitura do arquivo);
+# no modo automático o formato é decidido linha a linha.
+# ============================================================
+
+import pandas as pd
+
+from modules.carga_historica import normalizar_valores
+
+
+def test_valores_formato_automatico():
+    texto = pd.Series([
+        "1.500", "-1.500.000", "1.234,56", "-10,5", "R$ 2.000",
+        "1.50", "12.5", "0.500", "1,234.56", "1500", "abc",
+    ])
+    assert normalizar_valores(texto).tolist()[:-1] == [
+        1500.0, -1500000.0, 1234.56, -10.5, 2000.0,
+        1.5, 12.5, 0.5, 1234.56, 1500.0,
+    ]
+    assert pd.isna(normalizar_valores(texto).iloc[-1])
+
+
+def test_valores_com_separador_informado():
+    texto = pd.Series(["1.500", "1,5"])
+    assert normalizar_valores(texto, decimal=",").tolist() == [1500.0, 1.5]
+    assert normalizar_valores(texto, decimal=".").tolist() == [1.5, 15.0]
@@ -0,0 +1,151 @@
+# ============================================================
+# 🧪 SALDOS E CONCILIAÇÃO (SQLITE EMBUTIDO)
+# ------------------------------------------------------------
+# Importa extratos pequenos (por importar_lancamentos, por um OFX ou
+# pelo job em lotes) e confere o saldo corrente gravado em cada linha
+# e a situação dos extratos.
+# ============================================================
+
+import io
+
+import pytest
+
+from modules import jobs
+from modules.conciliacao import criar_tabela_extratos
+from modules.database import conexao, criar_tabelas
+from modules.ofx_reader import Extrato, importar_lancamentos, importar_ofx
+
+LANCAMENTOS = [
+    {"data": "2024-03-01", "valor": 100.0, "historico": "PIX RECEBIDO", "banco": "Banco X", "conta": "123"},
+    {"data": "2024-03-02", "valor": -30.0, "historico": "TARIFA", "banco": "Banco X", "conta": "123"},
+    {"data": "2024-03-05", "valor": 50.0, "historico": "TED RECEBIDA", "banco": "Banco X", "conta": "123"},
+]
+
+
+def extrato(saldo):
+    return Extrato(
+        banco="Banco X", conta="123", data_inicio="2024-03-01", data_fim="2024-03-05",
+        saldo=saldo, data_saldo="2024-03-05", arquivo_origem="marco.ofx",
+    )
+
+
+def arquivo_ofx(inicio, fim, saldo, transacoes=()):
+    # Uma conta, transações (data, valor, histórico) e o LEDGERBAL em fim
+    lista = "".join(
+        f"<STMTTRN><DTPOSTED>{data.replace('-', '')}<TRNAMT>{valor}<MEMO>{historico}</STMTTRN>"
+        for data, valor, historico in transacoes
+    )
+    return (
+        f"<OFX><STMTRS><BANKACCTFROM><BANKID>999<ACCTID>123</BANKACCTFROM>"
+        f"<BANKTRANLIST><DTSTART>{inicio.replace('-', '')}<DTEND>{fim.replace('-', '')}{lista}</BANKTRANLIST>"
+        f"<LEDGERBAL><BALAMT>{saldo}<DTASOF>{fim.replace('-', '')}</LEDGERBAL></STMTRS></OFX>"
+    ).encode()
+
+
+def importar_arquivo(conteudo, nome="extrato.ofx"):
+    arquivo = io.BytesIO(conteudo)
+    arquivo.name = nome
+    return importar_ofx(arquivo)
+
+
+def extratos_gravados():
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT data_saldo, saldo_calculado, situacao, lacuna_inicio, lacuna_fim
+            FROM extratos ORDER BY data_saldo
+        """)
+        return [
+            (str(data), float(calculado), situacao, lacuna_inicio and str(lacuna_inicio),
+             lacuna_fim and str(lacuna_fim))
+            for data, calculado, situacao, lacuna_inicio, lacuna_fim in cur.fetchall()
+        ]
+
+
+def saldos():
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT saldo FROM lancamentos ORDER BY data, id")
+        return [float(s) for (s,) in cur.fetchall()]
+
+
+@pytest.fixture(autouse=True)
+def banco_limpo():
+    criar_tabelas()
+    criar_tabela_extratos()
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM lancamentos")
+        cur.execute("DELETE FROM extratos")
+        cur.execute("DELETE FROM resumo_mensal")
+
+
+def test_primeiro_extrato_ancora_o_saldo():
+    extratos = [extrato(1120.0)]
+    assert importar_lancamentos(LANCAMENTOS, extratos=extratos) == (3, 0)
+
+    assert saldos() == [1100.0, 1070.0, 1120.0]
+    assert extratos[0].situacao == "conciliado"
+    assert extratos[0].diferenca == 0
+
+
+def test_extrato_ancora_sem_lancamentos_novos():
+    # Arquivo já importado sem LEDGERBAL, reimportado com o saldo: o
+    # extrato vira a âncora sem nenhuma linha nova no lote
+    assert importar_lancamentos(LANCAMENTOS) == (3, 0)
+    assert saldos() == [100.0, 70.0, 120.0]
+
+    extratos = [extrato(1120.0)]
+    assert importar_lancamentos(LANCAMENTOS, extratos=extratos) == (0, 3)
+
+    assert saldos() == [1100.0, 1070.0, 1120.0]
+    assert extratos[0].situacao == "conciliado"
+
+
+def test_primeira_ancora_sem_lancamentos():
+    # Extrato só com saldo numa conta nova: o saldo dele é a abertura
+    # das linhas que chegarem depois
+    extratos = [Extrato(
+        banco="Banco X", conta="123", data_inicio="2024-02-01", data_fim="2024-02-29",
+        saldo=1000.0, data_saldo="2024-02-29", arquivo_origem="fevereiro.ofx",
+    )]
+    assert importar_lancamentos([], extratos=extratos) == (0, 0)
+    assert extratos[0].situacao == "conciliado"
+
+    assert importar_lancamentos(LANCAMENTOS) == (3, 0)
+    assert saldos() == [1100.0, 1070.0, 1120.0]
+
+
+def test_extrato_so_com_saldo_entre_outros():
+    # Janeiro e abril com movimento, fevereiro sem: o de fevereiro é
+    # gravado e conferido, e só março fica como lacuna
+    importar_arquivo(arquivo_ofx("2024-01-01", "2024-01-31", 1100, [("2024-01-10", 100, "PIX")]))
+    assert importar_arquivo(arquivo_ofx("2024-02-01", "2024-02-29", 1100)) == (0, 0)
+    importar_arquivo(arquivo_ofx("2024-04-01", "2024-04-30", 1150, [("2024-04-10", 50, "TED")]))
+
+    assert extratos_gravados() == [
+        ("2024-01-31", 1100.0, "conciliado", None, None),
+        ("2024-02-29", 1100.0, "conciliado", None, None),
+        ("2024-04-30", 1150.0, "conciliado", "2024-03-01", "2024-03-31"),
+    ]
+
+
+def test_job_em_lotes_revisa_extratos_desde_o_primeiro_lote(monkeypatch):
+    importar_arquivo(arquivo_ofx("2024-02-01", "2024-02-29", 1100, [("2024-02-10", 100, "PIX")]))
+    importar_arquivo(arquivo_ofx("2024-03-01", "2024-03-31", 1150, [("2024-03-05", 50, "TED")]))
+
+    # Reenvio com uma tarifa de fevereiro que faltava: ela entra no
+    # primeiro lote e o extrato de abril, no último
+    jobs.criar_tabela_jobs()
+    monkeypatch.setattr(jobs, "LINHAS_POR_LOTE", 1)
+    conteudo = arquivo_ofx(
+        "2024-02-01", "2024-04-30", 1140,
+        [("2024-02-15", -20, "TARIFA"), ("2024-04-05", 10, "PIX")]
+    )
+    assert jobs._executar_ofx(0, "completo.ofx", conteudo, {}) == (2, 0)
+
+    assert extratos_gravados() == [
+        ("2024-02-29", 1080.0, "divergente", None, None),
+        ("2024-03-31", 1130.0, "divergente", None, None),
+        ("2024-04-30", 1140.0, "conciliado", None, None),
+    ]
@@ -0,0 +1,137 @@
+# ============================================================
+# 🧪 MOTOR DO DASHBOARD (SEM BANCO)
+# ------------------------------------------------------------
+# Um livro pequeno passa por totais_de_lancamentos → montar_dashboard
+# e por um agrupamento mensal → pivotar_dfc; os totais, subtotais,
+# saldo acumulado e variação são conferidos à mão.
+# ============================================================
+
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from modules.cache import invalidar
+from modules.contas import caminho_codigo
+from modules.dashboard import (
+    FiltrosDashboard, build_dashboard, montar_dashboard, pivotar_dfc, totais_de_lancamentos
+)
+
+CONTAS = pd.DataFrame(
+    [
+        ("1", "Receitas", "1.1", "Vendas", "1.1.1", "Produtos"),
+        ("1", "Receitas", "1.1", "Vendas", "1.1.2", "Serviços"),
+        ("2", "Custos", "2.1", "Fretes", "2.1.1", "Frete"),
+        ("6", "Transferências", "6.1", "Entre Bancos", "6.1.1", "Aplicação"),
+    ],
+    columns=["mestre", "nome_mestre", "subchave", "nome_subchave", "registro", "nome_registro"],
+)
+CONTAS["caminho"] = CONTAS["registro"].map(caminho_codigo)
+
+LANCAMENTOS = pd.DataFrame(
+    [
+        (date(2023, 12, 31), 999.0, "1.1.1"),   # antes do período: saldo inicial
+        (date(2024, 1, 5), 100.0, "1.1.1"),
+        (date(2024, 1, 20), 50.0, "1.1.2"),
+        (date(2024, 2, 3), -30.0, "2.1.1"),
+        (date(2024, 2, 10), 200.0, "1.1.1"),
+        (date(2024, 3, 1), -40.0, "6.1.1"),
+        (date(2024, 3, 15), 10.0, None),        # sem classificação
+    ],
+    columns=["data", "valor", "conta_registro"],
+)
+
+FILTROS = FiltrosDashboard.criar(date(2024, 1, 1), date(2024, 3, 31))
+
+
+def totais_por_mes(df_lanc, df_contas, filtros):
+    # Mesmo formato de carregar_totais_periodo (periodicidade mensal)
+    datas = pd.to_datetime(df_lanc["data"])
+    df = df_lanc[(datas >= pd.Timestamp(filtros.data_inicio)) & (datas <= pd.Timestamp(filtros.data_fim))]
+    df = df.assign(periodo=pd.to_datetime(df["data"]).dt.to_period("M").dt.start_time)
+    df = df.merge(df_contas, left_on="conta_registro", right_on="registro", how="left")
+    return (
+        df.groupby(["periodo", "mestre", "subchave", "registro", "nome_mestre",
+                    "nome_subchave", "nome_registro", "caminho"], dropna=False)["valor"]
+        .sum().rename("total").reset_index()
+    )
+
+
+def test_totais_de_lancamentos_filtra_periodo_e_soma_por_nivel():
+    df = totais_de_lancamentos(LANCAMENTOS, CONTAS, FILTROS)
+    por_nivel = {
+        (linha.nivel, linha.registro if linha.nivel == "registro" else
+         linha.subchave if linha.nivel == "subchave" else linha.mestre): (linha.total, linha.qtd)
+        for linha in df.itertuples()
+    }
+    assert por_nivel[("registro", "1.1.1")] == (300.0, 2)
+    assert por_nivel[("registro", "1.1.2")] == (50.0, 1)
+    assert por_nivel[("subchave", "1.1")] == (350.0, 3)
+    assert por_nivel[("mestre", "1")] == (350.0, 3)
+    assert por_nivel[("mestre", "2")] == (-30.0, 1)
+    geral = df[df["nivel"] == "geral"].iloc[0]
+    assert (geral["total"], geral["qtd"]) == (290.0, 6)
+    # Ordem pelo caminho, cada nível antes dos seus filhos; geral no fim
+    assert list(df["nivel"])[:4] == ["mestre", "subchave", "registro", "registro"]
+    assert df["nivel"].iloc[-1] == "geral"
+
+
+def test_montar_dashboard_arvore_total_e_pizza():
+    resultado = montar_dashboard(totais_de_lancamentos(LANCAMENTOS, CONTAS, FILTROS), FILTROS)
+
+    assert resultado.total_geral == pytest.approx(290.0)
+    assert resultado.qtd_total == 6
+    assert [(no.codigo, no.total) for no in resultado.arvore] == [("1", 350.0), ("2", -30.0), ("6", -40.0)]
+    vendas = resultado.arvore[0].filhos[0]
+    assert (vendas.codigo, vendas.total, vendas.qtd) == ("1.1", 350.0, 3)
+    assert [(reg.codigo, reg.total) for reg in vendas.filhos] == [("1.1.1", 300.0), ("1.1.2", 50.0)]
+    # Transferências (mestre 6) ficam fora da pizza; valores em módulo
+    assert resultado.df_pizza.to_dict("records") == [
+        {"mestre": "1", "nome_mestre": "Receitas", "valor": 350.0},
+        {"mestre": "2", "nome_mestre": "Custos", "valor": 30.0},
+    ]
+
+
+def test_pivotar_dfc_subtotais_saldo_e_variacao():
+    resultado = pivotar_dfc(totais_por_mes(LANCAMENTOS, CONTAS, FILTROS), FILTROS, "mes", saldo_inicial=999.0)
+    jan, fev, mar = resultado.periodos
+
+    assert list(resultado.fluxo) == [150.0, 170.0, -30.0]
+    assert list(resultado.saldo) == [1149.0, 1319.0, 1289.0]
+    assert pd.isna(resultado.variacao[jan])
+    assert resultado.variacao[fev] == pytest.approx(20 / 150 * 100)
+    assert resultado.variacao[mar] == pytest.approx(-200 / 170 * 100)
+
+    matriz = resultado.matriz.set_index(resultado.matriz["conta"].str.strip())
+    assert list(matriz.loc["1 - Receitas", [jan, fev, mar]]) == [150.0, 200.0, 0.0]
+    assert list(matriz.loc["1.1 - Vendas", [jan, fev, mar]]) == [150.0, 200.0, 0.0]
+    assert list(matriz.loc["1.1.1 - Produtos", [jan, fev, mar]]) == [100.0, 200.0, 0.0]
+    assert list(matriz.loc["1.1.2 - Serviços", [jan, fev, mar]]) == [50.0, 0.0, 0.0]
+    assert list(matriz.loc["2 - Custos", [jan, fev, mar]]) == [0.0, -30.0, 0.0]
+    assert list(matriz.loc["(sem classificação)", [jan, fev, mar]]) == [0.0, 0.0, 10.0]
+    # A soma das linhas de mestre bate com o fluxo de cada período
+    mestres = resultado.matriz[resultado.matriz["nivel"] == "mestre"]
+    assert list(mestres[[jan, fev, mar]].sum()) == list(resultado.fluxo)
+    assert resultado.matriz["conta"].iloc[-1] == "(sem classificação)"
+
+
+def test_build_dashboard_memoriza_pela_versao_e_devolve_copias():
+    leituras = []
+
+    def carregar_totais(inicio, fim, mestres, subchaves, registros):
+        leituras.append((inicio, fim))
+        return totais_de_lancamentos(LANCAMENTOS, CONTAS, FILTROS)
+
+    primeiro = build_dashboard(FILTROS, carregar_totais=carregar_totais)
+    primeiro.df_pizza.loc[0, "valor"] = -1.0
+    primeiro.arvore.clear()
+
+    segundo = build_dashboard(FILTROS, carregar_totais=carregar_totais)
+    assert len(leituras) == 1
+    assert segundo.df_pizza["valor"].tolist() == [350.0, 30.0]
+    assert len(segundo.arvore) == 3
+
+    # Sem versão explícita, a do cache: escrita no período refaz
+    invalidar("lancamentos", anos={2024}, notificar=False)
+    build_dashboard(FILTROS, carregar_totais=carregar_totais)
+    assert len(leituras) == 2